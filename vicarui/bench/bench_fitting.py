@@ -0,0 +1,203 @@
+"""
+Fitting benchmarks
+
+Run with ``python -m pytest bench/bench_fitting.py``, results are saved into bench/.benchmarks.
+Each group compares RANSACRegressor with SMAdapter and NPAdapter against the batched engine used by ransac().
+The reduction group compares a cold basis cache with a warm one, the disc group a fit masking the target.
+The select groups time band averaged profiles along a shadow.
+"""
+import numpy as np
+import pytest
+import statsmodels.api as sm
+from sklearn.linear_model import RANSACRegressor
+
+pytest.importorskip('pytest_benchmark')
+
+from vicarui.analysis.fitting import fitting
+from vicarui.analysis.reduction import reduction
+from vicarui.support import basis_cache, disc_mask, SMAdapter, NPAdapter, IRLSAdapter, Powerlaw, ransac, irls, partial_cls
+from vicarui.support.misc.synthetic import wrap_array, gradient_frame, disc_frame
+from vicarui.support.pipeline import fit_powerlaws
+from vicarui.support.pipeline.powerlaw import _f
+
+ENGINES = {
+    'statsmodels': lambda min_samples, max_iter: RANSACRegressor(
+        random_state=0, max_trials=max_iter, min_samples=min_samples, base_estimator=SMAdapter()
+    ),
+    'numpy': lambda min_samples, max_iter: RANSACRegressor(
+        random_state=0, max_trials=max_iter, min_samples=min_samples, base_estimator=NPAdapter()
+    ),
+    'batch': lambda min_samples, max_iter: ransac(min_samples, max_iter),
+}
+
+
+@pytest.fixture(params=list(ENGINES))
+def engine(request, monkeypatch):
+    monkeypatch.setattr(fitting, 'ransac', ENGINES[request.param])
+    return request.param
+
+
+@pytest.mark.parametrize('cached', [False, True], ids=['cold', 'cached'])
+@pytest.mark.parametrize('size', [64, 128])
+def test_br_reduction(benchmark, cached, size):
+    benchmark.group = f"reduction-{size}"
+    data, _ = gradient_frame(size + 2, cubic=0)
+    basis_cache().clear()
+
+    def run():
+        if not cached:
+            basis_cache().clear()
+        wrapper = wrap_array(data, border=1)
+        reduction.br_reduction(wrapper, degree=3)
+        return wrapper
+
+    wrapper = benchmark(run)
+    assert wrapper.background.shape == wrapper.cropped.shape
+
+
+@pytest.mark.parametrize('degree', [1, 2])
+def test_packet_fit(benchmark, engine, degree):
+    benchmark.group = f"click-{degree}"
+    packet = fitting.DataPacket(gradient_frame(512, cubic=0)[0])
+    packet.configure(width=2, window=200, degree=degree)
+    packet.select(256, 256)
+    bg, fg = benchmark(packet.fit, 200, 300)
+    assert len(bg.equation) == degree + 1
+
+
+@pytest.mark.parametrize('width', [2, 20])
+def test_packet_select(benchmark, width):
+    """Profiles along a shadow as in the autofit, the sums are built on the first selection"""
+    benchmark.group = f"select-{width}"
+    packet = fitting.DataPacket(gradient_frame(1024, cubic=0)[0])
+    packet.configure(width=width, window=200, degree=2)
+
+    def run():
+        for i in range(300, 700):
+            packet.select(i, 1024 - i, vertical=i % 2 == 0)
+        return packet.y_data
+
+    assert len(benchmark(run)) == 401
+
+
+def series(count: int, n: int = 200, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    x = np.linspace(1, 50, n)
+    y = np.log(3 * x ** -0.7) + rng.normal(0, 0.05, (count, n))
+    y[:, ::13] += 1
+    return np.log(x)[..., None], y
+
+
+ROBUST = {
+    'ransac': lambda: ransac(min_samples=14, max_iter=500),
+    'rlm': lambda: SMAdapter(model_cls=partial_cls(sm.RLM, M=sm.robust.norms.HuberT())),
+    'irls': lambda: IRLSAdapter(),
+}
+
+
+@pytest.mark.parametrize('name', list(ROBUST))
+def test_robust_fit(benchmark, name):
+    benchmark.group = 'robust-64'
+    X, Y = series(64)
+
+    def run():
+        return [ROBUST[name]().fit(X, y) for y in Y]
+
+    assert len(benchmark(run)) == len(Y)
+
+
+def test_robust_fit_batched(benchmark):
+    benchmark.group = 'robust-64'
+    X, Y = series(64)
+    result = benchmark(irls, X, Y)
+    assert result.params.shape == (len(Y), 2)
+
+
+def powerlaw_series(count: int, n: int = 120, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    x = np.linspace(1, 2000, n)
+    y = 4.1 * x ** -0.8 * (1 + rng.normal(0, 0.05, (count, n)))
+    return x, y, 0.05 * 4.1 * x ** -0.8
+
+
+def test_powerlaw_reference(benchmark):
+    """The previous path, numerical derivatives from (1, 1)"""
+    from scipy.optimize import curve_fit
+    benchmark.group = 'powerlaw-64'
+    x, Y, err = powerlaw_series(64)
+
+    def run():
+        return [
+            curve_fit(_f, x, y, p0=(1, 1), sigma=err, absolute_sigma=True, method='lm', maxfev=1000)[0]
+            for y in Y
+        ]
+
+    assert len(benchmark(run)) == len(Y)
+
+
+@pytest.mark.parametrize('warm_start', [False, True])
+def test_powerlaw(benchmark, warm_start):
+    benchmark.group = 'powerlaw-64'
+    x, Y, err = powerlaw_series(64)
+
+    def run():
+        pl = Powerlaw(warm_start=warm_start)
+        return [pl.fit(x[..., None], y, sample_weight=err).coef_ for y in Y]
+
+    assert len(benchmark(run)) == len(Y)
+
+
+def test_powerlaw_batched(benchmark):
+    benchmark.group = 'powerlaw-64'
+    x, Y, err = powerlaw_series(64)
+    coef, _ = benchmark(fit_powerlaws, x, Y, err)
+    assert coef.shape == (len(Y), 2)
+
+
+@pytest.mark.parametrize('max_samples', ['full', 1 << 16, 1 << 14])
+def test_br_reduction_sampled(benchmark, max_samples):
+    benchmark.group = 'reduction-512-samples'
+    data, _ = gradient_frame(514, cubic=0)
+    samples = data.size if max_samples == 'full' else max_samples
+
+    def run():
+        basis_cache().clear()
+        wrapper = wrap_array(data, border=1)
+        reduction.br_reduction(wrapper, degree=3, max_samples=samples)
+        return wrapper
+
+    wrapper = benchmark(run)
+    assert wrapper.background_shape == wrapper.cropped.shape
+
+
+@pytest.mark.parametrize('masked', [False, True], ids=['all', 'masked'])
+def test_br_reduction_masked(benchmark, masked):
+    """Frame with a bright disc covering a third of it, masking the disc leaves far fewer outliers"""
+    benchmark.group = 'reduction-512-disc'
+    data, _, _ = disc_frame(514, tilt=0)
+    mask = disc_mask(wrap_array(data, border=1).shape, (281, 229), 185) if masked else None
+
+    def run():
+        basis_cache().clear()
+        wrapper = wrap_array(data, border=1)
+        reduction.br_reduction(wrapper, degree=3, mask=mask)
+        return wrapper
+
+    wrapper = benchmark(run)
+    assert wrapper.background_shape == wrapper.cropped.shape
+
+
+@pytest.mark.parametrize('preview', [False, True], ids=['full', 'preview'])
+def test_br_reduction_preview(benchmark, preview):
+    """Time to the first background after a settings change"""
+    benchmark.group = 'reduction-1024-first'
+    data, _ = gradient_frame(1026, cubic=0)
+
+    def run():
+        basis_cache().clear()
+        wrapper = wrap_array(data, border=1)
+        wrapper.active = True
+        reduction.br_reduction(wrapper, degree=3, preview=preview)
+        return wrapper.display
+
+    assert benchmark(run).shape == (1023, 1023)
@@ -0,0 +1,14 @@
+"""
+Benchmark configuration
+
+Every run is saved into bench/.benchmarks, see vicarutil.benchmark.autosave.
+"""
+from pathlib import Path
+
+import pytest
+from vicarutil.benchmark import autosave
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    autosave(config, Path(__file__).parent / '.benchmarks')
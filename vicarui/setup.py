@@ -24,10 +24,12 @@ setuptools.setup(
         "astropy",
         "numpy",
         "scikit-learn",
-        "statsmodels"
+        "statsmodels",
+        "threadpoolctl"
     ],
     extras_require={
-        "full": ["spiceypy"]
+        "full": ["spiceypy"],
+        "bench": ["pytest", "pytest-benchmark"]
     },
     package_dir={"": "src"},
     packages=setuptools.find_packages(where="src"),
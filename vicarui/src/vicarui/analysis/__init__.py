@@ -1,10 +1,12 @@
 from types import ModuleType
 from typing import Optional, Dict, Tuple, Union, Callable, List
 
+import numpy as np
+
 from .common import provide_kernels
 from .fitting import DataPacket
-from .reduction import br_reduction
-from ..support import ImageWrapper
+from .reduction import br_reduction, background_engines, fit_mask
+from ..support import ImageWrapper, span
 
 
 class _Holder(object):
@@ -76,19 +78,35 @@ def set_info(
     m = anal_module()
     try:
         if m:
-            # noinspection PyUnresolvedReferences
-            return m.set_info(
-                image,
-                image_axis=image_axis,
-                analysis_axis=analysis_axis,
-                bg_axis=bg_axis,
-                **config
-            )
+            with span('set_info'):
+                # noinspection PyUnresolvedReferences
+                return m.set_info(
+                    image,
+                    image_axis=image_axis,
+                    analysis_axis=analysis_axis,
+                    bg_axis=bg_axis,
+                    **config
+                )
     except AttributeError:
         pass
     return ""
 
 
+def background_mask(image: ImageWrapper) -> Optional[np.ndarray]:
+    """
+    Boolean mask of the cropped image from the analysis module, False for pixels to leave out of the background fit
+    """
+    m = anal_module()
+    try:
+        if m:
+            with span('background_mask'):
+                # noinspection PyUnresolvedReferences
+                return m.background_mask(image)
+    except AttributeError:
+        pass
+    return None
+
+
 def get_additional_functions() -> Optional[Dict[str, str]]:
     """
     Returns clear and function names for additional functions provided by the analysis module
@@ -113,5 +131,8 @@ __all__ = [
     'anal_module',
     'DataPacket',
     'br_reduction',
+    'background_engines',
+    'background_mask',
+    'fit_mask',
     'provide_kernels'
 ]
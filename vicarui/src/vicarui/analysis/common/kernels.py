@@ -4,6 +4,7 @@ import spiceypy as spice
 from vicarutil.image import VicarImage
 
 from ..internal import log
+from ...support import traced
 
 META_KERNEL: str
 KERNEL_BASE: str
@@ -19,6 +20,7 @@ def provide_kernels(path: str):
     KERNEL_BASE = f'{path}/mk/'
 
 
+@traced('kernel_load')
 def load_kernels_for_image(image: VicarImage):
     try:
         spice.furnsh(META_KERNEL)
@@ -1,2 +1,4 @@
-from .fitting import DataPacket
+from .fitting import DataPacket, fit_profiles, ProfileFits
 from .second_degree import contrast_2nd_deg, integrate_2nd_deg, contrast_error_2nd_deg, integral_error_2nd_deg
+from .second_degree import analyze_2nd_deg_batch, SecondDegreeBatch
+from .parallel import fit_path, sweep_path
@@ -1,14 +1,12 @@
-from collections import deque
 from dataclasses import dataclass
-from typing import Optional, Tuple, Union, Any
+from typing import Optional, Tuple, Union, Any, Dict
 
 import numpy as np
 from matplotlib.pyplot import Rectangle, Line2D, Axes
-from sklearn.metrics import mean_squared_error
 from sklearn.preprocessing import PolynomialFeatures
 
 from .second_degree import additional_2nd_deg_info, roots_2nd_deg
-from ...support import SMPipe, ransac
+from ...support import SMPipe, NPAdapter, ransac, irls, traced
 
 
 @dataclass(frozen=True)
@@ -26,8 +24,62 @@ def reg_to_title(reg: SMPipe, prefix: str) -> str:
     return fr"{prefix} {reg.poly_str}"
 
 
+class _FitContext(object):
+    """
+    State reused by the fits of one DataPacket
+
+    Features of the current profile are computed once per selection into a buffer that only grows.
+    The pipes share a fitted PolynomialFeatures per degree, the regressors are fitted on the features directly.
+    """
+    __slots__ = 'buffer', 'x_data', 'features', '_transforms'
+
+    buffer: np.ndarray
+    x_data: Optional[np.ndarray]
+    features: Optional[np.ndarray]
+    _transforms: Dict[int, PolynomialFeatures]
+
+    def __init__(self):
+        self.buffer = np.empty((0, 0))
+        self.x_data = None
+        self.features = None
+        self._transforms = dict()
+
+    def design(self, x: np.ndarray, degree: int) -> np.ndarray:
+        """
+        Columns x, x^2, ..., x^degree in the order of PolynomialFeatures without the bias
+        """
+        if x is not self.x_data or self.features.shape[1] != degree:
+            if len(self.buffer) < len(x) or self.buffer.shape[1] != degree:
+                self.buffer = np.empty((max(len(x), len(self.buffer)), degree))
+            features = self.buffer[:len(x)]
+            features[:, 0] = x
+            for i in range(1, degree):
+                np.multiply(features[:, i - 1], x, out=features[:, i])
+            self.x_data = x
+            self.features = features
+        return self.features
+
+    def transform(self, degree: int) -> PolynomialFeatures:
+        try:
+            return self._transforms[degree]
+        except KeyError:
+            transform = PolynomialFeatures(degree, include_bias=False).fit(np.zeros((1, 1)))
+            self._transforms[degree] = transform
+            return transform
+
+
 class DataPacket(object):
-    __slots__ = 'data', 'x_data', 'y_data', 'width', 'window', 'degree', 'x_max', 'y_max', 'vertical'
+    """
+    Band averaged profiles of an image and the fits on them
+
+    Profiles are read from cumulative sums of the image along both axes, built once on the first selection,
+    so a selection costs the length of the window regardless of the band width.
+    Sum tables built by another packet of the same data can be passed in, see tables.
+    """
+    __slots__ = (
+        'data', 'x_data', 'y_data', 'width', 'window', 'degree', 'x_max', 'y_max', 'vertical',
+        '_row_sums', '_col_sums', '_summed', '_context',
+    )
 
     data: np.ndarray
 
@@ -41,7 +93,7 @@ class DataPacket(object):
     window: int
     degree: int
 
-    def __init__(self, data: np.ndarray):
+    def __init__(self, data: np.ndarray, tables: Tuple[np.ndarray, np.ndarray] = None):
         super(DataPacket, self).__init__()
         self.data = data
 
@@ -53,88 +105,162 @@ class DataPacket(object):
 
         self.vertical = False
 
+        self._row_sums, self._col_sums = (None, None) if tables is None else tables
+        self._summed = tables is not None
+        self._context = _FitContext()
+
     def configure(self, width: int = 0, window: int = 100, degree: int = 2):
         self.width = width
         self.window = window
         self.degree = degree
 
-    def select(self, x: int, y: int, vertical: bool = False, **kwargs) -> Rectangle:
+    @property
+    def tables(self) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Row and column cumulative sums of the data, built on first use
+
+        The row sums have a leading zero column and the column sums a leading zero row.
+        Non-finite data would spread into every later sum, such images have no tables and are averaged directly.
+        """
+        if not self._summed:
+            data = np.asarray(self.data, dtype=float)
+            if np.isfinite(data).all():
+                self._row_sums = np.zeros((data.shape[0], data.shape[1] + 1))
+                np.cumsum(data, axis=1, out=self._row_sums[:, 1:])
+                self._col_sums = np.zeros((data.shape[0] + 1, data.shape[1]))
+                np.cumsum(data, axis=0, out=self._col_sums[1:, :])
+            self._summed = True
+        return None if self._row_sums is None else (self._row_sums, self._col_sums)
+
+    def _sums(self, vertical: bool) -> Optional[np.ndarray]:
+        """
+        Row sums for vertical profiles and column sums otherwise
+        """
+        tables = self.tables
+        return None if tables is None else tables[0 if vertical else 1]
+
+    def _profile(self, start: int, end: int, low: int, high: int, vertical: bool) -> np.ndarray:
+        """
+        Average of the band [low, high) across the profile for every position in [start, end)
+        """
+        sums = self._sums(vertical)
+        if sums is None:
+            if vertical:
+                return np.average(self.data[start:end, low:high], axis=1)
+            else:
+                return np.average(self.data[low:high, start:end].T, axis=1)
         if vertical:
-            xs = max(0, y - self.window)
-            xe = min(self.y_max, y + self.window + 1)
-            self.x_data = np.arange(xs, xe, 1)
-            self.y_data = np.average(
-                self.data[xs:xe, max(0, x - self.width):min(self.x_max, x + self.width + 1)],
-                axis=1
-            )
-            self.vertical = True
-            return Rectangle(
-                (max(0, x - self.width), xs),
-                min(self.x_max, x + self.width + 1) - max(0, x - self.width) - 1,
-                xe - xs - 1,
-                **kwargs
-            )
+            return (sums[start:end, high] - sums[start:end, low]) / (high - low)
         else:
-            xs = max(0, x - self.window)
-            xe = min(self.x_max, x + self.window + 1)
-            self.x_data = np.arange(xs, xe, 1)
-            self.y_data = np.average(
-                self.data[max(0, y - self.width):min(self.y_max, y + self.width + 1), xs:xe].T,
-                axis=1
+            return (sums[high, start:end] - sums[low, start:end]) / (high - low)
+
+    def _bounds(self, x: int, y: int, vertical: bool) -> Tuple[int, int, int, int]:
+        """
+        Profile range [start, end) and band [low, high) of a selection
+        """
+        if vertical:
+            return (
+                max(0, y - self.window),
+                min(self.y_max, y + self.window + 1),
+                max(0, x - self.width),
+                min(self.x_max, x + self.width + 1),
             )
-            self.vertical = False
-            return Rectangle(
-                (xs, max(0, y - self.width)),
-                xe - xs - 1,
-                min(self.y_max, y + self.width + 1) - max(0, y - self.width) - 1,
-                **kwargs
+        else:
+            return (
+                max(0, x - self.window),
+                min(self.x_max, x + self.window + 1),
+                max(0, y - self.width),
+                min(self.y_max, y + self.width + 1),
             )
 
-    def scatter(self, ax: Axes, **kwargs) -> Any:
-        return ax.scatter(self.x_data, self.y_data, **kwargs)
-
-    def _collect_data(self, x_start: float, x_end: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
-        x_in = deque()
-        y_in = deque()
-        x_out = deque()
-        y_out = deque()
+    def rectangle(self, x: int, y: int, vertical: bool = False, **kwargs) -> Rectangle:
+        """
+        Area of a selection
+        """
+        start, end, low, high = self._bounds(x, y, vertical)
+        if vertical:
+            return Rectangle((low, start), high - low - 1, end - start - 1, **kwargs)
+        else:
+            return Rectangle((start, low), end - start - 1, high - low - 1, **kwargs)
 
-        for x, y in zip(self.x_data, self.y_data):
-            if x_start <= x <= x_end:
-                x_in.append(x)
-                y_in.append(y)
+    def select(self, x: int, y: int, vertical: bool = False, **kwargs) -> Rectangle:
+        start, end, low, high = self._bounds(x, y, vertical)
+        self.x_data = np.arange(start, end, 1)
+        self.y_data = self._profile(start, end, low, high, vertical=vertical)
+        self.vertical = vertical
+        return self.rectangle(x, y, vertical, **kwargs)
+
+    def profiles(self, x: np.ndarray, y: np.ndarray, vertical: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Profiles of many selections at once
+
+        Returns the offsets from the selection centers and the profiles as (N, 2 * window + 1) rows.
+        Positions outside the range select would use are NaN.
+        """
+        x = np.asarray(x, dtype=int)
+        y = np.asarray(y, dtype=int)
+        center, band = (y, x) if vertical else (x, y)
+        size, band_size = (self.y_max, self.x_max) if vertical else (self.x_max, self.y_max)
+
+        offsets = np.arange(-self.window, self.window + 1)
+        positions = center[:, None] + offsets
+        valid = (positions >= 0) & (positions < size)
+        positions = np.clip(positions, 0, max(0, size - 1))
+        low = np.maximum(0, band - self.width)[:, None]
+        high = np.minimum(band_size, band + self.width + 1)[:, None]
+
+        sums = self._sums(vertical)
+        if sums is None:
+            out = np.full(positions.shape, np.nan)
+            for i in range(len(center)):
+                start, end = max(0, center[i] - self.window), min(size, center[i] + self.window + 1)
+                out[i, start - center[i] + self.window:end - center[i] + self.window] = self._profile(
+                    start, end, low[i, 0], high[i, 0], vertical
+                )
+            return offsets, out
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if vertical:
+                out = (sums[positions, high] - sums[positions, low]) / (high - low)
             else:
-                x_out.append(x)
-                y_out.append(y)
+                out = (sums[high, positions] - sums[low, positions]) / (high - low)
+        out[~valid] = np.nan
+        return offsets, out
 
-        x_in = np.asarray(x_in)
-        x_out = np.asarray(x_out)
-        y_in = np.asarray(y_in)
-        y_out = np.asarray(y_out)
+    def scatter(self, ax: Axes, **kwargs) -> Any:
+        return ax.scatter(self.x_data, self.y_data, **kwargs)
 
-        return x_in, x_out, y_in, y_out
+    def _inside(self, x_start: float, x_end: float) -> np.ndarray:
+        return (x_start <= self.x_data) & (self.x_data <= x_end)
 
     def _bg(self, min_samples: int):
         return SMPipe(
-            transforms=[PolynomialFeatures(self.degree, include_bias=False)],
+            transforms=[self._context.transform(self.degree)],
             reg=ransac(min_samples=min_samples, max_iter=100)
         )
 
     def _fg(self):
-        return SMPipe(transforms=[PolynomialFeatures(self.degree, include_bias=False)])
+        return SMPipe(transforms=[self._context.transform(self.degree)], reg=NPAdapter())
 
     def _pipes(self, x_start: float, x_end: float, full: bool = True) -> Union[
         Tuple[SMPipe, SMPipe, np.ndarray, np.ndarray, float, float, Tuple[np.ndarray, np.ndarray]],
         Tuple[SMPipe, SMPipe],
     ]:
-        x_in, x_out, y_in, y_out = self._collect_data(x_start, x_end)
+        inside = self._inside(x_start, x_end)
+        outside = ~inside
+        features = self._context.design(self.x_data, self.degree)
+        y_in = self.y_data[inside]
+        y_out = self.y_data[outside]
 
         bg = self._bg(int(np.sqrt(len(y_out))))
         fg = self._fg()
-        bg.line.fit(x_out[..., None], y_out)
-        fg.line.fit(x_in[..., None], y_in)
+        # The regressors are fitted on the shared features, the pipes only transform on predict
+        bg.reg.fit(features[outside], y_out)
+        fg.reg.fit(features[inside], y_in)
 
         if full:
+            x_in = self.x_data[inside]
+            x_out = self.x_data[outside]
+
             nx_out: np.ndarray
             nx_in: np.ndarray
 
@@ -149,8 +275,9 @@ class DataPacket(object):
             else:
                 nx_in = np.linspace(x_in[0], x_in[-1], num=num_in)
 
-            mse_bg = mean_squared_error(y_out, bg.line.predict(x_out[..., None]))
-            mse_fg = mean_squared_error(y_in, bg.line.predict(x_in[..., None]))
+            bg_eq = bg.eq
+            mse_bg = float(np.mean(np.square(y_out - np.polyval(bg_eq, x_out))))
+            mse_fg = float(np.mean(np.square(y_in - np.polyval(bg_eq, x_in))))
 
             outliers = np.logical_not(bg.reg.inlier_mask_)
             outliers: Tuple[np.ndarray, np.ndarray] = (x_out[outliers], y_out[outliers])
@@ -159,6 +286,7 @@ class DataPacket(object):
         else:
             return bg, fg
 
+    @traced('DataPacket.fit')
     def fit(
             self,
             x_start: float,
@@ -192,12 +320,83 @@ class DataPacket(object):
                 equation=bg.eq,
                 title=bg_title,
                 mse=bg_mse,
-                line=Line2D(nx_out, bg.line.predict(nx_out[..., None]), **out_kwargs),
+                line=Line2D(nx_out, np.polyval(bg.eq, nx_out), **out_kwargs),
                 additional=add,
                 outliers=outliers
             ), Result(
                 equation=fg.eq,
                 title=fg_title,
                 mse=fg_mse,
-                line=Line2D(nx_in, fg.line.predict(nx_in[..., None]), **in_kwargs)
+                line=Line2D(nx_in, np.polyval(fg.eq, nx_in), **in_kwargs)
             )
+
+
+@dataclass(frozen=True)
+class ProfileFits:
+    """
+    Second degree background and foreground fits of many profiles
+
+    Equations are (N, 3) with the coefficients from largest to smallest.
+    Rows with fewer than four points to fit are NaN, as are their std.
+    The background std is the robust (MAD) residual scale, the foreground std that of least squares.
+    """
+    background: np.ndarray
+    foreground: np.ndarray
+    background_std: np.ndarray
+    foreground_std: np.ndarray
+
+
+def _to_absolute(params: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """
+    Equations in x from params (intercept, linear, square) in the offsets x - center
+    """
+    c, b, a = params[:, 0], params[:, 1], params[:, 2]
+    return np.column_stack((a, b - 2 * a * centers, c - b * centers + a * centers ** 2))
+
+
+def fit_profiles(
+        offsets: np.ndarray,
+        profiles: np.ndarray,
+        centers: np.ndarray,
+        x_start: np.ndarray,
+        x_end: np.ndarray,
+        norm: str = 'huber',
+) -> ProfileFits:
+    """
+    Fits every profile like DataPacket.fit with one batched solve per model
+
+    Profiles are rows at centers + offsets as returned by DataPacket.profiles, NaN values are left out.
+    The background is fitted outside [x_start, x_end] with robust reweighting instead of RANSAC,
+    the foreground inside with least squares.
+    """
+    centers = np.asarray(centers, dtype=float)
+    x = centers[:, None] + offsets
+    inside = (np.asarray(x_start)[..., None] <= x) & (x <= np.asarray(x_end)[..., None])
+    features = np.column_stack((offsets, offsets ** 2)).astype(float)
+
+    outside = ~inside & np.isfinite(profiles)
+    background = irls(features, np.where(outside, profiles, np.nan), norm=norm)
+    background_params = background.params.copy()
+    background_std = background.scale.copy()
+    # An exactly determined or underdetermined fit has no residuals to estimate its error from
+    few = outside.sum(axis=-1) < 4
+    background_params[few] = np.nan
+    background_std[few] = np.nan
+
+    valid = inside & np.isfinite(profiles)
+    a = np.where(valid[..., None], np.column_stack((np.ones(len(offsets)), features)), 0.)
+    y = np.where(valid, profiles, 0.)
+    params = (np.linalg.pinv(a) @ y[..., None])[..., 0]
+    resid = y - (a @ params[..., None])[..., 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        foreground_std = np.sqrt(np.sum(resid ** 2, axis=-1) / (valid.sum(axis=-1) - 3))
+    few = valid.sum(axis=-1) < 4
+    params[few] = np.nan
+    foreground_std[few] = np.nan
+
+    return ProfileFits(
+        background=_to_absolute(background_params, centers),
+        foreground=_to_absolute(params, centers),
+        background_std=background_std,
+        foreground_std=foreground_std,
+    )
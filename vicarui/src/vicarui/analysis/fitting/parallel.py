@@ -0,0 +1,223 @@
+"""
+Batched profile fits of a selection path in a process pool
+
+The image and its cumulative sum tables are shared with the workers through shared memory, so the tables are built
+once in this process and the workers only map them. The pool is started on first use with the forkserver or spawn
+method, never by forking the (threaded) application, and is kept for later jobs.
+Small jobs run in this process, where they are faster than the round trip to the pool.
+A sweep fits the same path for many (width, window, shadow radius) parameter sets in one job.
+"""
+import atexit
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import fields
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .fitting import DataPacket, fit_profiles
+from ...support import single_threaded
+from .second_degree import SecondDegreeBatch, analyze_2nd_deg_batch
+
+Parameters = Tuple[int, int, float]
+"""
+Selection width, window and shadow radius
+"""
+
+IN_PROCESS_PROFILES = 2048
+"""
+Jobs with fewer profiles (selections times parameter sets) than this are fitted in this process
+"""
+
+_Layout = Tuple[Tuple[int, Tuple[int, ...], str], ...]
+"""
+Offset, shape and dtype of the image and its sum tables in a shared segment
+"""
+
+_shared: Dict[str, Tuple[shared_memory.SharedMemory, DataPacket]] = dict()
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+
+
+def _context() -> multiprocessing.context.BaseContext:
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    # Workers fork from a server that imported the fitting code once
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+def _discard_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    The shared pool, restarted if the worker count changes
+    """
+    global _pool, _pool_workers
+    if _pool is not None and _pool_workers != workers:
+        _discard_pool()
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=_context(), initializer=single_threaded)
+        _pool_workers = workers
+    return _pool
+
+
+@atexit.register
+def _shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+def _share(packet: DataPacket) -> Tuple[shared_memory.SharedMemory, _Layout]:
+    """
+    Copies the image and its sum tables into one shared segment
+    """
+    tables = packet.tables
+    arrays = [np.ascontiguousarray(packet.data)] + ([] if tables is None else list(tables))
+    layout = list()
+    offset = 0
+    for a in arrays:
+        layout.append((offset, a.shape, a.dtype.str))
+        offset += -(-a.nbytes // 8) * 8
+    shm = shared_memory.SharedMemory(create=True, size=max(1, offset))
+    for a, (start, shape, dtype) in zip(arrays, layout):
+        np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)[...] = a
+    return shm, tuple(layout)
+
+
+def _attach(name: str, layout: _Layout) -> DataPacket:
+    """
+    Packet of a shared image, the previous image is released when a new one comes
+    """
+    try:
+        return _shared[name][1]
+    except KeyError:
+        for shm, _ in _shared.values():
+            shm.close()
+        _shared.clear()
+        # The pool shares the resource tracker of the creating process, which unlinks the segment
+        shm = shared_memory.SharedMemory(name=name)
+        arrays = [np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start) for start, shape, dtype in layout]
+        packet = DataPacket(arrays[0], tables=tuple(arrays[1:]) if len(arrays) == 3 else None)
+        _shared[name] = shm, packet
+        return packet
+
+
+def _fit_chunk(
+        packet: DataPacket,
+        x: np.ndarray,
+        y: np.ndarray,
+        fit_centers: np.ndarray,
+        vertical: bool,
+        parameters: Parameters,
+) -> SecondDegreeBatch:
+    width, window, radius = parameters
+    packet.configure(int(width), int(window))
+    offsets, profiles = packet.profiles(x, y, vertical)
+    fits = fit_profiles(offsets, profiles, y if vertical else x, fit_centers - radius, fit_centers + radius)
+    return analyze_2nd_deg_batch(fits.background, fits.foreground, fits.background_std, fits.foreground_std)
+
+
+def _run_chunk(image: Tuple[str, _Layout], *args) -> SecondDegreeBatch:
+    return _fit_chunk(_attach(*image), *args)
+
+
+def _concatenate(batches: List[SecondDegreeBatch]) -> SecondDegreeBatch:
+    return SecondDegreeBatch(*(
+        np.concatenate([getattr(b, f.name) for b in batches]) for f in fields(SecondDegreeBatch)
+    ))
+
+
+def sweep_path(
+        data: np.ndarray,
+        x: np.ndarray,
+        y: np.ndarray,
+        fit_centers: np.ndarray,
+        vertical: bool,
+        parameters: Iterable[Parameters],
+        workers: Optional[int] = None,
+        chunk_size: int = 64,
+        packet: DataPacket = None,
+) -> Dict[Parameters, SecondDegreeBatch]:
+    """
+    Fits the selections at x, y for every parameter set
+
+    The fit range of each selection is its fit center +- the shadow radius, along y for vertical selections.
+    Chunks of chunk_size selections run in the shared pool of `workers` processes (default: CPU count),
+    a pool broken by a dying worker is replaced and the job retried once.
+    Jobs of one worker, one chunk or fewer than IN_PROCESS_PROFILES profiles run in this process,
+    reusing the packet of the data if given.
+    """
+    parameters = list(dict.fromkeys(tuple(p) for p in parameters))
+    x = np.asarray(x, dtype=int)
+    y = np.asarray(y, dtype=int)
+    fit_centers = np.asarray(fit_centers, dtype=float)
+    chunks = [slice(i, i + chunk_size) for i in range(0, len(x), chunk_size)]
+    if len(chunks) == 0:
+        return {p: analyze_2nd_deg_batch(np.zeros((0, 3)), np.zeros((0, 3))) for p in parameters}
+
+    workers = workers or os.cpu_count() or 1
+    packet = packet if packet is not None else DataPacket(data)
+    jobs = len(chunks) * len(parameters)
+    if workers == 1 or jobs == 1 or len(x) * len(parameters) < IN_PROCESS_PROFILES:
+        return {
+            p: _concatenate([_fit_chunk(packet, x[c], y[c], fit_centers[c], vertical, p) for c in chunks])
+            for p in parameters
+        }
+
+    shm, layout = _share(packet)
+    try:
+        image = shm.name, layout
+        for attempt in range(2):
+            futures = dict()
+            try:
+                pool = _get_pool(workers)
+                for p in parameters:
+                    futures[p] = [
+                        pool.submit(_run_chunk, image, x[c], y[c], fit_centers[c], vertical, p) for c in chunks
+                    ]
+                return {p: _concatenate([f.result() for f in futures[p]]) for p in parameters}
+            except BrokenProcessPool:
+                # A worker died, the job is run once more in a new pool
+                _discard_pool()
+                if attempt != 0:
+                    raise
+            finally:
+                for f in (f for fs in futures.values() for f in fs):
+                    f.cancel()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def fit_path(
+        data: np.ndarray,
+        x: np.ndarray,
+        y: np.ndarray,
+        fit_centers: np.ndarray,
+        vertical: bool,
+        parameters: Parameters,
+        workers: Optional[int] = None,
+        chunk_size: int = 64,
+        packet: DataPacket = None,
+) -> SecondDegreeBatch:
+    """
+    Fits the selections at x, y for one parameter set, see sweep_path
+    """
+    parameters = tuple(parameters)
+    return sweep_path(data, x, y, fit_centers, vertical, [parameters], workers, chunk_size, packet)[parameters]
+
+
+__all__ = ['fit_path', 'sweep_path', 'Parameters', 'IN_PROCESS_PROFILES']
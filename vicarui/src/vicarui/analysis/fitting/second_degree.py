@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from typing import Tuple
 
 import numpy as np
@@ -21,7 +22,7 @@ def error_estimate_for_y(bg: SMPipe, fg: SMPipe):
 
     SQRT(SCALE) ~ STD Error of Prediction
     """
-    return np.sqrt(bg.base.result_.scale + fg.base.result_.scale)
+    return np.sqrt(bg.base.std_ ** 2 + fg.base.std_ ** 2)
 
 
 def contrast_2nd_deg(eq1: np.ndarray, eq2: np.ndarray) -> Tuple[float, float]:
@@ -114,6 +115,109 @@ def additional_2nd_deg_info(bg: SMPipe, fg: SMPipe) -> Tuple[str, np.ndarray]:
     return out, roots
 
 
+def _difference(eq1: np.ndarray, eq2: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    equation = np.atleast_2d(np.asarray(eq1, dtype=float) - np.asarray(eq2, dtype=float))
+    a, b, c = equation[:, 0], equation[:, 1], equation[:, 2]
+    return a, b, c, b * b - 4 * a * c
+
+
+def roots_2nd_deg_batch(eq1: np.ndarray, eq2: np.ndarray) -> np.ndarray:
+    """
+    Equation coefficients from largest to smallest as (N, 3) stacks
+
+    Returns (N, 2) roots from largest to smallest, NaN where the roots are not real
+    """
+    a, b, c, disc = _difference(eq1, eq2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # The form without cancellation between -b and the root of the discriminant
+        q = -0.5 * (b + np.copysign(np.sqrt(disc), b))
+        first = q / a
+        second = np.where(q == 0, 0., c / q)
+    roots = np.sort(np.column_stack((first, second)), axis=1)[:, ::-1]
+    roots[(disc < 0) | (a == 0)] = np.nan
+    return roots
+
+
+def contrast_2nd_deg_batch(eq1: np.ndarray, eq2: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Equation coefficients from largest to smallest as (N, 3) stacks
+
+    Returns the positions and distances of the extrema, NaN where the roots are not real
+    """
+    a, b, c, disc = _difference(eq1, eq2)
+    valid = (disc >= 0) & (a != 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_val = np.where(valid, -0.5 * b / a, np.nan)
+        d = np.where(valid, c - 0.25 * b * b / a, np.nan)
+    return x_val, d
+
+
+def integrate_2nd_deg_batch(eq1: np.ndarray, eq2: np.ndarray) -> np.ndarray:
+    """
+    Equation coefficients from largest to smallest as (N, 3) stacks
+
+    Returns the areas between the curves, -a (x_1 - x_0)^3 / 6 with the root distance sqrt(disc) / |a|
+    """
+    a, _, _, disc = _difference(eq1, eq2)
+    valid = (disc >= 0) & (a != 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(valid, -np.sign(a) * np.power(np.abs(disc), 1.5) / (6 * a * a), np.nan)
+
+
+def integral_error_2nd_deg_batch(eq1: np.ndarray, eq2: np.ndarray, contrast_error: np.ndarray) -> np.ndarray:
+    """
+    Root distance times the contrast error for (N, 3) stacks
+    """
+    a, _, _, disc = _difference(eq1, eq2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where((disc >= 0) & (a != 0), np.sqrt(np.abs(disc)) / np.abs(a), np.nan) * contrast_error
+
+
+@dataclass(frozen=True)
+class SecondDegreeBatch:
+    """
+    Shadow analytics for N equation pairs, NaN where the curves do not cross twice
+    """
+    roots: np.ndarray
+    arg_max: np.ndarray
+    contrast: np.ndarray
+    integral: np.ndarray
+    contrast_error: np.ndarray
+    integral_error: np.ndarray
+
+
+def analyze_2nd_deg_batch(
+        bg: np.ndarray,
+        fg: np.ndarray,
+        bg_std: np.ndarray = None,
+        fg_std: np.ndarray = None,
+) -> SecondDegreeBatch:
+    """
+    Roots, extrema, integrals and their errors for (N, 3) stacks of background and foreground equations
+
+    The errors combine the standard errors of prediction like contrast_error_2nd_deg, NaN if not given.
+    """
+    a, b, c, disc = _difference(bg, fg)
+    valid = (disc >= 0) & (a != 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        width = np.where(valid, np.sqrt(np.abs(disc)) / np.abs(a), np.nan)
+        arg_max = np.where(valid, -0.5 * b / a, np.nan)
+        contrast = np.where(valid, c - 0.25 * b * b / a, np.nan)
+    roots = roots_2nd_deg_batch(bg, fg)
+    if bg_std is None or fg_std is None:
+        contrast_error = np.full(len(a), np.nan)
+    else:
+        contrast_error = np.sqrt(np.square(bg_std) + np.square(fg_std)) * np.ones(len(a))
+    return SecondDegreeBatch(
+        roots=roots,
+        arg_max=arg_max,
+        contrast=contrast,
+        integral=-a * width ** 3 / 6,
+        contrast_error=contrast_error,
+        integral_error=width * contrast_error,
+    )
+
+
 __all__ = [
     'roots_2nd_deg',
     'integral_error_2nd_deg',
@@ -121,5 +225,11 @@ __all__ = [
     'integrate_2nd_deg',
     'contrast_2nd_deg',
     'error_estimate_for_y',
-    'additional_2nd_deg_info'
+    'additional_2nd_deg_info',
+    'roots_2nd_deg_batch',
+    'contrast_2nd_deg_batch',
+    'integrate_2nd_deg_batch',
+    'integral_error_2nd_deg_batch',
+    'analyze_2nd_deg_batch',
+    'SecondDegreeBatch',
 ]
@@ -2,6 +2,7 @@ from .autoanalyzer import auto
 from .config import get_config
 from .geometry import view_geometry
 from .labels import view_labels
+from .mask import background_mask
 from .set_info import set_info
 
 
@@ -13,4 +14,4 @@ def get_additional_functions():
     }
 
 
-__all__ = ['get_config', 'view_labels', 'view_geometry', 'set_info', 'auto']
+__all__ = ['get_config', 'view_labels', 'view_geometry', 'set_info', 'auto', 'background_mask']
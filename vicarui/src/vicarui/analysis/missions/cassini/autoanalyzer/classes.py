@@ -1,11 +1,16 @@
-from collections import Generator
+from collections.abc import Generator
 from dataclasses import dataclass
-from typing import Any
+from itertools import product
+from typing import Any, List, Optional
 
 from ..config import *
 from ..funcs import norm
 from ..helpers import ImageHelper, Transformer
-from ....fitting import DataPacket, contrast_2nd_deg, integrate_2nd_deg, contrast_error_2nd_deg, integral_error_2nd_deg
+from .....support import traced
+from ....fitting import (
+    DataPacket, contrast_2nd_deg, integrate_2nd_deg, contrast_error_2nd_deg, integral_error_2nd_deg,
+    SecondDegreeBatch, fit_path, sweep_path,
+)
 
 
 @dataclass(frozen=False)
@@ -63,6 +68,7 @@ class AutoFit:
         self.dist = (np.abs(self.start_x - x), np.abs(self.start_y - y))
         return self.packet.select(x, y, vertical)
 
+    @traced('autofit')
     def fit(self, x: float, y: float) -> Fit:
         bg, fg = self.packet.fit(x, y, simple=True)
         c_err = contrast_error_2nd_deg(bg.pipe, fg.pipe)
@@ -90,39 +96,111 @@ class FitHelper:
         self.shadow = norm(helper.trpf(SUN_ID))[0:2]
         self.im_helper = helper
 
-    def __call__(self, s: Selection) -> Generator[Tuple[Any, Fit]]:
-        self.packet.configure(s.width, s.window)
-
-        iterations = s.length
-        radius = s.shadow_radius
-        vertical = s.is_vertical
-
+    def _path(self, s: Selection) -> List[Tuple[float, float]]:
+        """
+        Selection positions along the shadow starting from the initial position
+        """
         shadow = self.shadow
         initial = s.initial_position
-
-        autofit = self.autofit
-        autofit.start_x, autofit.start_y = s.target_position
-
-        if vertical:
+        path = list()
+        if s.is_vertical:
             for i in range(
                     int(initial[0]),
-                    int(initial[0] + iterations * np.sign(shadow[0])),
+                    int(initial[0] + s.length * np.sign(shadow[0])),
                     int(1 * np.sign(shadow[0]))
             ):
-                rect = autofit.select(int(initial[0]), int(initial[1]), vertical)
-                fit = autofit.fit(initial[1] - radius, initial[1] + radius)
-                yield rect, fit
+                path.append(initial)
                 initial = (i, initial[1] + shadow[1] * np.abs(1 / shadow[0]))
         else:
             for i in range(
                     int(initial[1]),
-                    int(initial[1] + iterations * np.sign(shadow[1])),
+                    int(initial[1] + s.length * np.sign(shadow[1])),
                     int(1 * np.sign(shadow[1]))
             ):
-                rect = autofit.select(int(initial[0]), int(initial[1]))
-                fit = autofit.fit(initial[0] - radius, initial[0] + radius)
-                yield rect, fit
+                path.append(initial)
                 initial = (initial[0] + shadow[0] * np.abs(1 / shadow[1]), i)
+        return path
+
+    def __call__(self, s: Selection) -> Generator[Tuple[Any, Fit]]:
+        self.packet.configure(s.width, s.window)
+
+        radius = s.shadow_radius
+        vertical = s.is_vertical
+
+        autofit = self.autofit
+        autofit.start_x, autofit.start_y = s.target_position
+
+        for position in self._path(s):
+            rect = autofit.select(int(position[0]), int(position[1]), vertical)
+            center = position[1] if vertical else position[0]
+            fit = autofit.fit(center - radius, center + radius)
+            yield rect, fit
+
+    @staticmethod
+    def _fits(s: Selection, x: np.ndarray, y: np.ndarray, result: SecondDegreeBatch) -> List[Fit]:
+        start_x, start_y = s.target_position
+        return [
+            Fit(
+                arg_max=result.arg_max[i],
+                contrast=result.contrast[i],
+                integral=result.integral[i],
+                distance_px=(np.abs(start_x - x[i]), np.abs(start_y - y[i])),
+                contrast_error=result.contrast_error[i],
+                integral_error=result.integral_error[i],
+            )
+            for i in range(len(x))
+        ]
+
+    def _batch_path(self, s: Selection) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        path = np.asarray(self._path(s), dtype=float).reshape(-1, 2)
+        return path[:, 0].astype(int), path[:, 1].astype(int), path[:, 1] if s.is_vertical else path[:, 0]
+
+    @traced('autofit.batch')
+    def batch(self, s: Selection, workers: Optional[int] = 1, **kwargs) -> List[Tuple[Any, Fit]]:
+        """
+        Same selections and fits as calling the helper, with the profiles extracted and fitted all at once
+
+        The background is fitted with robust reweighting instead of RANSAC.
+        Long paths are fitted in chunks by a pool of `workers` processes (None for CPU count),
+        kwargs are passed to the rectangles.
+        """
+        self.packet.configure(s.width, s.window)
+        x, y, fit_centers = self._batch_path(s)
+        result = fit_path(
+            self.data,
+            x,
+            y,
+            fit_centers,
+            s.is_vertical,
+            (s.width, s.window, s.shadow_radius),
+            workers=workers,
+            packet=self.packet,
+        )
+        return [
+            (self.packet.rectangle(x[i], y[i], s.is_vertical, **kwargs), fit)
+            for i, fit in enumerate(self._fits(s, x, y, result))
+        ]
+
+    @traced('autofit.sweep')
+    def sweep(
+            self,
+            s: Selection,
+            widths: Iterable[int],
+            windows: Iterable[int],
+            radii: Iterable[float],
+            workers: Optional[int] = None,
+    ) -> Dict[Tuple[int, int, float], List[Fit]]:
+        """
+        Fits along the path of the selection for every combination of width, window and shadow radius
+
+        All parameter sets are fitted in one process pool job, returns the fits by (width, window, radius).
+        """
+        x, y, fit_centers = self._batch_path(s)
+        parameters = list(product(widths, windows, radii))
+        results = sweep_path(
+            self.data, x, y, fit_centers, s.is_vertical, parameters, workers=workers, packet=self.packet
+        )
+        return {p: self._fits(s, x, y, results[p]) for p in parameters}
 
 
 __all__ = [
@@ -1,6 +1,6 @@
-from collections import Generator
+from collections.abc import Generator
 from functools import partial
-from typing import Any
+from typing import Any, NoReturn
 
 from PySide2.QtCore import Qt
 from PySide2.QtGui import QDoubleValidator, QIntValidator
@@ -15,7 +15,24 @@ from .show import show
 from ..config import *
 from ..helpers import ImageHelper
 from ....common import load_kernels_for_image, release_kernels
-from .....support import modal, sci_2
+from .....support import modal, sci_2, span, Task, Tasker, Priority, typedsignal, scheduler
+
+
+class FitTask(Task):
+    """
+    Batched fits of a selection path, done emits the (rectangle, fit) pairs
+    """
+    done = typedsignal(list)
+
+    def __init__(self, helper: FitHelper, s: Selection):
+        super(FitTask, self).__init__()
+        self.helper = helper
+        self.selection = s
+
+    def run(self) -> NoReturn:
+        fits = self.helper.batch(self.selection, workers=None, color='blue', alpha=0.1)
+        self.check()
+        self.done.emit(fits)
 
 
 def auto(*_, image: ImageWrapper = None, **config):
@@ -93,9 +110,7 @@ def auto(*_, image: ImageWrapper = None, **config):
                     p.set_ylabel(r"$\dfrac{I}{F}$", rotation=0)
 
         fig.set_tight_layout('true')
-        imdata = helper.data.copy().astype('float64')
-        imdata[np.logical_not(np.isfinite(imdata))] = np.average(imdata[np.isfinite(imdata)])
-        imdata = image.normalize(imdata)
+        imdata = image.display
         data_ax.imshow = partial(
             data_ax.imshow,
             imdata,
@@ -107,7 +122,7 @@ def auto(*_, image: ImageWrapper = None, **config):
         )
         data_ax.imshow()
 
-        def rect_intercept(gen: Generator[Tuple[Any, Fit]]) -> Generator[Fit]:
+        def rect_intercept(gen: Iterable[Tuple[Any, Fit]]) -> Generator[Fit]:
             for t in gen:
                 rect: Rectangle = t[0]
                 if rect.get_width() == 0:
@@ -164,26 +179,35 @@ def auto(*_, image: ImageWrapper = None, **config):
         length.setPlaceholderText("length")
         radius.setPlaceholderText("Shadow Radius")
 
-        def make_visible(vertical: bool):
+        fit_vertical = QPushButton("Fit Vertical")
+        fit_horizontal = QPushButton("Fit Horizontal")
+        key = ('autofit', id(d))
+
+        def show_fits(task: FitTask, fits: List[Tuple[Any, Fit]]):
+            if task.cancelled:
+                return
             clim = data_ax.get_images()[0].get_clim()
             data_ax.clear()
             clear_subs()
             data_ax.imshow()
             data_ax.get_images()[0].set_clim(clim)
-            s = to_selection(vertical)
-            log.info(f'ID: {helper.im_helper.id} BG: {image.degree if image.has_background else 0}')
-            log.info(f'Selection: {s}')
             show(
                 helper.im_helper,
-                rect_intercept(helper(s)),
+                rect_intercept(fits),
                 plots,
                 disable_fitting=cfg[DISABLE_FITTING]
             )
-            agg.draw()
-            agg.flush_events()
+            with span('draw'):
+                agg.draw()
+                agg.flush_events()
 
-        fit_vertical = QPushButton("Fit Vertical")
-        fit_horizontal = QPushButton("Fit Horizontal")
+        def make_visible(vertical: bool):
+            s = to_selection(vertical)
+            log.info(f'ID: {helper.im_helper.id} BG: {image.degree if image.has_background else 0}')
+            log.info(f'Selection: {s}')
+            task = FitTask(helper, s)
+            task.done.connect(partial(show_fits, task))
+            Tasker.run(task, priority=Priority.HIGH, key=key)
 
         for c in [
             width,
@@ -231,6 +255,8 @@ def auto(*_, image: ImageWrapper = None, **config):
         fit_vertical.clicked.connect(lambda _: make_visible(True))
         fit_horizontal.clicked.connect(lambda _: make_visible(False))
 
+        d.finished.connect(lambda _: scheduler().cancel(key))
+
         fig.set_tight_layout('true')
 
         d.exec_()
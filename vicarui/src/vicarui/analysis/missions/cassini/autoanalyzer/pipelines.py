@@ -1,15 +1,21 @@
-import statsmodels.api as sm
 from sklearn.compose import TransformedTargetRegressor
 from sklearn.linear_model import RANSACRegressor
 from sklearn.preprocessing import FunctionTransformer, PolynomialFeatures
 
 from .classes import *
 from ..config import *
-from .....support import Pipe, SMAdapter, Powerlaw, PipeStr, partial_cls
+from .....support import Pipe, NPAdapter, IRLSAdapter, BatchRANSAC, WrapperRegressor, Powerlaw, PipeStr
 
 
 def get_pipes(fits: List[Fit]):
     def make_sac(base, max_trials=500):
+        if isinstance(base, WrapperRegressor):
+            return BatchRANSAC(
+                random_state=0,
+                max_trials=max_trials,
+                min_samples=int(np.sqrt(len(fits))),
+                estimator=base,
+            )
         return RANSACRegressor(
             random_state=0,
             max_trials=max_trials,
@@ -24,7 +30,7 @@ def get_pipes(fits: List[Fit]):
             color="blue",
             style="-",
             title=r"$\frac{k}{x} + B$",
-            reg=make_sac(SMAdapter()),
+            reg=make_sac(NPAdapter()),
             transforms=[
                 FunctionTransformer(np.reciprocal, np.reciprocal),
             ],
@@ -35,7 +41,7 @@ def get_pipes(fits: List[Fit]):
             color="blue",
             style="-",
             title=r"$\frac{k}{x}$""\n",
-            reg=make_sac(SMAdapter(fit_intercept=False)),
+            reg=make_sac(NPAdapter(fit_intercept=False)),
             transforms=[
                 FunctionTransformer(np.reciprocal, np.reciprocal),
             ],
@@ -47,7 +53,7 @@ def get_pipes(fits: List[Fit]):
             style="-",
             title=r"$y = \exp(A) \cdot x^k$ (ln, ransac)",
             reg=make_sac(TransformedTargetRegressor(
-                regressor=make_sac(SMAdapter()),
+                regressor=make_sac(NPAdapter()),
                 func=np.log,
                 inverse_func=np.exp
             )),
@@ -63,7 +69,7 @@ def get_pipes(fits: List[Fit]):
             style="-",
             title=r"$\log y = k\cdot\log x$ RLM",
             reg=TransformedTargetRegressor(
-                regressor=SMAdapter(model_cls=partial_cls(sm.RLM, M=sm.robust.norms.HuberT())),
+                regressor=IRLSAdapter(norm='huber'),
                 func=np.log,
                 inverse_func=np.exp
             ),
@@ -77,7 +83,7 @@ def get_pipes(fits: List[Fit]):
             color="green",
             style="-",
             title=r"$\frac{k}{x^2} + \frac{a}{x} + B$",
-            reg=make_sac(SMAdapter()),
+            reg=make_sac(NPAdapter()),
             transforms=[
                 FunctionTransformer(np.reciprocal, np.reciprocal),
                 PolynomialFeatures(degree=2, include_bias=False)
@@ -89,7 +95,7 @@ def get_pipes(fits: List[Fit]):
             color="cyan",
             style="-",
             title=r"$y = A \cdot x^k$ (Weighted)",
-            reg=Powerlaw(max_iter=1000),
+            reg=Powerlaw(max_iter=1000, warm_start=True),
             display_style=PipeStr.DELEGATE,
             needs_errors=True
         ),
@@ -99,7 +105,7 @@ def get_pipes(fits: List[Fit]):
             color="cyan",
             style="-",
             title=r"$y = A \cdot x^k$",
-            reg=Powerlaw(max_iter=1000),
+            reg=Powerlaw(max_iter=1000, warm_start=True),
             display_style=PipeStr.DELEGATE,
             needs_errors=False
         ),
@@ -109,7 +115,7 @@ def get_pipes(fits: List[Fit]):
         #     color="black",
         #     style="-",
         #     title=r"$y = kx + A$",
-        #     reg=make_sac(SMAdapter(fit_intercept=True), max_trials=300),
+        #     reg=make_sac(NPAdapter(fit_intercept=True), max_trials=300),
         #     display_style=PipeStr.KAB,
         #     needs_errors=False
         # ),
@@ -1,4 +1,4 @@
-from collections import Generator
+from collections.abc import Generator
 from typing import NoReturn
 
 from matplotlib.pyplot import Axes
@@ -8,7 +8,7 @@ from .classes import *
 from .pipelines import get_pipes
 from ..config import *
 from ..helpers import ImageHelper
-from .....support import sci_4
+from .....support import sci_4, span
 
 
 def show(
@@ -45,8 +45,9 @@ def show(
         ax.fill_between(dist_, data_ - err_, data_ + err_, color="gray", alpha=0.1)
         if canvas_ is None:
             canvas_ = ax.figure.canvas
-    canvas_.draw()
-    canvas_.flush_events()
+    with span('draw'):
+        canvas_.draw()
+        canvas_.flush_events()
 
     if not disable_fitting:
         from warnings import catch_warnings, filterwarnings
@@ -109,8 +110,9 @@ def show(
                             pass
                     except Exception as e:
                         log.exception("Failed a regression analysis", exc_info=e)
-    ax.figure.canvas.draw()
-    ax.figure.canvas.flush_events()
+    with span('draw'):
+        ax.figure.canvas.draw()
+        ax.figure.canvas.flush_events()
     log.info("done")
 
 
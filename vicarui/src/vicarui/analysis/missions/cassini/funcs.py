@@ -2,7 +2,7 @@ from functools import cache
 
 from .config import *
 from .helpers import *
-from ....support import looping_pairs
+from ....support import looping_pairs, disc_mask
 
 
 def _image_size(corners: np.ndarray) -> Tuple[float, float]:
@@ -143,13 +143,10 @@ def get_camera_intersects(helper: ImageHelper):
 
 
 def target_estimate(image: ImageWrapper, helper: ImageHelper) -> Tuple[float, float]:
-    raw = helper.image
-
     t_pos = helper.crpf(helper.target_id)
     frame_name, bore, boundaries = helper.fbb
 
-    x_len = len(raw.data[0])
-    y_len = len(raw.data[0][0])
+    x_len, y_len = image.original_shape
 
     x = 0
     y = 0
@@ -159,9 +156,7 @@ def target_estimate(image: ImageWrapper, helper: ImageHelper) -> Tuple[float, fl
     y += np.arctan(t_pos[1] / t_pos[2]) / np.arctan(b[1] / b[2]) * y_len / 2. * np.sign(t_pos[1])
 
     if image.invalid_indices is not None:
-        for i in image.invalid_indices[::-1]:
-            if i <= y:
-                y -= 1
+        y -= np.count_nonzero(image.invalid_indices <= y)
 
     if image.border != 0:
         log.debug(f"Border detected: {image.border}")
@@ -174,6 +169,19 @@ def target_estimate(image: ImageWrapper, helper: ImageHelper) -> Tuple[float, fl
     return x, y
 
 
+def target_mask(image: ImageWrapper, helper: ImageHelper, margin: float = 1.25) -> np.ndarray:
+    """
+    Mask of the cropped image that is False on the target disc
+
+    The disc is at the target estimate with the target radius in pixels at the target distance times margin.
+    """
+    km_per_px = np.average(helper.per_px(helper.size_at_target))
+    radius = helper.target_radii / km_per_px * margin
+    x, y = target_estimate(image, helper)
+    log.debug(f"Target disc at {x:.1f},{y:.1f} radius {radius:.1f} px")
+    return disc_mask(image.shape, (x, y), radius)
+
+
 __all__ = [
     'norm',
     'rs',
@@ -183,5 +191,6 @@ __all__ = [
     'img_rp_size',
     'img_raw_size',
     'img_sp_size',
-    'target_estimate'
+    'target_estimate',
+    'target_mask',
 ]
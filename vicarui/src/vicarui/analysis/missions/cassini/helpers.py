@@ -2,6 +2,7 @@ from functools import cached_property
 from typing import Callable
 
 import spiceypy
+from vicarutil.image import SystemLabel
 
 from .config import *
 
@@ -269,11 +270,11 @@ class ImageHelper:
 
     @property
     def y_max(self) -> int:
-        return len(self.image.data[0])
+        return self.image.labels.vsl(SystemLabel.NL)
 
     @property
     def x_max(self) -> int:
-        return len(self.image.data[0][0])
+        return self.image.labels.vsl(SystemLabel.NS)
 
     @cached_property
     def size_at_shadow(self) -> Tuple[float, float]:
@@ -0,0 +1,24 @@
+from typing import Optional
+
+from .config import *
+from .funcs import target_mask
+from .helpers import ImageHelper
+from ...common import load_kernels_for_image, release_kernels
+
+
+def background_mask(image: ImageWrapper) -> Optional[np.ndarray]:
+    """
+    Leaves the target disc out of the background fit
+    """
+    raw = image.raw
+    try:
+        load_kernels_for_image(raw)
+        return target_mask(image, ImageHelper(raw))
+    except Exception as e:
+        log.warning("Failed to mask the target: %s", raw.name, exc_info=e)
+        return None
+    finally:
+        release_kernels()
+
+
+__all__ = ['background_mask']
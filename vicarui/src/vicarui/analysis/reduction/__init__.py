@@ -1 +1 @@
-from .reduction import br_reduction
+from .reduction import br_reduction, background_engines, fit_mask
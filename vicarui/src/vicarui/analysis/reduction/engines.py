@@ -0,0 +1,183 @@
+"""
+Non-parametric background engines
+
+Every engine takes the cropped image and returns the background surface, outliers are found with the same
+MAD threshold as in the polynomial fit. Filters run in horizontal tiles in a thread pool,
+one tile per thread the process may use (see thread_count).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable, Dict, Optional
+
+import numpy as np
+from scipy import ndimage
+from scipy.interpolate import RectBivariateSpline
+
+from ...support import PolynomialBackground, thread_count
+
+
+@dataclass(frozen=True)
+class BackgroundResult:
+    """
+    Background surface with its mse and inlier mask, model is set for polynomial backgrounds
+
+    Preview results come from a coarse fit and are refined later.
+    """
+    background: np.ndarray
+    mse: float
+    inliers: np.ndarray
+    model: Optional[PolynomialBackground] = None
+    preview: bool = False
+
+    @property
+    def outliers(self) -> np.ndarray:
+        """Outliers as a masked array where the inliers are masked"""
+        return np.ma.masked_where(self.inliers, self.inliers)
+
+
+def evaluate(img: np.ndarray, background: np.ndarray, mask: np.ndarray = None) -> BackgroundResult:
+    """
+    Result for a background surface of the image
+
+    The mse and the MAD threshold are taken over the pixels where the mask is True, the inliers cover every pixel.
+    """
+    residual = img - background
+    fitted = img if mask is None else img[mask]
+    mse = float(np.mean(np.square(residual if mask is None else residual[mask])))
+    inliers = np.abs(residual) <= np.median(np.abs(fitted - np.median(fitted)))
+    return BackgroundResult(background=background, mse=mse, inliers=inliers)
+
+
+def tiled(
+        func: Callable[[np.ndarray], np.ndarray],
+        img: np.ndarray,
+        halo: int,
+        tiles: int = None,
+) -> np.ndarray:
+    """
+    Applies a filter on row tiles in threads, tiles overlap by halo rows so the result matches one full call
+
+    The default tile count is thread_count(), one tile in reduce workers.
+    """
+    tiles = min(tiles or thread_count(), max(1, len(img) // max(1, 2 * halo)))
+    if tiles <= 1:
+        return func(img)
+    edges = np.linspace(0, len(img), tiles + 1, dtype=int)
+    out = np.empty(img.shape, dtype=np.result_type(img, 1.))
+
+    def run(i: int):
+        start, end = edges[i], edges[i + 1]
+        low, high = max(0, start - halo), min(len(img), end + halo)
+        out[start:end] = func(img[low:high])[start - low:start - low + end - start]
+
+    with ThreadPoolExecutor(max_workers=tiles) as pool:
+        list(pool.map(run, range(tiles)))
+    return out
+
+
+def median_background(img: np.ndarray, size: int = 31, percentile: float = 50, tiles: int = None) -> np.ndarray:
+    """
+    Separable percentile filter, along the rows and then the columns
+    """
+    img = np.asarray(img, dtype=np.result_type(img, 1.))
+    rows = tiled(lambda t: ndimage.percentile_filter(t, percentile, size=(1, size), mode='reflect'), img, 0, tiles)
+    return tiled(lambda t: ndimage.percentile_filter(t, percentile, size=(size, 1), mode='reflect'), rows, size, tiles)
+
+
+def block_medians(img: np.ndarray, block: int):
+    """
+    Medians of blocks of the image and the block centers, partial edge blocks use their valid pixels
+    """
+    n, m = -(-img.shape[0] // block), -(-img.shape[1] // block)
+    padded = np.full((n * block, m * block), np.nan)
+    padded[:img.shape[0], :img.shape[1]] = img
+    medians = np.nanmedian(padded.reshape(n, block, m, block).swapaxes(1, 2).reshape(n, m, -1), axis=-1)
+    rows, cols = (
+        (starts + np.minimum(starts + block, size) - 1) / 2
+        for starts, size in ((np.arange(n) * block, img.shape[0]), (np.arange(m) * block, img.shape[1]))
+    )
+    return rows, cols, medians
+
+
+def _spline(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, shape, smoothing: float) -> np.ndarray:
+    missing = np.isnan(values)
+    if missing.all():
+        raise ValueError("No background pixels")
+    if missing.any():
+        # Fully masked blocks take the value of the nearest block
+        values = values[tuple(ndimage.distance_transform_edt(missing, return_distances=False, return_indices=True))]
+    kx, ky = min(3, len(rows) - 1), min(3, len(cols) - 1)
+    if kx < 1 or ky < 1:
+        return np.full(shape, np.mean(values))
+    spline = RectBivariateSpline(
+        rows, cols, values, kx=kx, ky=ky, s=smoothing,
+        bbox=[min(0, rows[0]), max(shape[0] - 1, rows[-1]), min(0, cols[0]), max(shape[1] - 1, cols[-1])]
+    )
+    return spline(np.arange(shape[0]), np.arange(shape[1]))
+
+
+def block_background(img: np.ndarray, block: int = 32) -> np.ndarray:
+    """
+    Block medians upsampled with bicubic interpolation
+    """
+    rows, cols, medians = block_medians(img, block)
+    return _spline(rows, cols, medians, img.shape, 0)
+
+
+def spline_background(img: np.ndarray, grid: int = 16, smoothing: float = None) -> np.ndarray:
+    """
+    Smoothing spline surface on block medians of a coarse grid
+
+    The default smoothing is the number of nodes times the robust variance of the differences between neighbouring nodes.
+    """
+    block = max(1, -(-max(img.shape) // grid))
+    rows, cols, medians = block_medians(img, block)
+    if smoothing is None:
+        diff = np.diff(medians, axis=1).ravel() if medians.shape[1] > 1 else np.zeros(1)
+        diff = diff[np.isfinite(diff)] if np.isfinite(diff).any() else np.zeros(1)
+        sigma = 1.4826 * np.median(np.abs(diff - np.median(diff))) / np.sqrt(2)
+        smoothing = medians.size * sigma ** 2
+    return _spline(rows, cols, medians, img.shape, smoothing)
+
+
+ENGINES: Dict[str, Callable[..., np.ndarray]] = {
+    'median': median_background,
+    'percentile': partial(median_background, percentile=25),
+    'block': block_background,
+    'spline': spline_background,
+}
+"""
+Non-parametric engines by name, the polynomial fit is in br_reduction
+"""
+
+MASKED_ENGINES = {'block', 'spline'}
+"""
+Engines that leave out masked pixels, the filters use every pixel
+"""
+
+
+def fit_background(img: np.ndarray, engine: str, mask: np.ndarray = None, **kwargs) -> BackgroundResult:
+    """
+    Background of the image with a named non-parametric engine
+
+    Pixels where the mask is False are left out of the block medians and the mse.
+    """
+    data = img
+    if mask is not None and engine in MASKED_ENGINES:
+        data = np.where(mask, img, np.nan)
+    return evaluate(img, ENGINES[engine](data, **kwargs), mask)
+
+
+__all__ = [
+    'BackgroundResult',
+    'ENGINES',
+    'MASKED_ENGINES',
+    'fit_background',
+    'evaluate',
+    'tiled',
+    'median_background',
+    'block_background',
+    'spline_background',
+    'block_medians',
+]
@@ -1,22 +1,163 @@
-from typing import NoReturn
+from typing import NoReturn, Optional, Callable, Dict, Any, Tuple
 
 import numpy as np
-from sklearn.metrics import mean_squared_error
-from sklearn.pipeline import make_pipeline
-from sklearn.preprocessing import PolynomialFeatures
 
+from .engines import BackgroundResult, ENGINES, fit_background
 from ...logging import handle_exception, info
-from ...support import SMAdapter, ransac, ImageWrapper
+from ...support import ImageWrapper, Cancelled, basis_cache, background_store, content_hash, region_mask, traced
 
+MAX_SAMPLES = 1 << 16
+"""
+Pixels used for fitting the background, larger images are subsampled
+"""
 
+PREVIEW_SAMPLES = 1 << 12
+"""
+Pixels used for the coarse preview fit
+"""
+
+POLYNOMIAL = 'polynomial'
+"""
+Name of the RANSAC polynomial engine
+"""
+
+ENGINE_VERSION = 2
+"""
+Version of the background fit, stored backgrounds of other versions are not used
+"""
+
+
+def background_engines():
+    """
+    Names of the background engines, the polynomial fit first
+    """
+    return [POLYNOMIAL, *ENGINES]
+
+
+def params_key(params: Dict[str, Any] = None) -> Tuple[Tuple[str, Any], ...]:
+    """
+    Hashable form of engine parameters, compared to decide whether a background is refitted
+    """
+    return tuple(sorted((params or dict()).items()))
+
+
+def fit_mask(image: ImageWrapper, target: bool = False) -> Optional[np.ndarray]:
+    """
+    Pixels of the cropped image to fit the background on, None for every pixel
+
+    Leaves out the user exclusions of the image and with target the mission background_mask.
+    The target mask is computed once per border and mission and cached on the image.
+    """
+    from .. import background_mask, get_mission
+    mask = None
+    if target:
+        mask = image.cached('target_mask', (image.border, get_mission()), lambda: background_mask(image))
+    if len(image.exclusions) != 0:
+        regions = region_mask(image.shape, image.exclusions)
+        mask = regions if mask is None else mask & regions
+    return mask
+
+
+def fit_polynomial(
+        image: ImageWrapper,
+        degree: int = 3,
+        max_samples: int = MAX_SAMPLES,
+        mask: np.ndarray = None,
+        preview_samples: int = None,
+        check: Callable[[], None] = None,
+) -> BackgroundResult:
+    """
+    RANSAC polynomial background of the cropped image
+
+    The fit uses a stratified subsample of at most max_samples pixels where the mask is True,
+    the surface is evaluated on the full image from its coefficients and the mse over the masked pixels.
+    The sample and its polynomial basis are cached per shape, border and mask, see basis_cache.
+    Fits are read from and written to the background_store if one is set.
+
+    With preview_samples a fit missing from the store is done on that many pixels and not stored.
+    The check callable is called during the fit and may raise to abort it.
+    """
+    border = image.border
+    img: np.ndarray = image.cropped
+
+    store = background_store()
+    mask_key = content_hash(mask) if mask is not None else None
+    key = image.content_hash, img.shape, border, degree, max_samples, mask_key, ENGINE_VERSION
+    stored = store.get(key) if store is not None else None
+    if stored is not None:
+        info("Background from store")
+        background = stored.background
+        return BackgroundResult(background=background.evaluate(), mse=stored.mse, inliers=stored.inliers, model=background)
+
+    preview = preview_samples is not None and preview_samples < max_samples
+    samples = preview_samples if preview else max_samples
+    basis = basis_cache().get(img.shape, border, degree, samples, mask=mask)
+    values = img[basis.rows, basis.cols]
+    est = basis.fit(values, degree, min_samples=int(np.sqrt(len(values))), max_trials=100, check=check)
+    background = est.background
+
+    surface = background.evaluate()
+    residual = img - surface
+    mse = float(np.mean(np.square(residual if mask is None else residual[mask])))
+    # Same MAD threshold RANSAC used on the samples
+    inlier_mask = np.abs(residual) <= np.median(np.abs(values - np.median(values)))
+    del residual
+    if store is not None and not preview:
+        store.put(key, background, mse, inlier_mask)
+
+    n = '\n'
+    info(f"Background mse: {mse:.5e} on {len(values)} pixels in {est.n_trials} trials")
+    info(
+        f"Bacground (model direct):"
+        f"\n- Coef:       {str(est.coef_).replace(n, '')}"
+        f"\n- Intercept:  {str(est.intercept_).replace(n, '')}"
+        f"\n- Errors:     {str(est.errors_).replace(n, '')}"
+    )
+    return BackgroundResult(background=surface, mse=mse, inliers=inlier_mask, model=background, preview=preview)
+
+
+def apply_background(
+        image: ImageWrapper,
+        result: BackgroundResult,
+        degree: int,
+        engine: str = POLYNOMIAL,
+        mask_key: str = None,
+        params: Dict[str, Any] = None,
+) -> NoReturn:
+    """
+    Stores a background result in the image wrapper
+    """
+    if image.low_memory and result.model is not None:
+        image.background = result.model
+    else:
+        image.background = result.background
+    image.background_model = result.model
+    image.background_engine = engine
+    image.background_mask_key = mask_key
+    image.background_params = params_key(params)
+    image.background_preview = result.preview
+    image.degree = degree
+    image.mse = result.mse
+    image.outliers = result.outliers
+
+
+@traced('br_reduction')
 def br_reduction(
         image: ImageWrapper,
         degree: int = 3,
+        max_samples: int = MAX_SAMPLES,
+        engine: str = POLYNOMIAL,
+        mask: np.ndarray = None,
+        preview: bool = False,
+        check: Callable[[], None] = None,
+        **params,
 ) -> NoReturn:
     """
-    Polynomial background reduction and image normalization
+    Background reduction and image normalization
 
-    Fits once for both axes in image and combines the result.
+    Fits a polynomial background with fit_polynomial or uses one of the non-parametric ENGINES.
+    Only pixels where the mask is True are fitted on, see fit_mask.
+    A preview is a coarse polynomial fit on PREVIEW_SAMPLES pixels, the next call without preview refines it.
 
     Stores everything in the image wrapper
 
@@ -28,61 +169,59 @@ def br_reduction(
     degree:     int
                 Polynomial fit degree
 
+    max_samples: int
+                Pixels to fit the polynomial on
+
+    engine:     str
+                Background engine, see background_engines
+
+    mask:       np.ndarray
+                Boolean mask of the cropped image, True for background pixels
+
+    preview:    bool
+                Coarse fit for showing something fast
+
+    check:      Callable
+                Called during the fit, raising Cancelled aborts it
+
+    params:     Any
+                Parameters for a non-parametric engine
+
     Returns
     -------
     NoReturn
     """
-
-    img: np.ndarray
-    border = image.border
-    if image.is_border_valid(border):
-        img = image.sanitized[border + 1:-1 * border, border + 1:-1 * border]
-    else:
-        img = image.sanitized
+    img: np.ndarray = image.cropped
     gen_bg: bool = True
+    mask_key = content_hash(mask) if mask is not None else None
 
     if image.has_background:
-        minus = image.background
         gen_bg = not (
-                img.shape == minus.shape
+                img.shape == image.background_shape
                 and image.degree == degree
+                and image.background_engine == engine
+                and image.background_mask_key == mask_key
+                and image.background_params == params_key(params)
+                and (preview or not image.background_preview)
         )
 
-    image.border = border
-
     try:
         if gen_bg:
-            reg = ransac(min_samples=int(np.sqrt(img.shape[0] * img.shape[1])), max_iter=100)
-            pipe = make_pipeline(
-                PolynomialFeatures(degree=degree, include_bias=False),
-                reg
-            )
-
-            indexes = list()
-            for i in range(0, len(img)):
-                for j in range(0, len(img[0])):
-                    indexes.append([i, j])
-            indexes = np.asarray(indexes)
-            pipe.fit(indexes, img.ravel())
-            pred = pipe.predict(indexes)
-            mse = mean_squared_error(img.ravel(), pred)
-            minus = pred.reshape(img.shape)
-            inlier_mask = reg.inlier_mask_.reshape(img.shape)
-
-            image.background = minus
-            image.degree = degree
-            image.mse = mse
-            image.outliers = np.ma.masked_where(inlier_mask, inlier_mask)
-
-            n = '\n'
-            info(f"Background mse: {mse:.5e}")
-            est: SMAdapter = reg.estimator_
-            info(
-                f"Bacground (model direct):"
-                f"\n- Coef:       {str(est.coef_).replace(n, '')}"
-                f"\n- Intercept:  {str(est.intercept_).replace(n, '')}"
-                f"\n- Errors:     {str(est.errors_).replace(n, '')}"
-            )
+            if engine == POLYNOMIAL:
+                result = fit_polynomial(
+                    image,
+                    degree=degree,
+                    max_samples=max_samples,
+                    mask=mask,
+                    preview_samples=PREVIEW_SAMPLES if preview else None,
+                    check=check,
+                )
+            else:
+                result = fit_background(img, engine, mask=mask, **params)
+                info(f"Background ({engine}) mse: {result.mse:.5e}")
+            apply_background(image, result, degree, engine, mask_key, params)
+    except Cancelled:
+        raise
     except Exception as e:
         handle_exception(e)
         image.active = False
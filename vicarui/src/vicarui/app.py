@@ -12,6 +12,8 @@ from .support import invoke_safe
 from .viewer import AppWindow
 
 pr: Optional[profile.Profile] = None
+trace_path: Optional[str] = None
+stall_threshold: Optional[float] = None
 
 
 @invoke_safe
@@ -50,9 +52,84 @@ def get_parser(parent=None) -> Optional[ArgumentParser]:
         type=str,
         required=False
     )
+    parser.add_argument(
+        "--keep-invalid-lines",
+        dest="keep_invalid_lines",
+        help="Fill invalid image lines instead of removing them",
+        action='store_true'
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        dest="trace",
+        nargs=1,
+        help="Write a Chrome/Perfetto trace of the processing spans into FILE on exit",
+        type=str
+    )
+    parser.add_argument(
+        "--stall-threshold",
+        metavar="MS",
+        dest="stall_threshold",
+        nargs=1,
+        help="Log the GUI thread stack when the event loop stalls longer than MS milliseconds",
+        type=float
+    )
+    parser.add_argument(
+        "--cache-size",
+        metavar="MB",
+        dest="cache_size",
+        nargs=1,
+        help="Memory budget for opened images in megabytes (default: 1024)",
+        type=int
+    )
+    parser.add_argument(
+        "--low-memory",
+        dest="low_memory",
+        help="Process images in float32 and keep backgrounds as coefficients to hold more images in memory",
+        action='store_true'
+    )
+    parser.add_argument(
+        "--background-store",
+        metavar="DIR",
+        dest="background_store",
+        nargs='?',
+        const='',
+        help="Keep fitted backgrounds between sessions in DIR (default: ~/.cache/vicarui/backgrounds)",
+        type=str
+    )
+    parser.add_argument(
+        "--background-store-size",
+        metavar="MB",
+        dest="background_store_size",
+        nargs=1,
+        help="Disk budget for fitted backgrounds in megabytes (default: 256)",
+        type=int
+    )
+    parser.add_argument(
+        "--no-background-store",
+        dest="no_background_store",
+        help="Do not keep fitted backgrounds between sessions, the default",
+        action='store_true'
+    )
     return parser
 
 
+def init_background_store(args: Namespace, enable: bool = False) -> None:
+    """
+    Sets up the background store if --background-store was given or enable is set, the directory is made on first use
+
+    Parsers without --no-background-store, like prebuild's, never turn the store off.
+    """
+    from .support import BackgroundStore, set_background_store, DEFAULT_STORE_PATH, DEFAULT_STORE_SIZE
+    if getattr(args, 'no_background_store', False) or not (enable or args.background_store is not None):
+        set_background_store(None)
+        return
+    path = args.background_store or DEFAULT_STORE_PATH
+    size = args.background_store_size[0] * 1024 * 1024 if args.background_store_size is not None else DEFAULT_STORE_SIZE
+    info(f"Background store: {path}")
+    set_background_store(BackgroundStore(path, max_bytes=size))
+
+
 def init(ns: Namespace = None) -> None:
     args: Namespace
     if ns:
@@ -67,6 +144,15 @@ def init(ns: Namespace = None) -> None:
         global pr
         pr = profile.Profile(builtins=False)
         pr.enable()
+    if args.trace is not None:
+        from .support import enable_trace
+        global trace_path
+        trace_path = args.trace[0]
+        info(f"Tracing into: {trace_path}")
+        enable_trace()
+    if args.stall_threshold is not None:
+        global stall_threshold
+        stall_threshold = args.stall_threshold[0]
     if args.kernels is not None:
         from . import analysis as anal
         info("Setting kernel path to: " + args.kernels.__repr__())
@@ -75,6 +161,19 @@ def init(ns: Namespace = None) -> None:
         from . import analysis as anal
         info(f"Mission: {args.mission[0]}")
         anal.select_mission(args.mission[0])
+    if args.keep_invalid_lines:
+        from .support import ImageWrapper
+        info("Filling invalid image lines")
+        ImageWrapper.keep_shape = True
+    if args.low_memory:
+        from .support import ImageWrapper
+        info("Low memory mode")
+        ImageWrapper.low_memory = True
+    if args.cache_size is not None:
+        from .support import image_cache
+        info(f"Image cache size: {args.cache_size[0]} MB")
+        image_cache().max_bytes = args.cache_size[0] * 1024 * 1024
+    init_background_store(args)
 
     from .support import append_to_axes
     append_to_axes()
@@ -94,6 +193,12 @@ def run(no_init: bool = False):
     apw.setWindowTitle('VicarUI')
     info("Setup done, starting...")
     apw.show()
+    watchdog = None
+    if stall_threshold is not None:
+        from .support import Watchdog
+        info(f"Watching for event loop stalls over {stall_threshold} ms")
+        watchdog = Watchdog(threshold=stall_threshold)
+        watchdog.start()
     code: int = 1
     try:
         code = app.exec_()
@@ -105,5 +210,13 @@ def run(no_init: bool = False):
             res.sort_stats(SortKey.CUMULATIVE).print_stats(10)
             res.sort_stats(SortKey.TIME).print_stats(10)
             debug("Finished!")
+        if watchdog is not None:
+            watchdog.stop()
+            watchdog.log_histogram()
+        from .support import scheduler, log_summary, write_trace
+        scheduler().log_stats()
+        log_summary()
+        if trace_path is not None:
+            info(f"Wrote {write_trace(trace_path)} spans into {trace_path}")
         info("See you again!")
         sys.exit(code)
@@ -0,0 +1,123 @@
+"""
+Fits backgrounds for images ahead of time into the background store used by the viewer
+"""
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from typing import Optional, List, Iterable
+
+from .logging import info, init_logging, handle_exception
+
+
+def get_parser(parent=None) -> Optional[ArgumentParser]:
+    parser: ArgumentParser
+    if parent:
+        parser = parent.add_parser(
+            "prebuild",
+            help="Fit image backgrounds into the background store",
+            description="Fit image backgrounds into the background store"
+        )
+    else:
+        parser = ArgumentParser(prog='prebuild', description="Fit image backgrounds into the background store")
+    parser.add_argument(
+        "paths",
+        metavar="PATH",
+        nargs='+',
+        help="Image files or directories searched for images",
+        type=str
+    )
+    parser.add_argument(
+        "--degree",
+        dest="degree",
+        help="Background polynomial degree (default: 3)",
+        type=int,
+        default=3
+    )
+    parser.add_argument(
+        "--border",
+        dest="border",
+        help="Image border (default: 2)",
+        type=int,
+        default=2
+    )
+    parser.add_argument(
+        "--background-store",
+        metavar="DIR",
+        dest="background_store",
+        nargs='?',
+        const='',
+        help="Directory for fitted backgrounds (default: ~/.cache/vicarui/backgrounds)",
+        type=str
+    )
+    parser.add_argument(
+        "--background-store-size",
+        metavar="MB",
+        dest="background_store_size",
+        nargs=1,
+        help="Disk budget for fitted backgrounds in megabytes (default: 256)",
+        type=int
+    )
+    parser.add_argument(
+        "--keep-invalid-lines",
+        dest="keep_invalid_lines",
+        help="Fill invalid image lines instead of removing them, same as in the viewer",
+        action='store_true'
+    )
+    parser.add_argument(
+        "--low-memory",
+        dest="low_memory",
+        help="Process images in float32, same as in the viewer",
+        action='store_true'
+    )
+    return parser
+
+
+def find_images(paths: Iterable[str]) -> List[Path]:
+    from .support.tasks.files import FileType
+    out = list()
+    for p in map(Path, paths):
+        if p.is_dir():
+            out.extend(sorted(p.rglob(f'*.{FileType.IMAGE.value}')))
+        else:
+            out.append(p)
+    return out
+
+
+def prebuild(paths: Iterable[Path], degree: int = 3, border: int = 2) -> int:
+    """
+    Fits the backgrounds of images into the shared background store
+
+    Returns the number of images processed.
+    """
+    from vicarutil.image import read_image
+    from .analysis import br_reduction
+    from .support import ImageWrapper
+    count = 0
+    for p in paths:
+        try:
+            image = ImageWrapper(read_image(p))
+            image.border = border
+            image.active = True
+            br_reduction(image, degree=degree)
+            count += 1
+            info(f"Background for: {p}")
+        except Exception as e:
+            handle_exception(e)
+    return count
+
+
+def run(ns: Namespace):
+    init_logging()
+    from .app import init_background_store
+    from .support import ImageWrapper, background_store
+    init_background_store(ns, enable=True)
+    if ns.keep_invalid_lines:
+        ImageWrapper.keep_shape = True
+    if ns.low_memory:
+        ImageWrapper.low_memory = True
+    paths = find_images(ns.paths)
+    count = prebuild(paths, degree=ns.degree, border=ns.border)
+    store = background_store()
+    info(f"Fitted {count}/{len(paths)} backgrounds, store size {store.size / 1024 / 1024:.1f} MB")
+
+
+__all__ = ['prebuild', 'find_images', 'get_parser', 'run']
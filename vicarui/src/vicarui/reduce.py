@@ -0,0 +1,272 @@
+"""
+Headless background reduction of many images in a process pool
+
+Every image is written into the output directory as an .npz with the reduced frame and the background fit.
+Finished images are appended to manifest.jsonl as they complete, an interrupted run started again
+skips the images already in the manifest if their source and settings have not changed.
+"""
+import hashlib
+import json
+import os
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, List, Iterable, Dict, Any
+
+from .logging import info, init_logging, handle_exception
+
+MANIFEST = 'manifest.jsonl'
+
+
+@dataclass(frozen=True)
+class ReduceResult:
+    """
+    Counts of images reduced, skipped as already done and failed
+    """
+    done: int
+    skipped: int
+    failed: int
+
+
+def get_parser(parent=None) -> Optional[ArgumentParser]:
+    parser: ArgumentParser
+    if parent:
+        parser = parent.add_parser(
+            "reduce",
+            help="Background reduction of many images in parallel",
+            description="Background reduction of many images in parallel"
+        )
+    else:
+        parser = ArgumentParser(prog='reduce', description="Background reduction of many images in parallel")
+    parser.add_argument(
+        "paths",
+        metavar="PATH",
+        nargs='*',
+        help="Image files or directories searched for images",
+        type=str
+    )
+    parser.add_argument(
+        "--list",
+        metavar="FILE",
+        dest="list",
+        nargs=1,
+        help="File with one image path per line, - for stdin",
+        type=str
+    )
+    parser.add_argument(
+        "-o", "--output",
+        metavar="DIR",
+        dest="output",
+        help="Output directory for the reduced images and the manifest",
+        type=str,
+        required=True
+    )
+    parser.add_argument(
+        "--degree",
+        dest="degree",
+        help="Background polynomial degree (default: 3)",
+        type=int,
+        default=3
+    )
+    parser.add_argument(
+        "--border",
+        dest="border",
+        help="Image border (default: 2)",
+        type=int,
+        default=2
+    )
+    parser.add_argument(
+        "--engine",
+        dest="engine",
+        help="Background engine: polynomial, median, percentile, block or spline (default: polynomial)",
+        type=str,
+        default='polynomial'
+    )
+    parser.add_argument(
+        "--percentile",
+        dest="percentile",
+        help="Percentile of the percentile engine (default: 25)",
+        type=float,
+        default=25
+    )
+    parser.add_argument(
+        "--normalize",
+        dest="normalize",
+        help="Normalize the reduced images",
+        action='store_true'
+    )
+    parser.add_argument(
+        "--workers",
+        metavar="N",
+        dest="workers",
+        help="Worker processes (default: CPU count)",
+        type=int
+    )
+    parser.add_argument(
+        "--keep-invalid-lines",
+        dest="keep_invalid_lines",
+        help="Fill invalid image lines instead of removing them",
+        action='store_true'
+    )
+    return parser
+
+
+def read_list(path: str) -> List[str]:
+    import sys
+    if path == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        lines = Path(path).read_text().splitlines()
+    return [line.strip() for line in lines if line.strip() != '' and not line.startswith('#')]
+
+
+def source_key(p: Path) -> List[Any]:
+    s = p.stat()
+    return [str(p.resolve()), s.st_mtime_ns, s.st_size]
+
+
+def output_name(p: Path) -> str:
+    """Output file name, unique for images of the same name in different directories"""
+    return f"{p.stem}-{hashlib.blake2b(str(p.resolve()).encode(), digest_size=4).hexdigest()}.npz"
+
+
+def read_manifest(output: Path) -> Dict[str, Dict]:
+    """Finished records by resolved source path, the latest record wins"""
+    records = dict()
+    manifest = output / MANIFEST
+    if manifest.exists():
+        with open(manifest, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    records[record['source'][0]] = record
+                except (ValueError, KeyError, IndexError):
+                    # A line cut short by an interrupted write
+                    continue
+    return records
+
+
+def _init_worker(keep_shape: bool) -> None:
+    from .support import ImageWrapper, single_threaded
+    single_threaded()
+    ImageWrapper.keep_shape = keep_shape
+
+
+def reduce_file(p: Path, output: Path, settings: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduces one image into the output directory and returns its manifest record
+    """
+    import numpy as np
+    from vicarutil.image import read_image
+    from .analysis import br_reduction
+    from .support import ImageWrapper
+
+    key = source_key(p)
+    image = ImageWrapper(read_image(p))
+    image.border = settings['border']
+    image.active = True
+    br_reduction(image, degree=settings['degree'], engine=settings['engine'], **settings['params'])
+    if not image.active:
+        raise RuntimeError(f"Background reduction failed for: {p}")
+    image.normalized = settings['normalize']
+
+    model = image.background_model
+    name = output_name(p)
+    tmp = output / f"{name}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        np.savez(
+            f,
+            reduced=image.processed,
+            coefficients=model.coefficients if model is not None else np.zeros((0, 0)),
+            shape=np.asarray(image.shape),
+            mse=np.asarray(image.mse),
+            invalid_indices=np.asarray(image.invalid_indices if image.invalid_indices is not None else [], dtype=int),
+        )
+    os.replace(tmp, output / name)
+    return dict(source=key, output=name, settings=settings, mse=image.mse)
+
+
+def reduce_images(
+        paths: Iterable[Path],
+        output: Path,
+        degree: int = 3,
+        border: int = 2,
+        normalize: bool = False,
+        engine: str = 'polynomial',
+        workers: int = None,
+        keep_shape: bool = False,
+        params: Dict[str, Any] = None,
+) -> ReduceResult:
+    """
+    Reduces images in a process pool, images already in the output manifest with the same settings are skipped
+
+    params are passed to a non-parametric engine.
+    """
+    output.mkdir(parents=True, exist_ok=True)
+    settings = dict(
+        degree=degree, border=border, normalize=normalize, engine=engine, keep_shape=keep_shape, params=params or dict()
+    )
+    finished = read_manifest(output)
+
+    todo = list()
+    skipped = 0
+    for p in map(Path, paths):
+        record = finished.get(str(p.resolve()))
+        if (
+                record is not None
+                and record['settings'] == settings
+                and record['source'] == source_key(p)
+                and (output / record['output']).exists()
+        ):
+            skipped += 1
+        else:
+            todo.append(p)
+    info(f"Reducing {len(todo)} images, {skipped} already done")
+
+    done = 0
+    failed = 0
+    with open(output / MANIFEST, 'a') as manifest, ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(keep_shape,),
+    ) as pool:
+        futures = {pool.submit(reduce_file, p, output, settings): p for p in todo}
+        try:
+            for future in as_completed(futures):
+                try:
+                    record = future.result()
+                    manifest.write(json.dumps(record) + '\n')
+                    manifest.flush()
+                    done += 1
+                    info(f"Reduced ({done + failed}/{len(todo)}): {futures[future]}")
+                except Exception as e:
+                    failed += 1
+                    handle_exception(e)
+        except KeyboardInterrupt:
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+    return ReduceResult(done=done, skipped=skipped, failed=failed)
+
+
+def run(ns: Namespace):
+    init_logging()
+    from .prebuild import find_images
+    paths = find_images(ns.paths + (read_list(ns.list[0]) if ns.list is not None else []))
+    result = reduce_images(
+        paths,
+        Path(ns.output),
+        degree=ns.degree,
+        border=ns.border,
+        normalize=ns.normalize,
+        engine=ns.engine,
+        workers=ns.workers,
+        keep_shape=ns.keep_invalid_lines,
+        params=dict(percentile=ns.percentile) if ns.engine == 'percentile' else None,
+    )
+    info(f"Reduced {result.done}, skipped {result.skipped}, failed {result.failed}")
+    if result.failed != 0:
+        raise SystemExit(1)
+
+
+__all__ = ['reduce_images', 'reduce_file', 'read_manifest', 'ReduceResult', 'get_parser', 'run', 'MANIFEST']
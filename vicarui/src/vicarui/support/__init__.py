@@ -1,4 +1,5 @@
 from .concurrent import *
+from .trace import *
 from .pipeline import *
 from .ui import *
 from .tasks import *
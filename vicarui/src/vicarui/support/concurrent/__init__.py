@@ -1,4 +1,7 @@
 from .busy import Busy
 from .lock import Lock
+from .processes import *
 from .signals import *
+from .scheduler import *
 from .task import Tasker
+from .watchdog import *
@@ -0,0 +1,24 @@
+import os
+from typing import Optional
+
+_threads: Optional[int] = None
+
+
+def thread_count() -> int:
+    """
+    Threads a process may start for its own work, the CPU count or 1 in single_threaded processes
+    """
+    return _threads or os.cpu_count() or 1
+
+
+def single_threaded() -> None:
+    """
+    Process pool initializer, one BLAS, OpenMP and tile thread per process so the processes do not compete for the cores
+    """
+    global _threads
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+    _threads = 1
+
+
+__all__ = ['single_threaded', 'thread_count']
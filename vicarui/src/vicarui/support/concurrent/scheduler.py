@@ -0,0 +1,265 @@
+"""
+Shared worker pool for background tasks
+
+Tasks are QObjects so they can define Qt signals, signals emitted from the workers are delivered to the UI thread.
+Tasks submitted with a key coalesce: a newer task cancels the previous one with the same key and waits for it to finish.
+At most one task per key is running and one is waiting at any time.
+"""
+import os
+import threading
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Dict, Optional, Hashable, Deque, NoReturn
+
+import numpy as np
+from PySide2.QtCore import QObject, QRunnable, QThreadPool
+
+from .lock import Lock
+from ...logging import child, handle_exception
+
+log = child('scheduler')
+
+
+class Cancelled(Exception):
+    """
+    Raised from a task when its token is cancelled
+    """
+    pass
+
+
+class CancelToken:
+    """
+    Thread safe cancellation flag shared between a task and its submitter
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> NoReturn:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self) -> NoReturn:
+        """Raises Cancelled if cancelled"""
+        if self._event.is_set():
+            raise Cancelled()
+
+
+class Priority(IntEnum):
+    LOW = 0
+    NORMAL = 1
+    HIGH = 2
+
+
+class Task(QObject):
+    """
+    Unit of work run on the worker pool
+
+    Subclasses implement run and should call check between expensive steps.
+    """
+    token: CancelToken
+
+    def __init__(self):
+        super(Task, self).__init__()
+        self.token = CancelToken()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.token.cancelled
+
+    def check(self) -> NoReturn:
+        self.token.check()
+
+    def cancel(self) -> NoReturn:
+        self.token.cancel()
+
+    def run(self) -> NoReturn:
+        raise NotImplementedError()
+
+
+class _Entry:
+    __slots__ = 'task', 'priority', 'key', 'submitted', 'started'
+
+    def __init__(self, task: Task, priority: Priority, key: Optional[Hashable]):
+        self.task = task
+        self.priority = priority
+        self.key = key
+        self.submitted = time.perf_counter()
+        self.started: Optional[float] = None
+
+
+class _Runner(QRunnable):
+
+    def __init__(self, scheduler: 'Scheduler', entry: _Entry):
+        super(_Runner, self).__init__()
+        self.scheduler = scheduler
+        self.entry = entry
+        self.setAutoDelete(True)
+
+    def run(self) -> NoReturn:
+        self.scheduler._execute(self.entry)
+
+
+class Scheduler:
+    """
+    Bounded pool running Tasks with priorities, cancellation and coalescing by key
+
+    Queue wait and run times are recorded per task type, see stats.
+    """
+    HISTORY = 256
+
+    def __init__(self, max_threads: int = None):
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads or max(2, min(4, os.cpu_count() or 1)))
+        self._lock = Lock()
+        self._active: Dict[int, _Entry] = dict()
+        self._running: Dict[Hashable, _Entry] = dict()
+        self._waiting: Dict[Hashable, _Entry] = dict()
+        self._waits: Dict[str, Deque[float]] = dict()
+        self._runs: Dict[str, Deque[float]] = dict()
+        self._superseded: Dict[str, int] = dict()
+
+    def submit(self, task: Task, priority: Priority = Priority.NORMAL, key: Hashable = None) -> CancelToken:
+        """
+        Queues a task, a reference to it is held until it is done
+
+        A task with a key supersedes the earlier tasks with the same key.
+        """
+        entry = _Entry(task, priority, key)
+
+        def add() -> bool:
+            self._active[id(task)] = entry
+            if key is None:
+                return True
+            waiting = self._waiting.pop(key, None)
+            if waiting is not None:
+                self._supersede(waiting)
+                self._active.pop(id(waiting.task), None)
+            running = self._running.get(key)
+            if running is not None:
+                if not running.task.cancelled:
+                    self._supersede(running)
+                self._waiting[key] = entry
+                return False
+            self._running[key] = entry
+            return True
+
+        if self._lock.run_blocking(add):
+            self._start(entry)
+        return task.token
+
+    def _supersede(self, entry: _Entry) -> NoReturn:
+        entry.task.cancel()
+        name = type(entry.task).__name__
+        self._superseded[name] = self._superseded.get(name, 0) + 1
+
+    def _start(self, entry: _Entry) -> NoReturn:
+        self.pool.start(_Runner(self, entry), int(entry.priority))
+
+    def _record(self, target: Dict[str, Deque[float]], name: str, value: float) -> NoReturn:
+        if name not in target:
+            target[name] = deque(maxlen=self.HISTORY)
+        target[name].append(value)
+
+    def _execute(self, entry: _Entry) -> NoReturn:
+        task = entry.task
+        name = type(task).__name__
+        entry.started = time.perf_counter()
+        self._lock.run_blocking(lambda: self._record(self._waits, name, entry.started - entry.submitted))
+        try:
+            if not task.cancelled:
+                task.run()
+        except Cancelled:
+            log.debug("Cancelled %s", name)
+        except Exception as e:
+            handle_exception(e)
+        finally:
+            self._finish(entry, name, time.perf_counter() - entry.started)
+
+    def _finish(self, entry: _Entry, name: str, elapsed: float) -> NoReturn:
+        def remove() -> Optional[_Entry]:
+            self._record(self._runs, name, elapsed)
+            self._active.pop(id(entry.task), None)
+            if entry.key is None or self._running.get(entry.key) is not entry:
+                return None
+            nxt = self._waiting.pop(entry.key, None)
+            if nxt is None:
+                self._running.pop(entry.key)
+            else:
+                self._running[entry.key] = nxt
+            return nxt
+
+        following = self._lock.run_blocking(remove)
+        if following is not None:
+            self._start(following)
+
+    def cancel(self, key: Hashable) -> NoReturn:
+        """Cancels the running and waiting tasks with a key"""
+
+        def collect():
+            return [e for e in (self._running.get(key), self._waiting.get(key)) if e is not None]
+
+        for entry in self._lock.run_blocking(collect):
+            entry.task.cancel()
+
+    def pending(self) -> int:
+        """Number of tasks not finished yet"""
+        return self._lock.run_blocking(lambda: len(self._active))
+
+    def wait(self, msecs: int = -1) -> bool:
+        """Waits for the pool to go idle"""
+        deadline = None if msecs < 0 else time.perf_counter() + msecs / 1000
+        while self.pending() != 0:
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+            self.pool.waitForDone(10)
+        return True
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Queue wait and run time percentiles in milliseconds per task type
+        """
+
+        def collect():
+            out = dict()
+            for name in set(self._runs) | set(self._waits):
+                values = dict(count=len(self._runs.get(name, ())), superseded=self._superseded.get(name, 0))
+                for kind, source in (('wait', self._waits), ('run', self._runs)):
+                    if len(source.get(name, ())) != 0:
+                        ms = np.asarray(source[name]) * 1000
+                        values[f"{kind}_p50"] = float(np.percentile(ms, 50))
+                        values[f"{kind}_p95"] = float(np.percentile(ms, 95))
+                        values[f"{kind}_max"] = float(np.max(ms))
+                out[name] = values
+            return out
+
+        return self._lock.run_blocking(collect)
+
+    def log_stats(self) -> NoReturn:
+        for name, values in sorted(self.stats().items()):
+            log.info("%s: %s", name, ", ".join(f"{k}={v:.1f}" for k, v in values.items()))
+
+
+_scheduler: Optional[Scheduler] = None
+_scheduler_lock = Lock()
+
+
+def scheduler() -> Scheduler:
+    """
+    The shared scheduler
+    """
+
+    def get():
+        global _scheduler
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
+
+    return _scheduler_lock.run_blocking(get)
+
+
+__all__ = ['Scheduler', 'Task', 'CancelToken', 'Cancelled', 'Priority', 'scheduler']
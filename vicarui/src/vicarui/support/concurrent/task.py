@@ -1,28 +1,16 @@
-from typing import Dict, NoReturn
+from typing import Hashable
 
-from PySide2.QtCore import QThread
-
-from .lock import Lock
-
-_lock = Lock()
-_tasks: Dict[int, QThread] = dict()
-
-
-def _add_task(task: QThread) -> NoReturn:
-    task_id = id(task)
-    _tasks[task_id] = task
-    task.finished.connect(lambda: _lock.run_blocking(lambda: _tasks.pop(task_id)))
+from .scheduler import scheduler, Task, Priority, CancelToken
 
 
 class Tasker:
 
     @staticmethod
-    def run(task: QThread) -> NoReturn:
+    def run(task: Task, priority: Priority = Priority.NORMAL, key: Hashable = None) -> CancelToken:
         """
-        Runs a task and holds a reference to it until done
+        Runs a task on the shared scheduler and holds a reference to it until done
         """
-        _lock.run_blocking(lambda: _add_task(task))
-        task.start(priority=QThread.HighPriority)
+        return scheduler().submit(task, priority=priority, key=key)
 
 
 __all__ = ['Tasker']
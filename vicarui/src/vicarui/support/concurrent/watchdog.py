@@ -0,0 +1,141 @@
+"""
+Event loop stall detection
+
+A heartbeat timer on the GUI thread measures how late the event loop runs it.
+A monitor thread captures the GUI thread's Python stack when no heartbeat has arrived within the threshold.
+"""
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, Dict, List, Optional, NoReturn, Tuple
+
+import numpy as np
+from PySide2.QtCore import QObject, QTimer
+
+from ...logging import child
+
+log = child('watchdog')
+
+BUCKETS: Tuple[float, ...] = (5., 16., 33., 50., 100., 200., 500., 1000., 2000., 5000., np.inf)
+"""
+Upper edges of the latency histogram buckets in milliseconds
+"""
+
+
+class Stall:
+    __slots__ = 'started', 'duration', 'stack'
+
+    def __init__(self, started: float, stack: str):
+        self.started = started
+        self.duration: Optional[float] = None
+        self.stack = stack
+
+    def __repr__(self):
+        return f"Stall({self.duration or -1:.1f} ms)"
+
+
+class Watchdog(QObject):
+    """
+    Measures event loop latency on the thread it is started from
+
+    Latency is how late each heartbeat fires. Stalls longer than threshold (ms) are logged with the stack
+    of the stalled thread and kept in stalls.
+    """
+    MAX_STALLS = 64
+
+    def __init__(self, threshold: float = 250., interval: int = 50):
+        super(Watchdog, self).__init__()
+        self.threshold = threshold
+        self.interval = interval
+        self.counts = np.zeros(len(BUCKETS), dtype=int)
+        self.stalls: Deque[Stall] = deque(maxlen=self.MAX_STALLS)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self._beat)
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+        self._monitor: Optional[threading.Thread] = None
+        self._thread_id: Optional[int] = None
+        self._last: float = 0.
+        self._current: Optional[Stall] = None
+
+    def start(self) -> NoReturn:
+        self._thread_id = threading.get_ident()
+        self._last = time.perf_counter()
+        self._running.set()
+        self._timer.start()
+        self._monitor = threading.Thread(target=self._watch, name='watchdog', daemon=True)
+        self._monitor.start()
+
+    def stop(self) -> NoReturn:
+        self._timer.stop()
+        self._running.clear()
+        if self._monitor is not None:
+            self._monitor.join()
+            self._monitor = None
+
+    def _beat(self) -> NoReturn:
+        now = time.perf_counter()
+        with self._lock:
+            late = max(0., (now - self._last) * 1000 - self.interval)
+            self._last = now
+            self.counts[np.searchsorted(BUCKETS, late)] += 1
+            stall, self._current = self._current, None
+        if stall is not None:
+            stall.duration = (now - stall.started) * 1000
+            log.warning("Event loop stalled for %.0f ms in:\n%s", stall.duration, stall.stack)
+
+    def _watch(self) -> NoReturn:
+        while self._running.is_set():
+            time.sleep(min(self.interval, self.threshold) / 2000)
+            with self._lock:
+                last = self._last
+                stalled = self._current is None and (time.perf_counter() - last) * 1000 > self.threshold
+            if stalled:
+                stall = Stall(last, self._stack())
+                with self._lock:
+                    if self._last == last:
+                        self._current = stall
+                        self.stalls.append(stall)
+
+    def _stack(self) -> str:
+        frame = sys._current_frames().get(self._thread_id)
+        if frame is None:
+            return "<no stack>"
+        return ''.join(traceback.format_stack(frame))
+
+    def histogram(self) -> Dict[str, int]:
+        """Heartbeat latency counts per bucket"""
+        with self._lock:
+            counts = self.counts.copy()
+        out = dict()
+        low = 0.
+        for high, count in zip(BUCKETS, counts):
+            out[f"{low:.0f}-{high:.0f} ms"] = int(count)
+            low = high
+        return out
+
+    def percentiles(self, q: List[float] = (50, 95, 99)) -> Dict[float, float]:
+        """Upper bucket edge for the latency percentiles"""
+        with self._lock:
+            counts = self.counts.copy()
+        total = counts.sum()
+        if total == 0:
+            return {p: 0. for p in q}
+        cumulative = np.cumsum(counts) / total
+        return {p: float(BUCKETS[np.searchsorted(cumulative, p / 100)]) for p in q}
+
+    def log_histogram(self) -> NoReturn:
+        stalls = [s.duration for s in self.stalls if s.duration is not None]
+        log.info(
+            "Event loop latency: %s, stalls: %d%s",
+            ", ".join(f"{k}: {v}" for k, v in self.histogram().items() if v != 0),
+            len(stalls),
+            f" (max {max(stalls):.0f} ms)" if stalls else ""
+        )
+
+
+__all__ = ['Watchdog', 'Stall', 'BUCKETS']
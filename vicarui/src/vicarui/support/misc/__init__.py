@@ -1,4 +1,8 @@
+from .background import *
+from .background_store import *
 from .image_wrapper import *
+from .image_cache import *
+from .polynomial_basis import *
 from .iterables import *
 from .mpl import *
 from .wrapper_functions import *
@@ -0,0 +1,68 @@
+from typing import Tuple, Sequence, Iterable
+
+import numpy as np
+
+
+class PolynomialBackground(object):
+    """
+    Polynomial background surface stored as coefficients
+
+    The surface is sum C[p, q] * i^p * j^q over image rows i and columns j and is evaluated on demand as Vi @ C @ Vj.T
+    """
+    coefficients: np.ndarray
+    shape: Tuple[int, int]
+
+    def __init__(self, coefficients: np.ndarray, shape: Tuple[int, int]):
+        super(PolynomialBackground, self).__init__()
+        self.coefficients = np.asarray(coefficients, dtype='float64')
+        self.shape = tuple(shape)
+
+    @classmethod
+    def from_features(
+            cls,
+            powers: Sequence[Sequence[int]],
+            coef: Sequence[float],
+            intercept: float,
+            shape: Tuple[int, int]
+    ) -> 'PolynomialBackground':
+        """
+        From coefficients fitted on PolynomialFeatures of (row, column) pairs
+
+        Powers are the powers_ of the features and coef is in the same order.
+        """
+        powers = np.asarray(powers, dtype=int)
+        degree = int(powers.max(initial=0))
+        c = np.zeros((degree + 1, degree + 1))
+        np.add.at(c, (powers[:, 0], powers[:, 1]), np.asarray(coef, dtype='float64'))
+        c[0, 0] += intercept or 0.
+        return cls(c, shape)
+
+    @property
+    def degree(self) -> int:
+        return len(self.coefficients) - 1
+
+    def evaluate(self, dtype=np.float64) -> np.ndarray:
+        rows = np.vander(np.arange(self.shape[0], dtype='float64'), self.degree + 1, increasing=True)
+        cols = np.vander(np.arange(self.shape[1], dtype='float64'), self.degree + 1, increasing=True)
+        return (rows @ self.coefficients @ cols.T).astype(dtype, copy=False)
+
+
+def disc_mask(shape: Tuple[int, int], center: Tuple[float, float], radius: float) -> np.ndarray:
+    """
+    Boolean mask that is False inside a disc, center is (column, row) like in the image axes
+    """
+    rows, cols = np.ogrid[0:shape[0], 0:shape[1]]
+    return (cols - center[0]) ** 2 + (rows - center[1]) ** 2 > radius ** 2
+
+
+def region_mask(shape: Tuple[int, int], regions: Iterable[Tuple[int, int, int, int]]) -> np.ndarray:
+    """
+    Boolean mask that is False inside the (top, bottom, left, right) regions, bottom and right are exclusive
+    """
+    mask = np.ones(shape, dtype=bool)
+    for top, bottom, left, right in regions:
+        mask[max(0, top):max(0, bottom), max(0, left):max(0, right)] = False
+    return mask
+
+
+__all__ = ['PolynomialBackground', 'disc_mask', 'region_mask']
@@ -0,0 +1,162 @@
+"""
+Persistent cache of fitted backgrounds
+
+Entries are compressed .npz files named by the hash of their key and hold the polynomial coefficients,
+the fit mse and the bit-packed inlier mask. The least recently used entries are removed when the store
+grows over its byte budget.
+"""
+import hashlib
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from threading import RLock
+from typing import Optional, Hashable, Union, Tuple
+
+import numpy as np
+
+from .background import PolynomialBackground
+
+DEFAULT_STORE_SIZE = 256 * 1024 * 1024
+
+DEFAULT_STORE_PATH = Path.home() / '.cache' / 'vicarui' / 'backgrounds'
+
+
+def content_hash(data: np.ndarray) -> str:
+    """
+    Hash of array contents, shape and dtype
+    """
+    h = hashlib.blake2b(digest_size=20)
+    h.update(str((data.shape, data.dtype.str)).encode())
+    h.update(np.ascontiguousarray(data).data)
+    return h.hexdigest()
+
+
+@dataclass(frozen=True)
+class StoredBackground:
+    """
+    Background fit read from the store
+    """
+    background: PolynomialBackground
+    mse: float
+    inliers: np.ndarray
+
+    @property
+    def outliers(self) -> np.ndarray:
+        """Outliers as a masked array where the inliers are masked"""
+        return np.ma.masked_where(self.inliers, self.inliers)
+
+
+class BackgroundStore(object):
+    """
+    Thread safe on-disk LRU of background fits with a byte budget
+
+    Recency is kept in the file modification times so it survives restarts.
+    The directory is made when the first background is put.
+    """
+    path: Path
+    max_bytes: int
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_STORE_PATH, max_bytes: int = DEFAULT_STORE_SIZE):
+        super(BackgroundStore, self).__init__()
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._lock = RLock()
+
+    @staticmethod
+    def _name(key: Hashable) -> str:
+        return hashlib.blake2b(repr(key).encode(), digest_size=20).hexdigest() + '.npz'
+
+    def _entries(self):
+        return list(self.path.glob('*.npz'))
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return sum(p.stat().st_size for p in self._entries())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries())
+
+    def __contains__(self, key: Hashable) -> bool:
+        return (self.path / self._name(key)).exists()
+
+    def _evict(self, keep: Path) -> None:
+        entries = sorted(((p.stat(), p) for p in self._entries()), key=lambda e: e[0].st_mtime_ns)
+        total = sum(s.st_size for s, _ in entries)
+        for s, p in entries:
+            if total <= self.max_bytes:
+                break
+            if p != keep:
+                p.unlink(missing_ok=True)
+                total -= s.st_size
+
+    def get(self, key: Hashable) -> Optional[StoredBackground]:
+        p = self.path / self._name(key)
+        with self._lock:
+            try:
+                with np.load(p) as f:
+                    shape: Tuple[int, int] = tuple(int(v) for v in f['shape'])
+                    stored = StoredBackground(
+                        background=PolynomialBackground(f['coefficients'], shape),
+                        mse=float(f['mse']),
+                        inliers=np.unpackbits(f['inliers'], count=shape[0] * shape[1]).astype(bool).reshape(shape)
+                    )
+                os.utime(p)
+                return stored
+            except FileNotFoundError:
+                return None
+            except (OSError, ValueError, KeyError):
+                # Broken entries are removed and fitted again
+                p.unlink(missing_ok=True)
+                return None
+
+    def put(self, key: Hashable, background: PolynomialBackground, mse: float, inliers: np.ndarray) -> None:
+        p = self.path / self._name(key)
+        tmp = p.with_name(f'{p.stem}.{os.getpid()}.tmp')
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            with open(tmp, 'wb') as f:
+                np.savez_compressed(
+                    f,
+                    coefficients=background.coefficients,
+                    shape=np.asarray(background.shape),
+                    mse=np.asarray(mse),
+                    inliers=np.packbits(np.ma.getdata(inliers).astype(bool)),
+                )
+            os.replace(tmp, p)
+            self._evict(p)
+
+    def clear(self) -> None:
+        with self._lock:
+            for p in self._entries():
+                p.unlink(missing_ok=True)
+
+
+_store: Optional[BackgroundStore] = None
+
+
+def background_store() -> Optional[BackgroundStore]:
+    """
+    The shared background store, None if disabled
+    """
+    return _store
+
+
+def set_background_store(store: Optional[BackgroundStore]) -> None:
+    """
+    Sets the shared background store, None disables it
+    """
+    global _store
+    _store = store
+
+
+__all__ = [
+    'BackgroundStore',
+    'StoredBackground',
+    'background_store',
+    'set_background_store',
+    'content_hash',
+    'DEFAULT_STORE_SIZE',
+    'DEFAULT_STORE_PATH',
+]
@@ -0,0 +1,87 @@
+from collections import OrderedDict
+from os import stat
+from pathlib import Path
+from threading import RLock
+from typing import Optional, Hashable, Union
+
+from .image_wrapper import ImageWrapper
+
+DEFAULT_CACHE_SIZE = 1024 * 1024 * 1024
+
+
+def file_key(p: Union[str, Path]) -> Hashable:
+    """
+    Cache key for a file, changes when the file is modified
+    """
+    s = stat(p)
+    return str(Path(p).resolve()), s.st_mtime_ns, s.st_size
+
+
+class ImageCache(object):
+    """
+    Thread safe LRU cache for opened images with a byte budget
+
+    Sizes are taken from ImageWrapper.nbytes and refreshed on access.
+    Cached wrappers are templates, hand out copies of them so their view state stays untouched.
+    The most recently used image is never evicted.
+    """
+    max_bytes: int
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_SIZE):
+        super(ImageCache, self).__init__()
+        self.max_bytes = max_bytes
+        self._images: OrderedDict = OrderedDict()
+        self._sizes = dict()
+        self._lock = RLock()
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._images)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._images
+
+    def _evict(self) -> None:
+        while len(self._images) > 1 and sum(self._sizes.values()) > self.max_bytes:
+            key, _ = self._images.popitem(last=False)
+            self._sizes.pop(key)
+
+    def get(self, key: Hashable) -> Optional[ImageWrapper]:
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                self._sizes[key] = image.nbytes
+                self._evict()
+            return image
+
+    def put(self, key: Hashable, image: ImageWrapper) -> None:
+        with self._lock:
+            self._images[key] = image
+            self._images.move_to_end(key)
+            self._sizes[key] = image.nbytes
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._images.clear()
+            self._sizes.clear()
+
+
+_cache = ImageCache()
+
+
+def image_cache() -> ImageCache:
+    """
+    The shared image cache
+    """
+    return _cache
+
+
+__all__ = ['ImageCache', 'image_cache', 'file_key', 'DEFAULT_CACHE_SIZE']
@@ -1,40 +1,185 @@
+from copy import copy
+from dataclasses import replace
 from functools import cached_property
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Dict, Callable, Hashable, Union, List, Any
 
 import numpy as np
 from vicarutil.image import VicarImage
 
+from .background import PolynomialBackground
+from .background_store import content_hash
+from ..trace import span
+
+
+def find_invalid_lines(img: np.ndarray) -> np.ndarray:
+    """
+    Boolean mask of image lines that are constant or have no finite values
+    """
+    finite = np.isfinite(img)
+    with np.errstate(invalid='ignore'):
+        average = np.average(img, axis=1)
+        constant = np.isclose(average[:, np.newaxis], img).all(axis=1)
+    return constant | ~finite.any(axis=1)
+
+
+def fill_invalid_lines(img: np.ndarray, invalid: np.ndarray) -> np.ndarray:
+    """
+    Fills invalid lines in place by interpolating between the closest valid lines
+    """
+    valid = np.flatnonzero(~invalid)
+    if len(valid) == 0 or len(valid) == len(img):
+        return img
+    rows = np.arange(len(img))
+    lower = np.maximum.accumulate(np.where(~invalid, rows, valid[0]))
+    upper = np.minimum.accumulate(np.where(~invalid, rows, valid[-1])[::-1])[::-1]
+    span = np.maximum(upper - lower, 1)
+    weight = ((rows - lower) / span)[invalid, np.newaxis]
+    img[invalid] = img[lower[invalid]] * (1 - weight) + img[upper[invalid]] * weight
+    return img
+
 
 class ImageWrapper(object):
     _raw: VicarImage
 
+    keep_shape: bool = False
+    """
+    Fill invalid lines instead of deleting them, keeps image coordinates intact
+    """
+
+    low_memory: bool = False
+    """
+    Process in float32, keep masks bit-packed and backgrounds as coefficients
+    """
+
+    release_raw: bool = True
+    """
+    Drop the reference to the raw image data once sanitized in low memory mode
+
+    The wrapper keeps a copy of the raw image without data, the image it was created with is left intact.
+    original is the sanitized image from then on.
+    """
+
     invalid_indices: Optional[np.ndarray]
-    border: int
+    original_shape: Tuple[int, int]
     active: bool
 
-    _bg: Optional[np.ndarray]
+    background_model: Optional[PolynomialBackground]
+    """
+    Fitted background coefficients, kept in every mode
+    """
+
+    background_engine: Optional[str]
+    """
+    Name of the engine the background is from
+    """
+
+    background_mask_key: Optional[str]
+    """
+    Hash of the mask the background was fitted with, None if fitted on every pixel
+    """
+
+    background_params: Tuple[Tuple[str, Any], ...]
+    """
+    Sorted (name, value) parameters of the engine the background is from
+    """
+
+    background_preview: bool
+    """
+    The background is a coarse preview that is refined later
+    """
+
+    exclusions: List[Tuple[int, int, int, int]]
+    """
+    User selected (top, bottom, left, right) regions of the cropped image left out of the background fit
+
+    They are moved with the crop when the border changes, the parts outside the new crop are dropped.
+    """
+
+    _border: int
+    _bg: Union[np.ndarray, PolynomialBackground, None]
     _bg_degree: Optional[int]
     _bg_outliers: Optional[np.ndarray]
+    _invalid: Optional[np.ndarray]
     _normalized: Optional[bool]
     _mse: Optional[float]
+    _stages: Dict[str, Tuple[Hashable, np.ndarray]]
 
-    def __init__(self, image: VicarImage):
+    def __init__(self, image: VicarImage, keep_shape: bool = None, low_memory: bool = None):
         super(ImageWrapper, self).__init__()
         self._raw = image
+        if keep_shape is not None:
+            self.keep_shape = keep_shape
+        if low_memory is not None:
+            self.low_memory = low_memory
+        self.original_shape = image.data[0].shape
+        self._invalid = None
+        self.invalid_indices = None
+        self._reset()
 
+    def _reset(self) -> None:
+        """
+        Default view settings without a background
+        """
         self._bg = None
+        self.background_model = None
+        self.background_engine = None
+        self.background_mask_key = None
+        self.background_params = ()
+        self.background_preview = False
+        self.exclusions = list()
         self._mse = None
         self._bg_degree = None
         self._bg_outliers = None
+        self._stages = dict()
 
-        self.invalid_indices = None
         self.active = False
         self.normalized = False
-        self.border = 0
+        self._border = 0
+
+    def copy(self) -> 'ImageWrapper':
+        """
+        New wrapper of the same image with default view settings
+
+        The raw image and the sanitized data are shared, neither is modified by a wrapper.
+        """
+        wrapper = copy(self)
+        wrapper._reset()
+        return wrapper
 
     @staticmethod
     def normalize(img: np.ndarray):
-        return (img - np.min(img)) * 1 / (np.max(img) - np.min(img))
+        low = np.min(img)
+        out = np.subtract(img, low, dtype=np.result_type(img, 1.))
+        out *= 1 / (np.max(img) - low)
+        return out
+
+    def _stage(self, name: str, key: Hashable, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        """
+        Returns a cached processing stage if it was computed with the same key
+        """
+        cached = self._stages.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        value = compute()
+        self._stages[name] = key, value
+        return value
+
+    def cached(self, name: str, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Value derived from the image cached with the processing stages until the key changes
+        """
+        return self._stage(name, key, compute)
+
+    def invalidate(self, *stages: str) -> None:
+        """
+        Drops cached processing stages, all of them if none are given
+
+        Stages are cropped, processed, display and zeros, and the values of cached.
+        """
+        if len(stages) == 0:
+            self._stages.clear()
+        for stage in stages:
+            self._stages.pop(stage, None)
 
     @property
     def raw(self) -> VicarImage:
@@ -42,21 +187,71 @@ class ImageWrapper(object):
 
     @property
     def original(self) -> np.ndarray:
-        return self.raw.data[0]
+        """
+        Raw image data
+
+        In low memory mode with release_raw this is the sanitized image: float32, invalid lines removed
+        (unless keep_shape) and non-finite values replaced.
+        """
+        if self.raw.has_data():
+            return self.raw.data[0]
+        return self.sanitized
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype('float32') if self.low_memory else np.result_type(self.original_dtype, 1.)
+
+    @property
+    def original_dtype(self) -> np.dtype:
+        return self.raw.data.dtype if self.raw.has_data() else self.sanitized.dtype
+
+    @property
+    def invalid_mask(self) -> Optional[np.ndarray]:
+        """Invalid image lines, available after sanitizing"""
+        if self._invalid is not None and self.low_memory:
+            return np.unpackbits(self._invalid, count=self.original_shape[0]).astype(bool)
+        return self._invalid
+
+    @invalid_mask.setter
+    def invalid_mask(self, mask: Optional[np.ndarray]):
+        self._invalid = np.packbits(mask) if mask is not None and self.low_memory else mask
 
     @cached_property
     def sanitized(self) -> np.ndarray:
-        img = self.original.copy()
-        indices = list()
-        for _i, line in enumerate(img):
-            if np.alltrue(np.isclose(np.average(line), line)):
-                indices.append(_i)
-        if len(indices) != 0:
-            self.invalid_indices = np.asarray(indices)
-            return np.delete(img, indices, axis=0)
-        img[np.logical_not(np.isfinite(img))] = np.average(img[np.isfinite(img)])
+        """
+        Image with invalid lines removed (or filled in keep_shape mode) and non-finite values replaced
+        """
+        with span('sanitize'):
+            return self._sanitize()
+
+    def _sanitize(self) -> np.ndarray:
+        img = self.original
+        invalid = find_invalid_lines(img)
+        self.invalid_mask = invalid
+        if invalid.any() and not self.keep_shape:
+            self.invalid_indices = np.flatnonzero(invalid)
+            img = img[~invalid]
+        else:
+            img = img.copy()
+        if self.low_memory:
+            img = img.astype('float32', copy=False)
+            if self.release_raw:
+                # The image may be shared, only this wrapper lets go of the data
+                self._raw = replace(self._raw, data=None)
+        finite = np.isfinite(img)
+        if not finite.all():
+            valid = finite & ~invalid[:, np.newaxis] if self.keep_shape else finite
+            img[~finite] = np.average(img[valid])
+        if self.keep_shape and invalid.any():
+            fill_invalid_lines(img, invalid)
         return img
 
+    @cached_property
+    def content_hash(self) -> str:
+        """Hash of the sanitized image, identifies the image for persistent caches"""
+        with span('hash'):
+            return content_hash(self.sanitized)
+
     def is_border_valid(self, border: int) -> bool:
         shape = self.sanitized.shape
         return (
@@ -65,26 +260,82 @@ class ImageWrapper(object):
                 and border * 2 + 20 < shape[1]
         )
 
+    def _crop_window(self, border: int) -> Tuple[int, int, int]:
+        """Offset of the cropped image in the sanitized one and its shape"""
+        rows, cols = self.sanitized.shape
+        if not self.is_border_valid(border):
+            return 0, rows, cols
+        return border + 1, rows - 2 * border - 1, cols - 2 * border - 1
+
+    @property
+    def border(self) -> int:
+        return self._border
+
+    @border.setter
+    def border(self, border: int):
+        if len(self.exclusions) != 0 and border != self._border:
+            old, _, _ = self._crop_window(self._border)
+            offset, rows, cols = self._crop_window(border)
+            shift = old - offset
+            moved = list()
+            for top, bottom, left, right in self.exclusions:
+                top, bottom = max(0, top + shift), min(rows, bottom + shift)
+                left, right = max(0, left + shift), min(cols, right + shift)
+                if top < bottom and left < right:
+                    moved.append((top, bottom, left, right))
+            self.exclusions = moved
+        self._border = border
+
+    @property
+    def cropped(self) -> np.ndarray:
+        """Sanitized image with the border removed"""
+        border = self.border if self.is_border_valid(self.border) else 0
+
+        def compute():
+            img = self.sanitized
+            if border != 0:
+                img = img[border + 1:-1 * border, border + 1:-1 * border]
+            return img
+
+        return self._stage('cropped', border, compute)
+
     @property
     def shape(self) -> Tuple[int, int]:
-        border = self.border
-        shape = self.sanitized.shape
-        if border != 0 and self.is_border_valid(border):
-            return shape[0] - 2 * border, shape[1] - 2 * border
-        else:
-            return shape
+        return self.cropped.shape
+
+    @property
+    def _key(self) -> Hashable:
+        return self.border, self.active, self.normalized, self.degree, self.background_preview
 
     @property
     def processed(self) -> np.ndarray:
-        border = self.border
-        img = self.sanitized
-        if border != 0 and self.is_border_valid(border):
-            img = img[border + 1:-1 * border, border + 1:-1 * border]
-        if self.active:
-            img = img - self.background
-        if self.normalized:
-            img = self.normalize(img)
-        return img
+        """
+        Cropped image with the background removed and normalized if set
+
+        The result is cached until the settings or the background change, do not modify it in place.
+        """
+
+        def compute():
+            img = self.cropped
+            if self.active:
+                img = img - self.background
+            if self.normalized:
+                img = self.normalize(img)
+            return img
+
+        return self._stage('processed', self._key, compute)
+
+    @property
+    def display(self) -> np.ndarray:
+        """Processed image normalized for display"""
+
+        def compute():
+            img = self.processed
+            if not self.normalized:
+                img = self.normalize(img)
+            return img
+
+        return self._stage('display', self._key, compute)
 
     @property
     def has_background(self) -> bool:
@@ -93,13 +344,27 @@ class ImageWrapper(object):
     @property
     def background(self) -> np.ndarray:
         if self.active:
+            if isinstance(self._bg, PolynomialBackground):
+                return self._bg.evaluate(dtype=self.dtype)
             return self._bg
         else:
-            return np.zeros(self.shape)
+            return self._zeros
 
     @background.setter
-    def background(self, bg: np.ndarray):
+    def background(self, bg: Union[np.ndarray, PolynomialBackground]):
+        if self.low_memory and isinstance(bg, np.ndarray):
+            bg = bg.astype('float32', copy=False)
         self._bg = bg
+        self.invalidate('processed', 'display')
+
+    @property
+    def background_shape(self) -> Optional[Tuple[int, int]]:
+        return self._bg.shape if self._bg is not None else None
+
+    @property
+    def _zeros(self) -> np.ndarray:
+        shape = self.shape
+        return self._stage('zeros', shape, lambda: np.zeros(shape, dtype=self.dtype))
 
     @property
     def degree(self) -> int:
@@ -123,13 +388,39 @@ class ImageWrapper(object):
     @property
     def outliers(self) -> np.ndarray:
         if self.active:
+            if self.low_memory and self._bg_outliers is not None:
+                shape = self.background_shape
+                inliers = np.unpackbits(self._bg_outliers, count=shape[0] * shape[1]).astype(bool).reshape(shape)
+                return np.ma.masked_where(inliers, inliers)
             return self._bg_outliers
         else:
-            return np.zeros(self.shape)
+            return self._zeros
 
     @outliers.setter
     def outliers(self, outliers: np.ndarray):
+        """Outliers as a masked array where the inliers are masked"""
+        if self.low_memory and outliers is not None:
+            outliers = np.packbits(np.ma.getdata(outliers).astype(bool))
         self._bg_outliers = outliers
 
+    @property
+    def nbytes(self) -> int:
+        """Approximate resident size of the image data held by this wrapper"""
+        arrays = [v for _, v in self._stages.values()]
+        arrays += [self._invalid, self._bg_outliers, self.invalid_indices]
+        if self.raw.has_data():
+            arrays.append(self.raw.data)
+        if 'sanitized' in self.__dict__:
+            arrays.append(self.sanitized)
+        if isinstance(self._bg, np.ndarray):
+            arrays.append(self._bg)
+        owners = dict()
+        for a in arrays:
+            if isinstance(a, np.ndarray):
+                while isinstance(a.base, np.ndarray):
+                    a = a.base
+                owners[id(a)] = a.nbytes
+        return sum(owners.values())
+
 
-__all__ = ['ImageWrapper']
+__all__ = ['ImageWrapper', 'find_invalid_lines', 'fill_invalid_lines']
@@ -0,0 +1,301 @@
+"""
+Cached polynomial bases for background fits
+
+A basis holds the sampled pixel coordinates of a frame shape and the QR factorisation of their monomials
+in scaled coordinates. The columns are graded by total degree, so the first columns of Q span the lower degree
+polynomials and every degree up to the largest one built shares the same factorisation.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import RLock
+from typing import Tuple, Dict, Hashable, Optional, Callable
+
+import numpy as np
+from scipy.special import comb
+
+from .background import PolynomialBackground
+from .background_store import content_hash
+from ..pipeline import BatchRANSAC, NPAdapter
+
+
+def terms(degree: int) -> int:
+    """Number of monomials of two variables up to degree"""
+    return (degree + 1) * (degree + 2) // 2
+
+
+def graded_powers(degree: int) -> np.ndarray:
+    """Powers of (row, column) in the PolynomialFeatures order, constant first"""
+    return np.asarray([(d - j, j) for d in range(0, degree + 1) for j in range(0, d + 1)], dtype=int)
+
+
+def _shift_matrix(scale: float, offset: float, degree: int) -> np.ndarray:
+    """T[p, k] so that (scale * x + offset)^p = sum T[p, k] x^k"""
+    p, k = np.meshgrid(np.arange(degree + 1), np.arange(degree + 1), indexing='ij')
+    return np.where(k <= p, comb(p, k) * np.float_power(scale, k) * np.float_power(offset, np.maximum(p - k, 0)), 0.)
+
+
+class _CachedRANSAC(BatchRANSAC):
+    """
+    BatchRANSAC on an orthonormal design whose candidate solvers are reused between fits
+
+    The subsets only depend on the seed so the same candidates are drawn for every image of the same basis.
+    """
+
+    def __init__(self, solvers: Dict[bytes, np.ndarray] = None, **kwargs):
+        super(_CachedRANSAC, self).__init__(**kwargs)
+        self.solvers = solvers
+
+    def _design(self, X: np.ndarray, estimator) -> np.ndarray:
+        return X
+
+    def _candidates(self, a: np.ndarray, y: np.ndarray, w: Optional[np.ndarray], subsets: np.ndarray) -> np.ndarray:
+        key = subsets.tobytes()
+        solver = self.solvers.get(key)
+        if solver is None:
+            solver = np.linalg.pinv(a[subsets])
+            self.solvers[key] = solver
+        return (solver @ y[subsets][..., None])[..., 0].T
+
+
+@dataclass(frozen=True)
+class BasisFit:
+    """
+    Background fitted on a basis, coefficients are for raw pixel coordinates in the PolynomialFeatures order
+    """
+    background: PolynomialBackground
+    coef: np.ndarray
+    errors: np.ndarray
+    inlier_mask: np.ndarray
+    n_trials: int
+
+    @property
+    def intercept_(self) -> float:
+        return self.coef[0]
+
+    @property
+    def coef_(self) -> np.ndarray:
+        """Same order as WrapperRegressor.coef_"""
+        return self.coef[1:][::-1]
+
+    @property
+    def errors_(self) -> np.ndarray:
+        """Same order as WrapperRegressor.errors_, intercept last"""
+        return self.errors[::-1]
+
+
+class PolynomialBasis(object):
+    """
+    Orthonormal polynomial basis for the sampled pixels of a frame shape
+
+    Grows to higher degrees on demand, lower degrees are the leading columns of the factorisation.
+    """
+    shape: Tuple[int, int]
+    rows: np.ndarray
+    cols: np.ndarray
+    degree: int
+
+    def __init__(self, shape: Tuple[int, int], rows: np.ndarray, cols: np.ndarray, degree: int = 3):
+        super(PolynomialBasis, self).__init__()
+        self.shape = tuple(shape)
+        self.rows = rows
+        self.cols = cols
+        self._lock = RLock()
+        self._scale = tuple((2 / (n - 1), -1.) if n > 1 else (1., 0.) for n in self.shape)
+        self._solvers: Dict[Tuple[int, int], Dict[bytes, np.ndarray]] = dict()
+        self._raw: Dict[int, np.ndarray] = dict()
+        self._build(degree)
+
+    def _monomials(self, low: int, degree: int) -> np.ndarray:
+        """Columns of the scaled monomials of total degree low to degree"""
+        u = self._scale[0][0] * self.rows + self._scale[0][1]
+        v = self._scale[1][0] * self.cols + self._scale[1][1]
+        powers = graded_powers(degree)[terms(low - 1):]
+        return np.float_power(u[:, None], powers[:, 0]) * np.float_power(v[:, None], powers[:, 1])
+
+    def _build(self, degree: int) -> None:
+        self.q, self.r = np.linalg.qr(self._monomials(0, degree))
+        self.degree = degree
+
+    def _extend(self, degree: int) -> None:
+        """
+        Appends the columns of the degrees above the current one by block Gram-Schmidt
+
+        The leading columns of Q and R do not change, so the solvers and raw maps of lower degrees stay valid.
+        """
+        q1, r1 = self.q, self.r
+        a = self._monomials(self.degree + 1, degree)
+        r12 = q1.T @ a
+        w = a - q1 @ r12
+        # A second pass restores the orthogonality lost to cancellation
+        c = q1.T @ w
+        w -= q1 @ c
+        r12 += c
+        q2, r22 = np.linalg.qr(w)
+        self.q = np.hstack((q1, q2))
+        self.r = np.block([[r1, r12], [np.zeros((len(r22), len(r1))), r22]])
+        self.degree = degree
+
+    def ensure(self, degree: int) -> None:
+        """Extends the basis to a higher degree, keeping the factorisation of the lower ones"""
+        with self._lock:
+            if degree > self.degree:
+                self._extend(degree)
+
+    @property
+    def nbytes(self) -> int:
+        return self.q.nbytes + self.r.nbytes + self.rows.nbytes + self.cols.nbytes + sum(
+            s.nbytes for solvers in self._solvers.values() for s in solvers.values()
+        )
+
+    def design(self, degree: int) -> np.ndarray:
+        """Orthonormal columns spanning the polynomials up to degree"""
+        self.ensure(degree)
+        return self.q[:, :terms(degree)]
+
+    def project(self, values: np.ndarray, degree: int) -> np.ndarray:
+        """Least squares coefficients of the orthonormal columns"""
+        return self.design(degree).T @ values
+
+    def to_raw(self, degree: int) -> np.ndarray:
+        """
+        Matrix mapping orthonormal coefficients to monomial coefficients of raw pixel coordinates
+        """
+        if degree in self._raw:
+            return self._raw[degree]
+        n = terms(degree)
+        powers = graded_powers(degree)
+        scaled = np.linalg.solve(self.r[:n, :n], np.eye(n))
+        tr = _shift_matrix(*self._scale[0], degree)
+        tc = _shift_matrix(*self._scale[1], degree)
+        out = np.empty((n, n))
+        for i in range(n):
+            c = np.zeros((degree + 1, degree + 1))
+            c[powers[:, 0], powers[:, 1]] = scaled[:, i]
+            out[:, i] = (tr.T @ c @ tc)[powers[:, 0], powers[:, 1]]
+        self._raw[degree] = out
+        return out
+
+    def fit(
+            self,
+            values: np.ndarray,
+            degree: int,
+            min_samples: int,
+            max_trials: int = 100,
+            check: Callable[[], None] = None,
+    ) -> BasisFit:
+        """
+        RANSAC fit of the sampled values, candidate solvers are kept for the next image
+
+        The check callable is called between RANSAC batches and may raise to abort the fit.
+        """
+        with self._lock:
+            a = self.design(degree)
+            solvers = self._solvers.setdefault((degree, min_samples), dict())
+            reg = _CachedRANSAC(
+                solvers=solvers,
+                estimator=NPAdapter(fit_intercept=False),
+                min_samples=min_samples,
+                max_trials=max_trials,
+                random_state=0,
+                check=check,
+            )
+            reg.fit(a, values)
+            m = self.to_raw(degree)
+        est: NPAdapter = reg.estimator_
+        coef = m @ est.params_
+        errors = np.sqrt(np.abs(np.diag(m @ est.cov_ @ m.T)))
+        powers = graded_powers(degree)
+        background = PolynomialBackground.from_features(powers[1:], coef[1:], coef[0], self.shape)
+        return BasisFit(
+            background=background,
+            coef=coef,
+            errors=errors,
+            inlier_mask=reg.inlier_mask_,
+            n_trials=reg.n_trials_,
+        )
+
+
+def stratified_sample(shape: Tuple[int, int], count: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Row and column indices of at most count pixels, one random pixel from each cell of a regular grid
+
+    Returns every pixel if count covers the image.
+    """
+    step = int(np.ceil(np.sqrt(shape[0] * shape[1] / count)))
+    if step <= 1:
+        rows, cols = np.indices(shape)
+        return rows.ravel(), cols.ravel()
+    rng = np.random.default_rng(seed)
+    r0 = np.arange(0, shape[0], step)
+    c0 = np.arange(0, shape[1], step)
+    rows = r0[:, None] + rng.integers(0, np.minimum(step, shape[0] - r0)[:, None], size=(len(r0), len(c0)))
+    cols = c0[None, :] + rng.integers(0, np.minimum(step, shape[1] - c0)[None, :], size=(len(r0), len(c0)))
+    return rows.ravel(), cols.ravel()
+
+
+class BasisCache(object):
+    """
+    LRU of polynomial bases keyed by (shape, border, samples, mask)
+
+    The degree is not part of the key, a basis grows to the largest degree asked for and serves the lower ones.
+    With a mask the basis only has the sampled pixels where the mask is True.
+    """
+
+    def __init__(self, size: int = 4):
+        super(BasisCache, self).__init__()
+        self.size = size
+        self._bases: OrderedDict = OrderedDict()
+        self._lock = RLock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._bases)
+
+    def get(
+            self,
+            shape: Tuple[int, int],
+            border: int,
+            degree: int,
+            samples: int,
+            mask: np.ndarray = None,
+    ) -> PolynomialBasis:
+        key: Hashable = (tuple(shape), border, samples, content_hash(mask) if mask is not None else None)
+        with self._lock:
+            basis = self._bases.get(key)
+            if basis is None:
+                rows, cols = stratified_sample(shape, samples)
+                if mask is not None:
+                    keep = mask[rows, cols]
+                    rows, cols = rows[keep], cols[keep]
+                basis = PolynomialBasis(shape, rows, cols, degree=degree)
+                self._bases[key] = basis
+                while len(self._bases) > self.size:
+                    self._bases.popitem(last=False)
+            self._bases.move_to_end(key)
+        basis.ensure(degree)
+        return basis
+
+    def clear(self) -> None:
+        with self._lock:
+            self._bases.clear()
+
+
+_cache = BasisCache()
+
+
+def basis_cache() -> BasisCache:
+    """
+    The shared basis cache
+    """
+    return _cache
+
+
+__all__ = [
+    'PolynomialBasis',
+    'BasisFit',
+    'BasisCache',
+    'basis_cache',
+    'stratified_sample',
+    'graded_powers',
+    'terms',
+]
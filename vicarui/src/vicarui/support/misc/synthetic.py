@@ -0,0 +1,97 @@
+"""
+Synthetic frames and image wrappers for tests and benchmarks
+
+The frames are plain arrays in (lines, samples) order, wrap_array turns one into an ImageWrapper.
+"""
+from typing import Tuple
+
+import numpy as np
+from vicarutil.image import VicarImage, Labels
+
+from .image_wrapper import ImageWrapper
+
+
+def wrap_array(data: np.ndarray, border: int = None, **kwargs) -> ImageWrapper:
+    """
+    Wrapper of a single band image holding a copy of the data, kwargs are passed to ImageWrapper
+    """
+    labels = Labels(system=dict(), properties=dict(), tasks=dict())
+    image = ImageWrapper(VicarImage(
+        name='synthetic', labels=labels, eol_labels=None, data=data[np.newaxis].copy(),
+        binary_prefix=None, binary_header=None
+    ), **kwargs)
+    if border is not None:
+        image.border = border
+    return image
+
+
+def gradient_frame(
+        size: int = 200,
+        seed: int = 0,
+        cubic: float = 8.,
+        disk: float = 30.,
+        spikes: float = 0.,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Polynomial background with unit noise, returns data and background
+
+    A disk brighter by disk covers part of the frame and a spikes fraction of the pixels is 50 brighter.
+    """
+    rng = np.random.default_rng(seed)
+    i, j = np.mgrid[0:size, 0:size] / size
+    background = 100 + 20 * i - 10 * j + 5 * i * j + cubic * i ** 3
+    data = background + rng.normal(0, 1, (size, size))
+    data[(i - 0.4) ** 2 + (j - 0.6) ** 2 < 0.05] += disk
+    if spikes:
+        data[rng.random((size, size)) < spikes] += 50
+    return data, background
+
+
+def disc_frame(size: int = 256, seed: int = 0, tilt: float = 0.2) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Background with a bright tilted disc covering about a third of the frame, returns data, background and disc
+    """
+    rng = np.random.default_rng(seed)
+    i, j = np.mgrid[0:size, 0:size]
+    background = 100 + 0.05 * i - 0.03 * j + 1e-4 * i * j
+    data = background + rng.normal(0, 1, (size, size))
+    disc = (j - size * 0.55) ** 2 + (i - size * 0.45) ** 2 < (size * 0.33) ** 2
+    data[disc] += 40 + tilt * (j[disc] - size * 0.55)
+    return data, background, disc
+
+
+def shadow_frame(
+        shape: Tuple[int, int] = (200, 300),
+        slope: float = 0.2,
+        half_width: int = 20,
+        seed: int = 0,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Quadratic background with a shadow through the frame center, slope samples per line
+
+    Returns the data and the x, y and fit centers of horizontal selections along the shadow, 20 lines from the edges.
+    """
+    rng = np.random.default_rng(seed)
+    lines, samples = shape
+    i, j = np.mgrid[0:lines, 0:samples]
+    data = 1e-4 * (j - samples / 2) ** 2 + 5 + rng.normal(0, 0.01, shape)
+    data[np.abs(j - (samples / 2 + slope * (i - lines / 2))) <= half_width] -= 0.5
+    y = np.arange(20, lines - 20)
+    x = np.round(samples / 2 + slope * (y - lines / 2)).astype(int)
+    return data, x, y, x + 0.25
+
+
+def invalid_lines_frame(shape: Tuple[int, int] = (40, 30), seed: int = 0) -> np.ndarray:
+    """
+    Noise frame with invalid lines 0, 10, 11 and the last and an infinite pixel on line 20
+    """
+    data = np.random.default_rng(seed).normal(100, 10, size=shape)
+    data[0] = 0
+    data[10] = 5
+    data[11] = 5
+    data[-1] = np.nan
+    data[20, 3] = np.inf
+    return data
+
+
+__all__ = ['wrap_array', 'gradient_frame', 'disc_frame', 'shadow_frame', 'invalid_lines_frame']
@@ -1,4 +1,7 @@
 from .statsmodels_adapter import *
+from .numpy_adapter import *
+from .batch_ransac import *
+from .irls import *
 from .adapter_interface import *
 from .partial import *
 from .pipe import *
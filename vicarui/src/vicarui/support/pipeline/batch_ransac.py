@@ -0,0 +1,222 @@
+"""
+RANSAC for models linear in their parameters
+
+Candidate subsets are drawn in batches, solved together with a stacked QR decomposition and their inliers counted at once.
+Candidates are accepted in the order they were drawn with the rules of RANSACRegressor,
+so the result does not depend on the batch size. Batches start from one candidate and double up to batch_size.
+"""
+from typing import Optional, Union, Callable
+
+import numpy as np
+from sklearn.base import BaseEstimator, RegressorMixin, clone
+
+from .adapter_interface import WrapperRegressor
+from .numpy_adapter import NPAdapter
+
+_EPSILON = np.spacing(1)
+
+_KEYED_SAMPLES = 1 << 12
+"""
+Inputs up to this many samples draw their subsets from random keys, longer ones with Generator.choice
+"""
+
+
+def dynamic_max_trials(n_inliers: int, n_samples: int, min_samples: int, probability: float) -> float:
+    """
+    Trials needed to draw an outlier free subset with the given probability
+    """
+    nom = max(_EPSILON, 1 - probability)
+    denom = max(_EPSILON, 1 - (n_inliers / n_samples) ** min_samples)
+    if nom == 1:
+        return 0
+    if denom == 1:
+        return np.inf
+    return abs(float(np.ceil(np.log(nom) / np.log(denom))))
+
+
+class BatchRANSAC(BaseEstimator, RegressorMixin):
+    """
+    RANSAC for linear models with batched candidate fits
+
+    The estimator is only fitted on the final inliers, the candidates are least squares fits of X
+    (with a constant column if the estimator fits an intercept).
+
+    Exposes inlier_mask_, estimator_ and n_trials_ like RANSACRegressor.
+    The check callable is called before every batch and may raise to abort the fit.
+    """
+    estimator_: Optional[WrapperRegressor]
+    inlier_mask_: Optional[np.ndarray]
+    n_trials_: int
+
+    def __init__(
+            self,
+            estimator: WrapperRegressor = None,
+            min_samples: Union[int, float] = None,
+            residual_threshold: float = None,
+            max_trials: int = 100,
+            stop_n_inliers: float = np.inf,
+            stop_score: float = np.inf,
+            stop_probability: float = 0.99,
+            random_state: int = None,
+            batch_size: int = 64,
+            max_elements: int = 1 << 23,
+            check: Callable[[], None] = None,
+    ):
+        self.estimator = estimator
+        self.min_samples = min_samples
+        self.residual_threshold = residual_threshold
+        self.max_trials = max_trials
+        self.stop_n_inliers = stop_n_inliers
+        self.stop_score = stop_score
+        self.stop_probability = stop_probability
+        self.random_state = random_state
+        self.batch_size = batch_size
+        self.max_elements = max_elements
+        self.check = check
+
+    def _design(self, X: np.ndarray, estimator) -> np.ndarray:
+        X = np.asarray(X, dtype='float64')
+        if X.ndim == 1:
+            X = X[..., None]
+        if getattr(estimator, 'fit_intercept', True):
+            X = np.column_stack((np.ones(len(X)), X))
+        # Scaling the columns keeps high degree pixel coordinate features well conditioned
+        scale = np.max(np.abs(X), axis=0)
+        scale[scale == 0] = 1
+        return X / scale
+
+    def _min_samples(self, n_samples: int, n_params: int) -> int:
+        if self.min_samples is None:
+            min_samples = n_params + 1
+        elif 0 < self.min_samples < 1:
+            min_samples = int(np.ceil(self.min_samples * n_samples))
+        else:
+            min_samples = int(self.min_samples)
+        if min_samples > n_samples:
+            raise ValueError(
+                f"min_samples may not be larger than number of samples: n_samples = {n_samples}"
+            )
+        return min_samples
+
+    def _candidates(self, a: np.ndarray, y: np.ndarray, w: Optional[np.ndarray], subsets: np.ndarray) -> np.ndarray:
+        """Parameters for each subset as columns"""
+        a_sub = a[subsets]
+        y_sub = y[subsets]
+        if w is not None:
+            a_sub = a_sub * w[subsets][..., None]
+            y_sub = y_sub * w[subsets]
+        try:
+            # Stacked QR is several times cheaper than the SVD of pinv for these small systems
+            q, r = np.linalg.qr(a_sub)
+            return np.linalg.solve(r, q.transpose(0, 2, 1) @ y_sub[..., None])[..., 0].T
+        except np.linalg.LinAlgError:
+            # Rank deficient subsets take the minimum norm solution
+            return (np.linalg.pinv(a_sub) @ y_sub[..., None])[..., 0].T
+
+    @staticmethod
+    def _subsets(rng: np.random.Generator, n_samples: int, min_samples: int, count: int) -> np.ndarray:
+        """
+        Subsets as rows
+
+        Short inputs take the indices of the smallest random keys of each row, one call for the batch.
+        The keys are drawn row by row from the same stream so the subsets do not depend on the batch size.
+        """
+        if n_samples <= _KEYED_SAMPLES:
+            keys = rng.random((count, n_samples))
+            if min_samples == n_samples:
+                return np.argsort(keys, axis=1)
+            return np.argpartition(keys, min_samples, axis=1)[:, :min_samples]
+        return np.stack([rng.choice(n_samples, min_samples, replace=False) for _ in range(count)])
+
+    @staticmethod
+    def _score(y: np.ndarray, residuals: np.ndarray, inliers: np.ndarray) -> float:
+        """R^2 of a candidate over its own inliers"""
+        y = y[inliers]
+        residuals = residuals[inliers]
+        ss_res = residuals @ residuals
+        y = y - y.sum() / len(y)
+        ss_tot = y @ y
+        if ss_tot == 0:
+            return 1. if ss_res == 0 else 0.
+        return 1 - ss_res / ss_tot
+
+    def fit(self, X, y, sample_weight=None):
+        estimator = clone(self.estimator) if self.estimator is not None else NPAdapter()
+        y = np.asarray(y, dtype='float64')
+        a = self._design(X, estimator)
+        n_samples, n_params = a.shape
+        min_samples = self._min_samples(n_samples, n_params)
+        w = None if sample_weight is None else np.sqrt(np.asarray(sample_weight, dtype='float64'))
+
+        if self.residual_threshold is None:
+            threshold = np.median(np.abs(y - np.median(y)))
+        else:
+            threshold = self.residual_threshold
+
+        rng = np.random.default_rng(self.random_state)
+        max_batch = max(1, min(self.batch_size, self.max_elements // max(1, n_samples)))
+        batch_size = 1
+
+        n_inliers_best = 1
+        score_best = -np.inf
+        inlier_mask_best = None
+        max_trials = self.max_trials
+        self.n_trials_ = 0
+
+        while self.n_trials_ < max_trials:
+            if self.check is not None:
+                self.check()
+            count = int(min(batch_size, max_trials - self.n_trials_))
+            subsets = self._subsets(rng, n_samples, min_samples, count)
+            # Absolute residuals computed in place, this is the bulk of the work
+            residuals = a @ self._candidates(a, y, w, subsets)
+            residuals -= y[..., None]
+            np.abs(residuals, out=residuals)
+            inliers = residuals <= threshold
+            n_inliers = inliers.sum(axis=0)
+
+            for i in range(count):
+                if self.n_trials_ >= max_trials:
+                    break
+                self.n_trials_ += 1
+                if n_inliers[i] < n_inliers_best:
+                    continue
+                # Scores are only needed for the few candidates that can be accepted
+                score = self._score(y, residuals[:, i], inliers[:, i])
+                if n_inliers[i] == n_inliers_best and score < score_best:
+                    continue
+                n_inliers_best = n_inliers[i]
+                score_best = score
+                inlier_mask_best = inliers[:, i]
+                max_trials = min(
+                    max_trials,
+                    dynamic_max_trials(n_inliers_best, n_samples, min_samples, self.stop_probability)
+                )
+                if n_inliers_best >= self.stop_n_inliers or score_best >= self.stop_score:
+                    max_trials = self.n_trials_
+                    break
+
+            # Batches grow so an early stop does not waste a full batch
+            batch_size = min(2 * batch_size, max_batch)
+
+        if inlier_mask_best is None:
+            raise ValueError("RANSAC could not find a valid consensus set")
+
+        self.inlier_mask_ = inlier_mask_best.copy()
+        X = np.asarray(X)
+        if sample_weight is None:
+            estimator.fit(X[self.inlier_mask_], y[self.inlier_mask_])
+        else:
+            estimator.fit(
+                X[self.inlier_mask_],
+                y[self.inlier_mask_],
+                sample_weight=np.asarray(sample_weight)[self.inlier_mask_]
+            )
+        self.estimator_ = estimator
+        return self
+
+    def predict(self, X):
+        return self.estimator_.predict(X)
+
+
+__all__ = ['BatchRANSAC', 'dynamic_max_trials']
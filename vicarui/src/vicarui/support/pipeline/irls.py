@@ -0,0 +1,259 @@
+"""
+Robust linear regression with iteratively reweighted least squares
+
+Follows statsmodels RLM with the default options (MAD scale, deviance convergence and H1 covariance)
+and fits a stack of series at once. Missing values in a series are given as NaN.
+"""
+from dataclasses import dataclass
+from typing import Dict, Type, Optional
+
+import numpy as np
+
+from .adapter_interface import WrapperRegressor
+
+_MAD_NORMALIZATION = 0.6744897501960817
+
+
+class Huber(object):
+    """
+    Huber's T norm
+    """
+
+    def __init__(self, t: float = 1.345):
+        self.t = t
+
+    def rho(self, z: np.ndarray) -> np.ndarray:
+        z = np.abs(z)
+        return np.where(z <= self.t, 0.5 * z ** 2, self.t * z - 0.5 * self.t ** 2)
+
+    def psi(self, z: np.ndarray) -> np.ndarray:
+        return np.clip(z, -self.t, self.t)
+
+    def psi_deriv(self, z: np.ndarray) -> np.ndarray:
+        return (np.abs(z) <= self.t).astype('float64')
+
+    def weights(self, z: np.ndarray) -> np.ndarray:
+        z = np.abs(z)
+        with np.errstate(divide='ignore'):
+            return np.where(z <= self.t, 1., self.t / z)
+
+
+class Tukey(object):
+    """
+    Tukey's biweight norm
+    """
+
+    def __init__(self, c: float = 4.685):
+        self.c = c
+
+    def _inside(self, z: np.ndarray):
+        inside = np.abs(z) <= self.c
+        return inside, np.where(inside, 1 - (z / self.c) ** 2, 0.)
+
+    def rho(self, z: np.ndarray) -> np.ndarray:
+        inside, u = self._inside(z)
+        return self.c ** 2 / 6 * np.where(inside, 1 - u ** 3, 1.)
+
+    def psi(self, z: np.ndarray) -> np.ndarray:
+        _, u = self._inside(z)
+        return z * u ** 2
+
+    def psi_deriv(self, z: np.ndarray) -> np.ndarray:
+        _, u = self._inside(z)
+        return u ** 2 - 4 * z ** 2 / self.c ** 2 * u
+
+    def weights(self, z: np.ndarray) -> np.ndarray:
+        _, u = self._inside(z)
+        return u ** 2
+
+
+NORMS: Dict[str, Type] = {
+    'huber': Huber,
+    'tukey': Tukey,
+}
+
+
+@dataclass(frozen=True)
+class IRLSResult:
+    """
+    Stacked results, params and bse are in the design column order with the intercept first
+    """
+    params: np.ndarray
+    bse: np.ndarray
+    scale: np.ndarray
+    weights: np.ndarray
+    iterations: np.ndarray
+
+
+def _solve(a: np.ndarray, y: np.ndarray, w: np.ndarray) -> np.ndarray:
+    sw = np.sqrt(w)
+    a = a * sw[..., None]
+    y = (y * sw)[..., None]
+    try:
+        # Stacked QR is several times cheaper than the SVD of pinv
+        q, r = np.linalg.qr(a)
+        return np.linalg.solve(r, np.swapaxes(q, -1, -2) @ y)[..., 0]
+    except np.linalg.LinAlgError:
+        return (np.linalg.pinv(a) @ y)[..., 0]
+
+
+def _mad(resid: np.ndarray, valid: np.ndarray, nobs: np.ndarray) -> np.ndarray:
+    """MAD around zero of the valid values in each row"""
+    s = np.sort(np.where(valid, np.abs(resid), np.inf), axis=-1)
+    low = np.take_along_axis(s, ((nobs - 1) // 2)[..., None], axis=-1)[..., 0]
+    high = np.take_along_axis(s, (nobs // 2)[..., None], axis=-1)[..., 0]
+    return (low + high) / (2 * _MAD_NORMALIZATION)
+
+
+def irls(
+        X: np.ndarray,
+        Y: np.ndarray,
+        norm: str = 'huber',
+        tuning: float = None,
+        fit_intercept: bool = True,
+        max_iter: int = 50,
+        tol: float = 1e-8,
+) -> IRLSResult:
+    """
+    Robust fits for many series at once
+
+    X is (n, m) shared by all series or (k, n, m) and Y is (k, n), a single series may also be given as (n,).
+    Every series iterates until its own deviance converges.
+    """
+    Y = np.asarray(Y, dtype='float64')
+    single = Y.ndim == 1
+    Y = np.atleast_2d(Y)
+    X = np.asarray(X, dtype='float64')
+    if X.ndim == 1:
+        X = X[..., None]
+    if fit_intercept:
+        X = np.concatenate((np.ones((*X.shape[:-1], 1)), X), axis=-1)
+    a = np.broadcast_to(X, (len(Y), *X.shape[-2:]))
+    m = NORMS[norm]() if tuning is None else NORMS[norm](tuning)
+
+    # Missing rows are zeroed so their residuals stay zero and plain sums can be used
+    valid = np.isfinite(Y)
+    a = np.where(valid[..., None], a, 0.)
+    y = np.where(valid, Y, 0.)
+    nobs = valid.sum(axis=-1)
+    n_params = a.shape[-1]
+    rank = np.linalg.matrix_rank(a)
+
+    def deviance(resid, w, n):
+        wscale = np.sum(w * resid ** 2, axis=-1) / (n - n_params)
+        return np.sum(m.rho(resid / wscale[..., None]), axis=-1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = valid.astype('float64')
+        params = _solve(a, y, w)
+        resid = y - (a @ params[..., None])[..., 0]
+        scale = _mad(resid, valid, nobs)
+        dev = deviance(resid, w, nobs)
+        iterations = np.ones(len(y), dtype=int)
+        active = scale != 0
+
+        while active.any():
+            idx = np.flatnonzero(active)
+            w_new = np.where(valid[idx], m.weights(resid[idx] / scale[idx, None]), 0.)
+            params[idx] = _solve(a[idx], y[idx], w_new)
+            w[idx] = w_new
+            resid[idx] = y[idx] - (a[idx] @ params[idx, :, None])[..., 0]
+            scale[idx] = _mad(resid[idx], valid[idx], nobs[idx])
+            new_dev = deviance(resid[idx], w_new, nobs[idx])
+            iterations[idx] += 1
+            active[idx] = (np.abs(new_dev - dev[idx]) > tol) & (iterations[idx] < max_iter) & (scale[idx] != 0)
+            dev[idx] = new_dev
+
+        sresid = resid / scale[..., None]
+        psi_deriv = np.where(valid, m.psi_deriv(sresid), 0.)
+        mean_deriv = np.sum(psi_deriv, axis=-1) / nobs
+        var_deriv = np.sum(np.where(valid, psi_deriv - mean_deriv[..., None], 0.) ** 2, axis=-1) / nobs
+        k = 1 + rank / nobs * var_deriv / mean_deriv ** 2
+        ss_psi = np.sum(np.where(valid, m.psi(sresid), 0.) ** 2, axis=-1)
+        pinv = np.linalg.pinv(a)
+        normalized_cov = pinv @ np.swapaxes(pinv, -1, -2)
+        factor = k ** 2 * (ss_psi / (nobs - rank) * scale ** 2) / mean_deriv ** 2
+        bse = np.sqrt(np.diagonal(normalized_cov, axis1=-2, axis2=-1) * factor[..., None])
+
+    result = IRLSResult(params=params, bse=bse, scale=scale, weights=w, iterations=iterations)
+    if single:
+        result = IRLSResult(*(v[0] for v in (params, bse, scale, w, iterations)))
+    return result
+
+
+class IRLSAdapter(WrapperRegressor):
+    """
+    Robust regressor using IRLS with the Huber or Tukey norm
+
+    Gives the same estimates as SMAdapter with RLM, std_ is the robust (MAD) residual scale.
+    Sample weights are not supported and ignored.
+    """
+    result_: Optional[IRLSResult]
+
+    def __init__(
+            self,
+            norm: str = 'huber',
+            tuning: float = None,
+            fit_intercept: bool = True,
+            max_iter: int = 50,
+            tol: float = 1e-8,
+    ):
+        self.norm = norm
+        self.tuning = tuning
+        self.fit_intercept = fit_intercept
+        self.max_iter = max_iter
+        self.tol = tol
+
+    def fit(self, X, y, sample_weight=None):
+        self.result_ = irls(
+            X,
+            np.asarray(y).ravel(),
+            norm=self.norm,
+            tuning=self.tuning,
+            fit_intercept=self.fit_intercept,
+            max_iter=self.max_iter,
+            tol=self.tol,
+        )
+        return self
+
+    def predict(self, X, y=None):
+        X = np.asarray(X, dtype='float64')
+        if X.ndim == 1:
+            X = X[..., None]
+        params = self.result_.params
+        if self.fit_intercept:
+            return X @ params[1:] + params[0]
+        return X @ params
+
+    @property
+    def intercept_(self):
+        """
+        Intercept
+        """
+        return self.result_.params[0] if self.fit_intercept else None
+
+    @property
+    def coef_(self):
+        """
+        From largest to smallest C[n] * x^n + C[(n-1)] + x ^(n-1) + ....
+
+        No intercept
+        """
+        params = self.result_.params
+        return params[1:][::-1] if self.fit_intercept else params[::-1]
+
+    @property
+    def errors_(self):
+        """
+        Same order as coef, intercept last
+
+        C[n] * x^n + C[(n-1)] + x ^(n-1) + ....
+        """
+        return self.result_.bse[::-1]
+
+    @property
+    def std_(self):
+        return self.result_.scale
+
+
+__all__ = ['IRLSAdapter', 'IRLSResult', 'irls', 'Huber', 'Tukey']
@@ -0,0 +1,89 @@
+from typing import Optional
+
+import numpy as np
+
+from .adapter_interface import WrapperRegressor
+
+
+class NPAdapter(WrapperRegressor):
+    """
+    Ordinary least squares directly on NumPy arrays
+
+    Same results as SMAdapter with OLS, the solution and covariance come from one SVD like the statsmodels pinv method.
+    Sample weights give the WLS solution.
+    """
+    params_: Optional[np.ndarray]
+    cov_: Optional[np.ndarray]
+    bse_: Optional[np.ndarray]
+    scale_: Optional[float]
+    rank_: Optional[int]
+
+    def __init__(self, fit_intercept: bool = True, rcond: float = 1e-15):
+        self.fit_intercept = fit_intercept
+        self.rcond = rcond
+
+    def _design(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype='float64')
+        if X.ndim == 1:
+            X = X[..., None]
+        if self.fit_intercept:
+            return np.column_stack((np.ones(len(X)), X))
+        return X
+
+    def fit(self, X, y, sample_weight=None):
+        a = self._design(X)
+        y = np.asarray(y, dtype='float64')
+        if sample_weight is not None:
+            w = np.sqrt(np.asarray(sample_weight, dtype='float64'))
+            a = a * w[..., None]
+            y = y * w
+
+        u, s, vt = np.linalg.svd(a, full_matrices=False)
+        keep = s > self.rcond * np.max(s, initial=0.)
+        inv_s = np.divide(1., s, out=np.zeros_like(s), where=keep)
+
+        self.params_ = vt.T @ (inv_s * (u.T @ y))
+        self.rank_ = int(np.count_nonzero(keep))
+
+        resid = y - a @ self.params_
+        df_resid = len(y) - self.rank_
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.scale_ = float(resid @ resid / df_resid) if df_resid > 0 else np.nan
+        self.cov_ = (vt.T * inv_s ** 2) @ vt * self.scale_
+        self.bse_ = np.sqrt(np.diag(self.cov_))
+        return self
+
+    def predict(self, X, y=None):
+        return self._design(X) @ self.params_
+
+    @property
+    def intercept_(self):
+        """
+        Intercept
+        """
+        return self.params_[0] if self.fit_intercept else None
+
+    @property
+    def coef_(self):
+        """
+        From largest to smallest C[n] * x^n + C[(n-1)] + x ^(n-1) + ....
+
+        No intercept
+        """
+        return self.params_[1:][::-1] if self.fit_intercept else self.params_[::-1]
+
+    @property
+    def errors_(self):
+        """
+        Same order as coef, intercept last
+
+        C[n] * x^n + C[(n-1)] + x ^(n-1) + ....
+        """
+        return self.bse_[::-1]
+
+    @property
+    def std_(self):
+        return np.sqrt(self.scale_)
+
+
+__all__ = ['NPAdapter']
@@ -8,6 +8,8 @@ from sklearn.compose import TransformedTargetRegressor
 from sklearn.linear_model import RANSACRegressor
 from sklearn.pipeline import make_pipeline, Pipeline
 
+from .batch_ransac import BatchRANSAC
+from .numpy_adapter import NPAdapter
 from .statsmodels_adapter import WrapperRegressor, SMAdapter
 from ..tex import sci_4
 
@@ -16,12 +18,15 @@ def ine(o, d):
     return o if o is not None else d
 
 
-def ransac(min_samples: int, max_iter: int = 1000) -> RANSACRegressor:
-    return RANSACRegressor(
+def ransac(min_samples: int, max_iter: int = 1000, estimator: WrapperRegressor = None) -> BatchRANSAC:
+    """
+    Batched RANSAC with NPAdapter as the estimator by default
+    """
+    return BatchRANSAC(
         random_state=0,
         max_trials=max_iter,
         min_samples=min_samples,
-        base_estimator=SMAdapter()
+        estimator=ine(estimator, NPAdapter())
     )
 
 
@@ -44,6 +49,7 @@ class Pipe(Generic[T]):
     enabled: bool = True
     reg: Union[
         RANSACRegressor,
+        BatchRANSAC,
         TransformedTargetRegressor,
         T
     ] = field(default_factory=lambda: SMAdapter())
@@ -53,7 +59,7 @@ class Pipe(Generic[T]):
 
     @property
     def base(self) -> T:
-        reg: Union[RANSACRegressor, TransformedTargetRegressor, T]
+        reg: Union[RANSACRegressor, BatchRANSAC, TransformedTargetRegressor, T]
         reg = self.reg
         while True:
             try:
@@ -10,23 +10,134 @@ def _f(x, k, A) -> np.ndarray:
     return A * np.float_power(x, k)
 
 
+def _jac(x, k, A) -> np.ndarray:
+    xk = np.float_power(x, k)
+    return np.column_stack((A * xk * np.log(x), xk))
+
+
+def log_linear_guess(x: np.ndarray, y: np.ndarray) -> Tuple[float, float]:
+    """
+    Initial (k, A) from a line fitted to log y against log x
+
+    Uses the points with the same sign as the median of y, falls back to (1, 1).
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    sign = -1. if np.median(y) < 0 else 1.
+    ok = (x > 0) & (sign * y > 0) & np.isfinite(x) & np.isfinite(y)
+    if np.count_nonzero(ok) < 2 or np.ptp(x[ok]) == 0:
+        return 1., 1.
+    k, log_a = np.polyfit(np.log(x[ok]), np.log(sign * y[ok]), 1)
+    return float(k), float(sign * np.exp(log_a))
+
+
+def fit_powerlaws(
+        x: np.ndarray,
+        Y: np.ndarray,
+        sigma: np.ndarray = None,
+        p0: np.ndarray = None,
+        max_iter: int = 100,
+        tol: float = 1e-10,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fits y = A * x^k to many series at once with a vectorised Levenberg-Marquardt
+
+    x is (n,) shared or (s, n), Y and sigma are (s, n) with NaN for missing values, p0 is (s, 2) as (k, A)
+    and defaults to the log-linear estimate of each series.
+    Returns (coef, errors) of shape (s, 2) in the same order as Powerlaw.coef_, sigma is absolute like in Powerlaw.
+    """
+    Y = np.atleast_2d(np.asarray(Y, dtype='float64'))
+    x = np.broadcast_to(np.asarray(x, dtype='float64'), Y.shape)
+    inv_sigma = np.ones_like(Y) if sigma is None else np.reciprocal(np.broadcast_to(sigma, Y.shape).astype('float64'))
+    valid = np.isfinite(Y) & np.isfinite(x) & (x > 0) & np.isfinite(inv_sigma)
+    x = np.where(valid, x, 1.)
+    y = np.where(valid, Y, 0.)
+    inv_sigma = np.where(valid, inv_sigma, 0.)
+    log_x = np.log(x)
+
+    if p0 is None:
+        p = np.asarray([log_linear_guess(xi[v], yi[v]) for xi, yi, v in zip(x, y, valid)])
+    else:
+        p = np.array(np.broadcast_to(p0, (len(Y), 2)), dtype='float64')
+
+    def evaluate(params):
+        xk = np.float_power(x, params[:, 0:1])
+        r = (y - params[:, 1:2] * xk) * inv_sigma
+        j = np.stack((params[:, 1:2] * xk * log_x * inv_sigma, xk * inv_sigma), axis=-1)
+        return r, j, np.sum(r * r, axis=-1)
+
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        r, j, cost = evaluate(p)
+        damping = np.full(len(Y), 1e-3)
+        active = np.isfinite(cost)
+        for _ in range(max_iter):
+            if not active.any():
+                break
+            jtj = np.einsum('sni,snj->sij', j, j)
+            jtr = np.einsum('sni,sn->si', j, r)
+            a = jtj + damping[:, None, None] * jtj * np.eye(2)
+            det = a[:, 0, 0] * a[:, 1, 1] - a[:, 0, 1] * a[:, 1, 0]
+            step = np.stack((
+                a[:, 1, 1] * jtr[:, 0] - a[:, 0, 1] * jtr[:, 1],
+                a[:, 0, 0] * jtr[:, 1] - a[:, 1, 0] * jtr[:, 0],
+            ), axis=-1) / det[:, None]
+            step[~active] = 0
+            trial = p + step
+            r_t, j_t, cost_t = evaluate(trial)
+            better = active & np.isfinite(cost_t) & (cost_t < cost)
+            done = better & ((cost - cost_t) <= tol * cost)
+            p[better] = trial[better]
+            r[better] = r_t[better]
+            j[better] = j_t[better]
+            damping = np.where(better, damping / 10, damping * 10)
+            active &= ~done & (damping < 1e16) & np.all(np.isfinite(step), axis=-1)
+            cost = np.where(better, cost_t, cost)
+
+        jtj = np.einsum('sni,snj->sij', j, j)
+        det = jtj[:, 0, 0] * jtj[:, 1, 1] - jtj[:, 0, 1] * jtj[:, 1, 0]
+        var = np.stack((jtj[:, 1, 1], jtj[:, 0, 0]), axis=-1) / det[:, None]
+        errors = np.where(np.isfinite(var) & (var >= 0), np.sqrt(np.abs(var)), np.inf)
+    return p, errors
+
+
 class Powerlaw(WrapperRegressor):
+    """
+    Fits y = A * x^k, coef_ is (k, A)
+
+    The initial guess defaults to the log-linear estimate, with warm_start the previous solution is used instead.
+    Sample weight are the absolute errors of y.
+    """
     coef_: Optional[np.ndarray] = None
     errors_: Optional[np.ndarray] = None
     cov_: Optional[np.ndarray] = None
 
-    def __init__(self, initial_guess: Tuple[float, float] = (1, 1), max_iter: int = 1000):
+    def __init__(
+            self,
+            initial_guess: Tuple[float, float] = None,
+            max_iter: int = 1000,
+            warm_start: bool = False,
+    ):
         super(Powerlaw, self).__init__()
         self.initial_guess = initial_guess
         self.max_iter = max_iter
+        self.warm_start = warm_start
+
+    def _p0(self, x: np.ndarray, y: np.ndarray) -> Tuple[float, float]:
+        if self.warm_start and self.coef_ is not None and np.all(np.isfinite(self.coef_)):
+            return tuple(self.coef_)
+        if self.initial_guess is not None:
+            return self.initial_guess
+        return log_linear_guess(x, y)
 
     def fit(self, X, y, sample_weight: np.ndarray = None):
         from scipy.optimize import curve_fit
+        x = np.asarray(X, dtype='float64')[:, 0]
         self.coef_, self.cov_ = curve_fit(
             _f,
-            X[:, 0],
+            x,
             y,
-            p0=self.initial_guess,
+            p0=self._p0(x, y),
+            jac=_jac,
             sigma=sample_weight,
             absolute_sigma=True,
             method='lm',
@@ -63,4 +174,4 @@ class Powerlaw(WrapperRegressor):
         )
 
 
-__all__ = ['Powerlaw']
+__all__ = ['Powerlaw', 'fit_powerlaws', 'log_linear_guess']
@@ -5,10 +5,9 @@ from time import time
 from typing import Dict, List, Iterable, TypeVar, Callable, Union, Any
 
 import numpy as np
-from PySide2.QtCore import QThread
 from vicarutil.image.core import read_beg_labels, Labels
 
-from ..concurrent import typedsignal, signal
+from ..concurrent import typedsignal, signal, Task, Cancelled
 from ..ui import Progress
 from ...logging import handle_exception
 
@@ -86,11 +85,15 @@ def exposure_from_image(p: Path) -> str:
         return "Not Found"
 
 
-class FileTask(QThread):
+class FileTask(Task):
     started = signal()
     set_count = typedsignal(int)
     update_count = typedsignal(int)
     finished = typedsignal(dict)
+    aborted = signal()
+    """
+    Emitted instead of finished when the task is cancelled, the current file list is kept
+    """
 
     def __init__(
             self,
@@ -104,23 +107,21 @@ class FileTask(QThread):
         self._start = 0
         self.sort_by = SortType.reverse(sort_by)
 
-        _quit = self.quit
-
         def done(d: Dict):
             done_callback(d)
             Progress.stop()
-            _quit()
 
-        self.started.connect(Progress.start())
+        self.started.connect(Progress.start)
         self.finished.connect(done)
+        self.aborted.connect(Progress.stop)
         self.set_count.connect(lambda i: Progress.max(i))
         self.update_count.connect(lambda i: Progress.value(i))
 
     def abort(self):
-        self.finished.emit(dict())
+        self.aborted.emit()
 
     def check_time(self):
-        from time import time
+        self.check()
         current = time()
         if current - self._start > 30:
             raise TimeoutError()
@@ -158,6 +159,7 @@ class FileTask(QThread):
 
                 for d, _, files in walk(self.base, followlinks=False):
                     p = Path(d)
+                    self.check()
                     for f in files:
                         if f.endswith(FileType.IMAGE.value):
                             try:
@@ -173,10 +175,10 @@ class FileTask(QThread):
                 self.finished.emit(out)
             else:
                 self.finished.emit(dict())
-            self.quit()
         except TimeoutError:
             self.finished.emit(dict())
-            self.quit()
+        except Cancelled:
+            self.abort()
 
 
 __all__ = ['FileTask', 'FileType', 'SortType']
@@ -1,47 +1,146 @@
+from dataclasses import dataclass
 from pathlib import Path
-from typing import NoReturn, Dict
+from typing import NoReturn, Dict, List, Optional
 
-from PySide2.QtCore import QThread
+import numpy as np
 from vicarutil.image import read_image
 
-from ..concurrent import typedsignal, signal
-from ..misc import ImageWrapper
+from ..concurrent import typedsignal, signal, Task
+from ..misc import ImageWrapper, image_cache, file_key
+from ..trace import span
 
 
-class ReadTask(QThread):
+def load_image(p: Path) -> ImageWrapper:
+    """
+    New wrapper of an image from the shared cache, or read, sanitized and cached
+
+    The cache holds a sanitized wrapper that is only copied, so views of the same file do not share state.
+    """
+    key = file_key(p)
+    wrapper = image_cache().get(key)
+    if wrapper is None:
+        with span('read'):
+            wrapper = ImageWrapper(read_image(p))
+        _ = wrapper.sanitized
+        image_cache().put(key, wrapper)
+    return wrapper.copy()
+
+
+class ReadTask(Task):
+    """
+    Reads an image, done emits it and failed is emitted instead if reading raised or the task was cancelled
+    """
     done = typedsignal(ImageWrapper)
+    failed = signal()
 
     def __init__(self, p: Path):
         super(ReadTask, self).__init__()
         self.filepath = p
 
     def run(self) -> NoReturn:
-        image = read_image(self.filepath)
-        wrapper = ImageWrapper(image)
+        try:
+            wrapper = load_image(self.filepath)
+            self.check()
+        except BaseException:
+            self.failed.emit()
+            raise
         self.done.emit(wrapper)
-        self.quit()
 
 
-class BRTask(QThread):
+class PrefetchTask(Task):
+    """
+    Loads images into the shared cache in order
+    """
+
+    def __init__(self, paths: List[Path]):
+        super(PrefetchTask, self).__init__()
+        self.paths = paths
+
+    def run(self) -> NoReturn:
+        for p in self.paths:
+            self.check()
+            load_image(p)
+
+
+def _frozen(a: Optional[np.ndarray]) -> Optional[np.ndarray]:
+    if a is None:
+        return None
+    view = a.view()
+    view.flags.writeable = False
+    return view
+
+
+@dataclass(frozen=True)
+class BackgroundView:
+    """
+    Read only snapshot of the images a background reduction shows
+    """
+    display: np.ndarray
+    original: np.ndarray
+    background: np.ndarray
+    outliers: np.ndarray
+    mse: float
+    preview: bool
+
+    @staticmethod
+    def of(image: ImageWrapper) -> 'BackgroundView':
+        """
+        Views of the current images, later fits on the wrapper replace its arrays and leave these intact
+        """
+        return BackgroundView(
+            display=_frozen(image.display),
+            original=_frozen(image.original),
+            background=_frozen(image.background),
+            outliers=_frozen(image.outliers),
+            mse=image.mse,
+            preview=image.background_preview,
+        )
+
+
+class BRTask(Task):
+    """
+    Background reduction of an image
+
+    In progressive mode a coarse polynomial preview is made and preview emitted with a snapshot of it
+    before the full fit.
+    """
+    preview = typedsignal(BackgroundView)
     done = signal()
 
-    def __init__(self, image: ImageWrapper, br_config: Dict):
+    def __init__(self, image: ImageWrapper, br_config: Dict, progressive: bool = False):
         super(BRTask, self).__init__()
         self._image = image
         self.br_config = br_config
+        self.progressive = progressive
 
     def run(self) -> NoReturn:
-        from ...analysis import br_reduction
+        from ...analysis import br_reduction, fit_mask
         image = self._image
+        self.check()
         image.border = self.br_config['border']
         if self.br_config['reduce']:
             image.active = True
-            br_reduction(image, degree=self.br_config['degree'])
+            config = dict(
+                degree=self.br_config['degree'],
+                engine=self.br_config.get('engine', 'polynomial'),
+                mask=fit_mask(image, target=self.br_config.get('mask', False)),
+                check=self.check,
+                **self.br_config.get('params', dict()),
+            )
+            if self.progressive:
+                with span('preview'):
+                    br_reduction(image, preview=True, **config)
+                if image.background_preview:
+                    image.normalized = self.br_config['normalize']
+                    view = BackgroundView.of(image)
+                    self.check()
+                    self.preview.emit(view)
+            br_reduction(image, **config)
         else:
             image.active = False
         image.normalized = self.br_config['normalize']
+        self.check()
         self.done.emit()
-        self.quit()
 
 
-__all__ = ['ReadTask', 'BRTask']
+__all__ = ['ReadTask', 'BRTask', 'BackgroundView', 'PrefetchTask', 'load_image']
@@ -0,0 +1 @@
+from .trace import *
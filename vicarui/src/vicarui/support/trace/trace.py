@@ -0,0 +1,152 @@
+"""
+Lightweight spans for the hot paths
+
+Span durations are always collected per name for the session summary.
+Events for a Chrome/Perfetto trace are only kept after enable_trace.
+"""
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Dict, Deque, List, Optional, Union, NoReturn
+
+import numpy as np
+
+from ...logging import child
+
+log = child('trace')
+
+HISTORY = 4096
+"""
+Durations kept per span name for the summary
+"""
+MAX_EVENTS = 1_000_000
+"""
+Trace events kept before the oldest are dropped
+"""
+
+_lock = threading.Lock()
+_durations: Dict[str, Deque[float]] = dict()
+_counts: Dict[str, int] = dict()
+_events: Optional[Deque[dict]] = None
+_threads: Dict[int, str] = dict()
+_origin = time.perf_counter_ns()
+
+
+def enable_trace() -> NoReturn:
+    """Starts keeping trace events"""
+    global _events
+    with _lock:
+        if _events is None:
+            _events = deque(maxlen=MAX_EVENTS)
+
+
+def _record(name: str, start: int, wall: int, cpu: int, args: dict) -> NoReturn:
+    thread = threading.current_thread()
+    with _lock:
+        if name not in _durations:
+            _durations[name] = deque(maxlen=HISTORY)
+        _durations[name].append(wall / 1E6)
+        _counts[name] = _counts.get(name, 0) + 1
+        if _events is not None:
+            _threads[thread.ident] = thread.name
+            _events.append({
+                'name': name,
+                'ph': 'X',
+                'ts': (start - _origin) / 1E3,
+                'dur': wall / 1E3,
+                'pid': 1,
+                'tid': thread.ident,
+                'args': {'cpu_ms': cpu / 1E6, **args},
+            })
+
+
+@contextmanager
+def span(name: str, **args):
+    """
+    Records the wall and thread CPU time of a block
+    """
+    start = time.perf_counter_ns()
+    cpu = time.thread_time_ns()
+    try:
+        yield
+    finally:
+        _record(name, start, time.perf_counter_ns() - start, time.thread_time_ns() - cpu, args)
+
+
+def traced(name: str = None):
+    """
+    Decorator recording a span for every call
+    """
+
+    def decorator(f):
+        span_name = name or f.__qualname__
+
+        @wraps(f)
+        def tracing_wrapper(*args, **kwargs):
+            with span(span_name):
+                return f(*args, **kwargs)
+
+        return tracing_wrapper
+
+    return decorator
+
+
+def write_trace(path: Union[str, Path]) -> int:
+    """
+    Writes the collected events as a Chrome trace, returns the number of spans written
+    """
+    with _lock:
+        events: List[dict] = list(_events or ())
+        threads = dict(_threads)
+    meta = [
+        {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': name}}
+        for tid, name in threads.items()
+    ]
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': meta + events, 'displayTimeUnit': 'ms'}, f)
+    return len(events)
+
+
+def summary() -> Dict[str, Dict[str, float]]:
+    """
+    Count and wall time percentiles in milliseconds per span name
+    """
+    with _lock:
+        durations = {k: np.asarray(v) for k, v in _durations.items()}
+        counts = dict(_counts)
+    return {
+        name: {
+            'count': counts[name],
+            'p50': float(np.percentile(ms, 50)),
+            'p95': float(np.percentile(ms, 95)),
+            'max': float(np.max(ms)),
+            'total': float(np.sum(ms)),
+        }
+        for name, ms in durations.items() if len(ms) != 0
+    }
+
+
+def log_summary() -> NoReturn:
+    values = summary()
+    if len(values) != 0:
+        lines = [f"{'span':<24s} {'count':>7s} {'p50 ms':>10s} {'p95 ms':>10s} {'max ms':>10s}"]
+        for name, v in sorted(values.items(), key=lambda kv: -kv[1]['total']):
+            lines.append(f"{name:<24s} {v['count']:>7d} {v['p50']:>10.2f} {v['p95']:>10.2f} {v['max']:>10.2f}")
+        log.info("Span summary:\n%s", '\n'.join(lines))
+
+
+def reset() -> NoReturn:
+    """Drops all collected spans"""
+    with _lock:
+        _durations.clear()
+        _counts.clear()
+        _threads.clear()
+        if _events is not None:
+            _events.clear()
+
+
+__all__ = ['span', 'traced', 'enable_trace', 'write_trace', 'summary', 'log_summary', 'reset']
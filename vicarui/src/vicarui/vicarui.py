@@ -12,6 +12,16 @@ def old_ui_entry(_: argparse.Namespace):
     ui.run()
 
 
+def prebuild_entry(ns: argparse.Namespace):
+    from .prebuild import run
+    run(ns)
+
+
+def reduce_entry(ns: argparse.Namespace):
+    from .reduce import run
+    run(ns)
+
+
 def main():
     args = argparse.ArgumentParser(description="Moons - Vicar Image Processing And Analysis")
     subs = args.add_subparsers(title="Graphical utilities")
@@ -27,6 +37,14 @@ def main():
     )
     old_ui.set_defaults(func=old_ui_entry)
 
+    from . import prebuild
+    p = prebuild.get_parser(parent=subs)
+    p.set_defaults(func=prebuild_entry)
+
+    from . import reduce
+    p = reduce.get_parser(parent=subs)
+    p.set_defaults(func=reduce_entry)
+
     ns, _ = args.parse_known_args()
     if hasattr(ns, 'func'):
         ns.func(ns)
@@ -15,6 +15,7 @@ class AppWindow(qt.QWidget):
 
         from .helper import stack
         flw.show_image.connect(plw.open_image)
+        flw.prefetch.connect(plw.prefetch_images)
         flw.show_multiple.connect(lambda f: plw.show_image(stack(flw, f)))
 
         layout = qt.QHBoxLayout()
@@ -1,16 +1,18 @@
 from typing import Callable, Optional, Any, Union, Tuple, Dict
 
 import numpy as np
-from PySide2.QtCore import QThread
 from astropy.visualization import ImageNormalize
 from matplotlib.axes import Axes
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from matplotlib.figure import Figure
+from matplotlib.patches import Rectangle
+from matplotlib.widgets import RectangleSelector
 
 from .imageevent import VicarEvent
 from ...analysis import set_info
 from ...logging import log
-from ...support import stop_progress, start_progress, signal, BRTask, ImageWrapper
+from ...support import stop_progress, start_progress, signal, BRTask, ImageWrapper, Tasker, Task, span
+from ...support import BackgroundView
 
 
 class FigureWrapper(FigureCanvasQTAgg):
@@ -29,9 +31,11 @@ class FigureWrapper(FigureCanvasQTAgg):
         click: Callable[[], Tuple[int, int]] = None
 
         set_info: Callable = None
+        bg_title: Optional[str] = None
 
     _holder: Holder = None
-    _task: QThread = None
+    _task: Task = None
+    _selector: Optional[RectangleSelector] = None
 
     def __init__(self, width=7.5, height=7.5, dpi=125):
         self.fig = Figure(figsize=(width, height), dpi=dpi)
@@ -52,6 +56,9 @@ class FigureWrapper(FigureCanvasQTAgg):
         if self.event_handler is not None:
             self.event_handler.detach()
             self.event_handler = None
+        if self._selector is not None:
+            self._selector.disconnect_events()
+            self._selector = None
         self.fig.clf(keep_observers=True)
 
     def _data_limits(self, ax: Axes):
@@ -62,10 +69,47 @@ class FigureWrapper(FigureCanvasQTAgg):
             except IndexError:
                 pass
 
-    def _show_image_2(self):
+    def _show_background(self, view: BackgroundView):
+        """
+        Draws the images that depend on the background, previous ones are replaced
+        """
         og = self._holder.original
         bg = self._holder.background
         norm = self._holder.norm
+        data = self._holder.data
+
+        for ax in (data, og, bg):
+            for im in list(ax.images):
+                im.remove()
+        if self._holder.bg_title is None:
+            self._holder.bg_title = bg.get_title()
+
+        reduced = view.display
+        normalizer = norm(reduced)
+        data.imshow(reduced, norm=normalizer, cmap="gray", aspect="equal", interpolation='none', origin='upper')
+        og.imshow(view.original, cmap="gray", interpolation='none', origin='upper')
+        bg.imshow(view.background, cmap="coolwarm", interpolation='none', origin='upper')
+        if view.outliers is not None:
+            bg.imshow(view.outliers, cmap='binary_r', interpolation="none", origin="upper", alpha=0.3)
+        bg.set_title(
+            self._holder.bg_title
+            + (" preview" if view.preview else "")
+            + f" mse: {view.mse:.5e}"
+        )
+
+    def _show_preview(self, task: Task, view: BackgroundView):
+        if self._holder is None or task is not self._task:
+            return
+        self._show_background(view)
+        self.figure.set_tight_layout('true')
+        with span('draw'):
+            self.draw()
+            self.flush_events()
+
+    def _show_image_2(self, task: Task):
+        if self._holder is None or task is not self._task:
+            return
+        bg = self._holder.background
         line = self._holder.line
         data = self._holder.data
         image = self._holder.image
@@ -73,21 +117,17 @@ class FigureWrapper(FigureCanvasQTAgg):
         self.event_handler = VicarEvent(image.processed, data, line, self._holder.click)
         self._holder.set_info()
 
-        reduced = image.normalize(image.processed)
-        normalizer = norm(reduced)
-        data.imshow(reduced, norm=normalizer, cmap="gray", aspect="equal", interpolation='none', origin='upper')
-        og.imshow(image.original, cmap="gray", interpolation='none', origin='upper')
-        bg.imshow(image.background, cmap="coolwarm", interpolation='none', origin='upper')
-        bg.imshow(image.outliers, cmap='binary_r', interpolation="none", origin="upper", alpha=0.3)
-        bg.set_title(bg.get_title() + f" mse: {image.mse:.5e}")
+        self._show_background(BackgroundView.of(image))
+        self._exclusions(bg, image)
 
         self._data_limits(data)
         data.minorticks_on()
 
         self.figure.set_tight_layout('true')
 
-        self.draw()
-        self.flush_events()
+        with span('draw'):
+            self.draw()
+            self.flush_events()
 
         self._holder = None
         self._task = None
@@ -95,6 +135,27 @@ class FigureWrapper(FigureCanvasQTAgg):
 
         stop_progress()
 
+    def _exclusions(self, ax: Axes, image: ImageWrapper):
+        """
+        Shows the excluded regions on the background and lets the user draw more, a click clears them
+        """
+        for top, bottom, left, right in image.exclusions:
+            ax.add_patch(Rectangle((left - .5, top - .5), right - left, bottom - top, fill=False, color='k', lw=1))
+
+        def select(press, release):
+            left, right = sorted((int(round(press.xdata)), int(round(release.xdata))))
+            top, bottom = sorted((int(round(press.ydata)), int(round(release.ydata))))
+            if left == right or top == bottom:
+                image.exclusions.clear()
+                log.info("Cleared background exclusions, reload to fit again")
+                return
+            image.exclusions.append((top, bottom + 1, left, right + 1))
+            ax.add_patch(Rectangle((left - .5, top - .5), right - left + 1, bottom - top + 1, fill=False, color='k', lw=1))
+            self.draw_idle()
+            log.info(f"Excluded rows {top}-{bottom} columns {left}-{right} from the background, reload to fit again")
+
+        self._selector = RectangleSelector(ax, select, useblit=False, button=[1], interactive=False)
+
     def _show_image_1(self, image: ImageWrapper, **kwargs):
         self._data: Axes = self.fig.add_subplot(3, 3, (2, 6), label='Image Display')
         data = self._data
@@ -148,10 +209,12 @@ class FigureWrapper(FigureCanvasQTAgg):
         self._holder.norm = norm
         self._holder.click = click_area
         self._show_image_1(image, **kwargs)
-        self._task = BRTask(image, br_pack)
-        self._task.done.connect(self._show_image_2)
+        task = BRTask(image, br_pack, progressive=True)
+        task.preview.connect(lambda view: self._show_preview(task, view))
+        task.done.connect(lambda: self._show_image_2(task))
+        self._task = task
 
-        self._task.start()
+        Tasker.run(task, key=('reduce', id(self)))
 
     def click(self, pkg: Tuple[float, float, bool]):
         x, y, right = pkg
@@ -5,7 +5,7 @@ import numpy as np
 from vicarutil.image import read_image
 
 from ..widget.filelist import FileListWidget
-from ...support import start_progress, stop_progress, ImageWrapper
+from ...support import start_progress, stop_progress, ImageWrapper, find_invalid_lines
 
 
 def stack(flw: FileListWidget, paths: List[Path]) -> ImageWrapper:
@@ -24,9 +24,7 @@ def stack(flw: FileListWidget, paths: List[Path]) -> ImageWrapper:
         except (KeyError, AttributeError):
             pass
         for img in images:
-            for line in img.data[0]:
-                if np.alltrue(np.isclose(line, np.average(line))):
-                    line.fill(np.NINF)
+            img.data[0][find_invalid_lines(img.data[0])] = np.NINF
         data = np.asarray([img.data[0] for img in images])
         data = data - np.ma.mean(np.ma.masked_where(data, np.logical_not(np.isfinite(data))), keepdims=True, axis=0).data
         image.data = np.asarray([np.average(
@@ -2,10 +2,11 @@ from typing import Callable, Any, Union, Tuple, Dict
 
 import numpy as np
 from PySide2 import QtWidgets as qt
-from PySide2.QtGui import QIntValidator
+from PySide2.QtGui import QIntValidator, QDoubleValidator
 from astropy.visualization import ImageNormalize, ZScaleInterval, HistEqStretch
 
 from ..helper import NW, CL
+from ...analysis import background_engines
 from ...support import Busy, typedsignal
 from ...logging import log
 
@@ -25,6 +26,11 @@ class AdjustmentWidget(qt.QWidget):
         br_toggle.setChecked(False)
         self.br_toggle = br_toggle
 
+        mask_toggle = qt.QCheckBox(text="Mask Target")
+        mask_toggle.setChecked(False)
+        mask_toggle.setToolTip("Leave the target disc out of the background fit")
+        self.mask_toggle = mask_toggle
+
         normal_toggle = qt.QCheckBox(text="Normalization")
         normal_toggle.setChecked(False)
         self.normal_toggle = normal_toggle
@@ -40,6 +46,26 @@ class AdjustmentWidget(qt.QWidget):
         self.degree_label = degree_label
         self.degree = degree
 
+        percentile = qt.QLineEdit()
+        percentile.setText(str(25))
+        percentile.setFixedWidth(40)
+        percentile.setToolTip("Percentile of the percentile engine")
+        percentile.setValidator(QDoubleValidator(0, 100, 2))
+        percentile.setEnabled(False)
+        self.percentile = percentile
+
+        engine = qt.QComboBox()
+        for name in background_engines():
+            engine.addItem(name)
+        engine.setCurrentIndex(0)
+
+        def engine_changed(name: str):
+            degree.setEnabled(name == background_engines()[0])
+            percentile.setEnabled(name == 'percentile')
+
+        engine.currentTextChanged.connect(engine_changed)
+        self.engine = engine
+
         border_label = qt.QLabel(text="Border")
         border_value = qt.QLineEdit()
         border_value.setText(str(2))
@@ -59,8 +85,11 @@ class AdjustmentWidget(qt.QWidget):
         layout = qt.QHBoxLayout()
         layout.setSpacing(10)
         layout.addWidget(br_toggle, alignment=NW)
+        layout.addWidget(engine, alignment=NW)
         layout.addWidget(degree, alignment=NW)
         layout.addWidget(degree_label, alignment=CL)
+        layout.addWidget(percentile, alignment=NW)
+        layout.addWidget(mask_toggle, alignment=NW)
         layout.addSpacerItem(qt.QSpacerItem(10, 5, hData=qt.QSizePolicy.Minimum, vData=qt.QSizePolicy.Minimum))
         layout.addWidget(normal_toggle, alignment=NW)
         layout.addSpacerItem(qt.QSpacerItem(10, 5, hData=qt.QSizePolicy.Minimum, vData=qt.QSizePolicy.Minimum))
@@ -140,9 +169,20 @@ class AdjustmentWidget(qt.QWidget):
             'normalize': self.normal_toggle.isChecked(),
             'reduce': self.br_toggle.isChecked(),
             'degree': self.degree.currentIndex() + 1,
+            'engine': self.engine.currentText(),
+            'params': self.get_engine_params(),
+            'mask': self.mask_toggle.isChecked(),
             'border': int(self.border_value.text()) if self.border_value.text().strip() != '' else 0
         }
 
+    def get_engine_params(self) -> Dict[str, Any]:
+        """
+        Parameters of the selected non-parametric engine
+        """
+        if self.engine.currentText() == 'percentile' and self.percentile.text().strip() != '':
+            return {'percentile': float(self.percentile.text())}
+        return dict()
+
     def get_image_normalize(self) -> Callable[[np.ndarray], Union[ImageNormalize, None]]:
         if self.img_proc_toggle.isChecked():
             return lambda image: ImageNormalize(interval=ZScaleInterval(), stretch=HistEqStretch(image))
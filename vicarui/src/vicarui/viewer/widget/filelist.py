@@ -100,6 +100,7 @@ class Label(qt.QLabel):
 class FileListWidget(qt.QWidget):
     show_image = typedsignal(Path)
     show_multiple = typedsignal(list)
+    prefetch = typedsignal(list)
 
     model: FileModel
     _busy = False
@@ -172,9 +173,24 @@ class FileListWidget(qt.QWidget):
                     if selected_img is not None:
                         debug("Image selected: %s", str(selected_img.get_path()))
                         self.show_image.emit(selected_img.get_path())
+                        self.prefetch.emit(self.neighbours(selected_img))
         except IndexError:
             pass
 
+    @staticmethod
+    def neighbours(item: PathItem) -> List[Path]:
+        """
+        Next and previous images in the same category
+        """
+        parent = item.parent()
+        if parent is None:
+            return list()
+        out = list()
+        for row in (item.row() + 1, item.row() - 1):
+            if 0 <= row < parent.rowCount():
+                out.append(parent.child(row).get_path())
+        return out
+
     @invoke_safe
     def clear(self):
         debug("Clearing lists")
@@ -197,7 +213,7 @@ class FileListWidget(qt.QWidget):
                 selected,
                 self.files_callback,
                 sort_by=self.sort_selection.itemText(self.sort_selection.currentIndex())
-            ))
+            ), key=('files', id(self)))
 
     @invoke_safe
     def show_on_dbl(self, event: QMouseEvent) -> None:
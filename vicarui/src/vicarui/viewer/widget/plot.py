@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Optional
+from typing import Optional, List
 
 from PySide2.QtCore import Slot
 from PySide2.QtWidgets import QWidget, QFrame, QVBoxLayout, QHBoxLayout
@@ -10,11 +10,12 @@ from .adjustment import AdjustmentWidget
 from .configbtn import ConfigBtn
 from ..helper import FigureWrapper, E
 from ...analysis import register_mission_listener
-from ...support import Progress, signal, Busy, ReadTask, ImageWrapper
+from ...support import Progress, signal, Busy, ReadTask, PrefetchTask, ImageWrapper, Tasker, Priority
 
 
 class PlotWidget(QWidget):
     image: Optional[ImageWrapper]
+    _read: Optional[ReadTask] = None
 
     _show_end = signal()
     _show_start = signal()
@@ -98,7 +99,22 @@ class PlotWidget(QWidget):
         Progress.start()
         task = ReadTask(p)
         task.done.connect(self.show_image)
-        task.run()
+        task.failed.connect(lambda: self._read_failed(task))
+        self._read = task
+        Tasker.run(task, priority=Priority.HIGH, key=('open', id(self)))
+
+    def _read_failed(self, task: ReadTask):
+        """
+        Clears the busy state unless a newer read took over
+        """
+        if task is self._read:
+            self._read = None
+            Progress.stop()
+            self._show_end.emit()
+
+    @Slot(list)
+    def prefetch_images(self, paths: List[Path]):
+        Tasker.run(PrefetchTask(paths), priority=Priority.LOW, key=('prefetch', id(self)))
 
 
 __all__ = ['PlotWidget']
@@ -90,3 +90,156 @@ def test_plaw():
     print(f"Coeff: {pl.coef_}")
     print(f"True: 4.1, 2.1")
     assert np.isclose(pl.coef_[0], 4.1) and np.isclose(pl.coef_[1], 2.1)
+
+
+def test_packet_profiles():
+    from vicarui.analysis.fitting import DataPacket
+    rng = np.random.default_rng(0)
+    data = rng.normal(100, 10, (60, 80))
+    packet = DataPacket(data)
+    packet.configure(width=3, window=20)
+
+    packet.select(40, 30)
+    assert np.array_equal(packet.x_data, np.arange(20, 61))
+    assert np.allclose(packet.y_data, np.average(data[27:34, 20:61].T, axis=1))
+
+    packet.select(2, 58, vertical=True)
+    assert np.array_equal(packet.x_data, np.arange(38, 59))
+    assert np.allclose(packet.y_data, np.average(data[38:59, 0:6], axis=1))
+
+    data[10, 10] = np.nan
+    packet = DataPacket(data)
+    packet.configure(width=1, window=5)
+    packet.select(10, 10)
+    assert np.isnan(packet.y_data[5]) and np.isfinite(packet.y_data[6])
+
+
+def test_packet_fit():
+    from vicarui.analysis.fitting import DataPacket
+    rng = np.random.default_rng(0)
+    x = np.arange(0, 200)
+    profile = 1e-3 * (x - 100) ** 2 + 5 + rng.normal(0, 0.05, len(x))
+    profile[80:121] -= 2 - 2e-3 * (x[80:121] - 100) ** 2
+    data = np.repeat(profile[None], 5, axis=0)
+
+    packet = DataPacket(data)
+    packet.configure(width=1, window=100)
+    packet.select(100, 2)
+    bg, fg = packet.fit(80, 120)
+    inside = (80 <= packet.x_data) & (packet.x_data <= 120)
+    assert np.allclose(fg.equation, np.polyfit(packet.x_data[inside], packet.y_data[inside], 2))
+    assert np.allclose(bg.equation, [1e-3, -0.2, 15], rtol=0.05)
+    assert np.isclose(bg.mse, np.mean((packet.y_data[~inside] - np.polyval(bg.equation, packet.x_data[~inside])) ** 2))
+    assert np.allclose(bg.line.get_ydata(), np.polyval(bg.equation, bg.line.get_xdata()))
+
+    simple_bg, simple_fg = packet.fit(80, 120, simple=True)
+    assert np.allclose(simple_bg.equation, bg.equation) and np.allclose(simple_fg.equation, fg.equation)
+    assert np.allclose(simple_bg.pipe.line.predict(x[..., None]), np.polyval(bg.equation, x))
+    assert len(simple_fg.pipe.errors) == 3
+
+
+def test_2nd_deg_batch():
+    from vicarui.analysis.fitting.second_degree import (
+        roots_2nd_deg_batch, contrast_2nd_deg_batch, integrate_2nd_deg_batch, integral_error_2nd_deg_batch
+    )
+    from vicarui.analysis.fitting import analyze_2nd_deg_batch
+    rng = np.random.default_rng(0)
+    bg = rng.normal(0, 1, (50, 3))
+    fg = rng.normal(0, 1, (50, 3))
+    bg[:3], fg[:3] = [eq1, eq3, eq2], [eq2, eq2, eq3]
+
+    roots = roots_2nd_deg_batch(bg, fg)
+    x_val, contrast = contrast_2nd_deg_batch(bg, fg)
+    integral = integrate_2nd_deg_batch(bg, fg)
+    result = analyze_2nd_deg_batch(bg, fg, np.full(50, 0.3), np.full(50, 0.4))
+    real = 0
+    for i in range(len(bg)):
+        scalar_roots = roots_2nd_deg(bg[i], fg[i])
+        if np.isreal(scalar_roots).all():
+            real += 1
+            assert np.allclose(roots[i], scalar_roots.real)
+            assert np.allclose((x_val[i], contrast[i]), contrast_2nd_deg(bg[i], fg[i]))
+            assert np.isclose(integral[i], integrate_2nd_deg(bg[i], fg[i]))
+            assert np.isclose(result.integral_error[i], np.abs(scalar_roots[0] - scalar_roots[1]) * 0.5)
+        else:
+            assert np.isnan(roots[i]).all() and np.isnan(contrast[i]) and np.isnan(integral[i])
+    assert 3 < real < 50
+    assert np.allclose(result.roots, roots, equal_nan=True)
+    assert np.allclose(result.contrast, contrast, equal_nan=True)
+    assert np.allclose(result.integral, integral, equal_nan=True)
+    assert np.allclose(result.contrast_error, 0.5)
+    assert np.allclose(integral_error_2nd_deg_batch(bg, fg, 0.5), result.integral_error, equal_nan=True)
+    assert np.isnan(analyze_2nd_deg_batch(bg, fg).contrast_error).all()
+
+
+def test_packet_batch():
+    from vicarui.analysis.fitting import DataPacket, fit_profiles
+    rng = np.random.default_rng(1)
+    x = np.arange(0, 300)
+    data = 1e-4 * (x[None] - 150) ** 2 + 5 + rng.normal(0, 0.01, (40, 300))
+    dip = np.abs(x - 150) <= 30
+    data[:, dip] -= 1 - 1e-3 * (x[dip] - 150) ** 2
+
+    packet = DataPacket(data)
+    packet.configure(width=2, window=100)
+    cols = np.array([150, 140, 60, 270])
+    rows = np.array([20, 0, 39, 10])
+    offsets, profiles = packet.profiles(cols, rows)
+    for i in range(len(cols)):
+        packet.select(cols[i], rows[i])
+        assert np.allclose(profiles[i][np.isfinite(profiles[i])], packet.y_data)
+        assert np.array_equal((offsets + cols[i])[np.isfinite(profiles[i])], packet.x_data)
+    v_offsets, v_profiles = packet.profiles(cols, rows, vertical=True)
+    packet.select(cols[0], rows[0], vertical=True)
+    assert np.allclose(v_profiles[0][np.isfinite(v_profiles[0])], packet.y_data)
+
+    fits = fit_profiles(offsets, profiles[:2], cols[:2], np.full(2, 120.), np.full(2, 180.))
+    for i in range(2):
+        packet.select(cols[i], rows[i])
+        bg, fg = packet.fit(120, 180, simple=True)
+        assert np.allclose(fits.foreground[i], fg.equation)
+        assert np.allclose(fits.background[i], bg.equation, rtol=0.05, atol=1e-3)
+        assert np.isclose(fits.foreground_std[i], fg.pipe.base.std_)
+
+
+def test_profiles_at_edge():
+    from vicarui.analysis.fitting import DataPacket, fit_profiles, analyze_2nd_deg_batch
+    rng = np.random.default_rng(0)
+    data = 5 + rng.normal(0, 0.01, (40, 300))
+    packet = DataPacket(data)
+    packet.configure(width=2, window=100)
+    offsets, profiles = packet.profiles(np.array([5, 150]), np.array([20, 20]))
+    # Only columns 104 and 105 of the first profile are left for the background
+    fits = fit_profiles(offsets, profiles, np.array([5, 150]), np.array([-10., 40.]), np.array([103., 110.]))
+    assert np.isnan(fits.background[0]).all() and np.isnan(fits.background_std[0])
+    assert np.isfinite(fits.foreground[0]).all()
+    assert np.isfinite(fits.background[1]).all()
+    result = analyze_2nd_deg_batch(fits.background, fits.foreground, fits.background_std, fits.foreground_std)
+    assert np.isnan(result.contrast[0]) and np.isnan(result.integral[0])
+
+
+def test_autofit_batch_matches_steps():
+    from vicarui.analysis.fitting import DataPacket
+    from vicarui.analysis.missions.cassini.autoanalyzer.classes import FitHelper, AutoFit, Selection
+    from vicarui.support.misc.synthetic import shadow_frame
+    data, *_ = shadow_frame((256, 256), slope=0.3, half_width=15, seed=1)
+
+    helper = FitHelper.__new__(FitHelper)
+    helper.data = data
+    helper.packet = DataPacket(data)
+    helper.autofit = AutoFit(helper.packet)
+    helper.shadow = np.array([0.3, 1.]) / np.hypot(0.3, 1.)
+    s = Selection(
+        initial_position=(110.5, 70.), target_position=(128., 40.), is_vertical=False,
+        shadow_radius=20, width=2, window=60, length=100,
+    )
+    steps = list(helper(s))
+    batch = helper.batch(s)
+    assert len(steps) == len(batch) == 100
+    for (rect, fit), (batch_rect, batch_fit) in zip(steps, batch):
+        assert rect.get_bbox().bounds == batch_rect.get_bbox().bounds
+        assert fit.distance_px == batch_fit.distance_px
+        assert np.isclose(fit.arg_max, batch_fit.arg_max, atol=1)
+        assert np.isclose(fit.contrast, batch_fit.contrast, rtol=0.05)
+        assert np.isclose(fit.integral, batch_fit.integral, rtol=0.1)
+        assert fit.is_finite() and batch_fit.is_finite()
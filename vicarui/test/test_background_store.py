@@ -0,0 +1,114 @@
+import numpy as np
+from vicarutil.image.synthetic import write_image, synthetic_data
+
+from vicarui.analysis.reduction import reduction
+from vicarui.prebuild import prebuild, find_images
+from vicarui.support.misc import (
+    BackgroundStore, PolynomialBackground, set_background_store, background_store
+)
+from vicarui.support.misc.synthetic import wrap_array, gradient_frame
+
+
+def entry(shape=(40, 30), seed=0):
+    rng = np.random.default_rng(seed)
+    background = PolynomialBackground(rng.normal(size=(3, 3)), shape)
+    inliers = rng.random(shape) > 0.2
+    return background, float(rng.random()), inliers
+
+
+def test_roundtrip(tmp_path):
+    store = BackgroundStore(tmp_path)
+    background, mse, inliers = entry()
+    assert store.get('a') is None
+    store.put('a', background, mse, inliers)
+    assert 'a' in store
+    stored = BackgroundStore(tmp_path).get('a')
+    assert np.array_equal(stored.background.coefficients, background.coefficients)
+    assert stored.background.shape == background.shape
+    assert stored.mse == mse
+    assert np.array_equal(stored.inliers, inliers)
+    assert np.array_equal(stored.outliers.mask, inliers)
+
+
+def test_eviction(tmp_path):
+    store = BackgroundStore(tmp_path)
+    store.put(0, *entry(seed=0))
+    size = store.size
+    store.max_bytes = int(2.5 * size)
+    for i in range(1, 4):
+        store.put(i, *entry(seed=0))
+        store.get(1)
+    assert len(store) == 2
+    assert 1 in store and 3 in store
+
+
+def test_broken_entry(tmp_path):
+    store = BackgroundStore(tmp_path)
+    store.put('a', *entry())
+    next(tmp_path.glob('*.npz')).write_bytes(b'broken')
+    assert store.get('a') is None
+    assert len(store) == 0
+
+
+def test_reduction_uses_store(tmp_path, monkeypatch):
+    def reduce(data: np.ndarray):
+        image = wrap_array(data, border=1)
+        image.active = True
+        reduction.br_reduction(image, degree=3)
+        return image
+
+    set_background_store(BackgroundStore(tmp_path))
+    try:
+        data, _ = gradient_frame(80)
+        fitted = reduce(data)
+        assert len(background_store()) == 1
+
+        def fail(*_, **__):
+            raise AssertionError("Fitted again")
+
+        monkeypatch.setattr(reduction, 'basis_cache', fail)
+        stored = reduce(data)
+        assert np.allclose(stored.background, fitted.background)
+        assert stored.mse == fitted.mse
+        assert np.array_equal(stored.outliers.mask, fitted.outliers.mask)
+    finally:
+        set_background_store(None)
+
+
+def test_prebuild(tmp_path):
+    images = tmp_path / 'images'
+    images.mkdir()
+    for i in range(0, 2):
+        write_image(images / f'{i}.IMG', synthetic_data(1, 64, 64, seed=i))
+    set_background_store(BackgroundStore(tmp_path / 'store'))
+    try:
+        paths = find_images([str(images)])
+        assert len(paths) == 2
+        assert prebuild(paths, degree=2) == 2
+        assert len(background_store()) == 2
+    finally:
+        set_background_store(None)
+
+
+def test_store_opt_in(tmp_path):
+    from vicarui.app import get_parser, init_background_store
+    from vicarui.prebuild import get_parser as prebuild_parser
+    parser = get_parser()
+    try:
+        init_background_store(parser.parse_args([]))
+        assert background_store() is None
+        init_background_store(parser.parse_args(['--background-store', str(tmp_path / 'store')]))
+        store = background_store()
+        assert store.path == tmp_path / 'store' and not store.path.exists()
+        assert store.get('missing') is None and len(store) == 0
+        store.put('key', *entry())
+        assert store.path.exists() and len(store) == 1
+        init_background_store(parser.parse_args(['--background-store']))
+        assert background_store() is not None
+        # The prebuild parser has no --no-background-store
+        set_background_store(None)
+        args = prebuild_parser().parse_args(['images', '--background-store', str(tmp_path / 'prebuilt')])
+        init_background_store(args, enable=True)
+        assert background_store().path == tmp_path / 'prebuilt'
+    finally:
+        set_background_store(None)
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import RANSACRegressor
+from sklearn.preprocessing import PolynomialFeatures
+
+from vicarui.support.pipeline import BatchRANSAC, NPAdapter, SMAdapter, Pipe, ransac
+
+
+def data(n: int = 500, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    x = np.sort(rng.uniform(0, 100, n))
+    y = 2e-3 * x ** 2 - 0.3 * x + 10 + rng.normal(0, 0.2, n)
+    outliers = rng.choice(n, n // 5, replace=False)
+    y[outliers] += rng.uniform(5, 20, len(outliers))
+    return PolynomialFeatures(2, include_bias=False).fit_transform(x[..., None]), y, outliers
+
+
+def test_finds_outliers():
+    X, y, outliers = data()
+    reg = BatchRANSAC(min_samples=30, max_trials=100, random_state=0).fit(X, y)
+    assert not reg.inlier_mask_[outliers].any()
+    assert isinstance(reg.estimator_, NPAdapter)
+    assert np.allclose(reg.estimator_.coef_, [2e-3, -0.3], atol=1e-3)
+
+
+def test_sklearn_parity():
+    X, y, _ = data()
+    ours = BatchRANSAC(estimator=NPAdapter(), min_samples=30, max_trials=100, random_state=0).fit(X, y)
+    theirs = RANSACRegressor(base_estimator=SMAdapter(), min_samples=30, max_trials=100, random_state=0).fit(X, y)
+    assert np.mean(ours.inlier_mask_ == theirs.inlier_mask_) > 0.98
+    assert np.allclose(ours.estimator_.coef_, theirs.estimator_.coef_, rtol=1e-2)
+
+
+@pytest.mark.parametrize('batch_size', [1, 7, 64])
+def test_deterministic(batch_size):
+    X, y, _ = data()
+    reference = BatchRANSAC(min_samples=30, max_trials=50, random_state=1).fit(X, y)
+    reg = BatchRANSAC(min_samples=30, max_trials=50, random_state=1, batch_size=batch_size).fit(X, y)
+    assert reg.n_trials_ == reference.n_trials_
+    assert (reg.inlier_mask_ == reference.inlier_mask_).all()
+
+
+def test_dynamic_trials():
+    X, y, _ = data()
+    y = y.copy()
+    reg = BatchRANSAC(min_samples=4, max_trials=1000, random_state=0, residual_threshold=100).fit(X, y)
+    assert reg.n_trials_ == 1
+    assert reg.inlier_mask_.all()
+
+
+def test_pipe_interface():
+    X, y, outliers = data()
+    p = Pipe(reg=ransac(min_samples=30, max_iter=100))
+    p.line.fit(X, y)
+    assert isinstance(p.reg, BatchRANSAC)
+    assert isinstance(p.base, NPAdapter)
+    assert len(p.eq) == 3
+    assert not p.reg.inlier_mask_[outliers].any()
+
+
+def test_subsets():
+    rng = np.random.default_rng(0)
+    for n_samples in [5, 300, 5000]:
+        subsets = BatchRANSAC._subsets(rng, n_samples, 5, 16)
+        assert subsets.shape == (16, 5)
+        assert all(len(set(row)) == 5 for row in subsets)
+        assert subsets.min() >= 0 and subsets.max() < n_samples
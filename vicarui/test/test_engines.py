@@ -0,0 +1,74 @@
+import numpy as np
+from scipy import ndimage
+
+from vicarui.analysis.reduction.engines import (
+    ENGINES, fit_background, tiled, block_medians, median_background, evaluate
+)
+from vicarui.analysis.reduction.reduction import br_reduction, background_engines
+from vicarui.support.misc.synthetic import wrap_array, gradient_frame
+
+
+def test_tiled_matches_full():
+    data, _ = gradient_frame(100, disk=0, spikes=0.01)
+
+    def func(t):
+        return ndimage.percentile_filter(t, 50, size=(9, 1), mode='reflect')
+
+    assert np.array_equal(tiled(func, data, 9, tiles=4), func(data))
+    assert np.array_equal(median_background(data, size=9, tiles=3), median_background(data, size=9, tiles=1))
+
+
+def test_block_medians():
+    data = np.arange(10 * 7, dtype=float).reshape(10, 7)
+    rows, cols, medians = block_medians(data, 4)
+    assert medians.shape == (3, 2)
+    assert np.allclose(rows, [1.5, 5.5, 8.5])
+    assert np.allclose(cols, [1.5, 5])
+    assert medians[2, 1] == np.median(data[8:, 4:])
+
+
+def test_engines_follow_background():
+    data, background = gradient_frame(128, disk=0, spikes=0.01)
+    for name in ENGINES:
+        result = fit_background(data, name)
+        assert result.background.shape == data.shape
+        assert result.inliers.dtype == bool and result.inliers.shape == data.shape
+        # The percentile engine is biased low by design
+        offset = np.median(result.background - background)
+        assert np.sqrt(np.mean((result.background - background - offset) ** 2)) < 1, name
+        assert result.model is None
+
+
+def test_evaluate():
+    data, background = gradient_frame(64, disk=0, spikes=0.01)
+    result = evaluate(data, background)
+    assert np.isclose(result.mse, np.mean((data - background) ** 2))
+    assert not result.inliers[np.abs(data - background) > 40].any()
+    mask = np.abs(data - background) < 40
+    masked = evaluate(data, background, mask)
+    assert np.isclose(masked.mse, np.mean((data - background)[mask] ** 2)) and masked.mse < result.mse
+    assert masked.inliers.shape == data.shape
+
+
+def test_br_reduction_engines():
+    assert background_engines()[0] == 'polynomial'
+    data, _ = gradient_frame(128, disk=0, spikes=0.01)
+    image = wrap_array(data, border=1)
+    image.active = True
+    br_reduction(image, degree=3)
+    assert image.background_engine == 'polynomial' and image.background_model is not None
+    polynomial = image.background.copy()
+    br_reduction(image, degree=3, engine='block', block=16)
+    assert image.background_engine == 'block' and image.background_model is None
+    assert image.background.shape == image.cropped.shape
+    assert not np.allclose(image.background, polynomial)
+    assert image.outliers.shape == image.cropped.shape
+    assert image.mse > 0
+    block = image.background.copy()
+    br_reduction(image, degree=3, engine='block', block=32)
+    assert image.background_params == (('block', 32),)
+    assert not np.allclose(image.background, block)
+    br_reduction(image, degree=3, engine='percentile', percentile=10)
+    low = image.background.copy()
+    br_reduction(image, degree=3, engine='percentile', percentile=90)
+    assert (image.background >= low).all() and not np.allclose(image.background, low)
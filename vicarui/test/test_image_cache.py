@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from vicarutil.image.synthetic import write_image, synthetic_data
+from vicarui.support import (
+    ImageCache, image_cache, file_key, load_image, PrefetchTask, ReadTask, FileTask, Cancelled, Progress,
+)
+
+
+def write(tmp_path, name: str, size: int = 64):
+    path = tmp_path / name
+    write_image(path, synthetic_data(1, size, size), properties={'IDENTIFICATION': {'IMAGE_NUMBER': name}})
+    return path
+
+
+def test_budget_eviction(tmp_path):
+    paths = [write(tmp_path, f"{i}.IMG") for i in range(0, 4)]
+    images = [load_image(p) for p in paths]
+    one = images[0].nbytes
+    cache = ImageCache(max_bytes=int(one * 2.5))
+    for p, image in zip(paths, images):
+        cache.put(file_key(p), image)
+    assert len(cache) == 2
+    assert cache.size <= cache.max_bytes
+    assert cache.get(file_key(paths[0])) is None
+    assert cache.get(file_key(paths[3])) is images[3]
+    cache.put(file_key(paths[1]), images[1])
+    assert file_key(paths[2]) not in cache
+
+
+def test_load_and_prefetch(tmp_path):
+    image_cache().clear()
+    first, second = write(tmp_path, 'A.IMG'), write(tmp_path, 'B.IMG')
+    image = load_image(first)
+    again = load_image(first)
+    assert again is not image and again.sanitized is image.sanitized
+    # View state is per wrapper
+    image.border = 5
+    image.exclusions.append((0, 1, 0, 1))
+    image.active = True
+    third = load_image(first)
+    assert third.border == 0 and third.exclusions == [] and not third.active
+    PrefetchTask([second]).run()
+    assert file_key(second) in image_cache()
+    assert np.isfinite(image_cache().get(file_key(second)).sanitized).all()
+    write(tmp_path, 'A.IMG', size=32)
+    assert load_image(first).sanitized.shape == (32, 32)
+
+
+def test_read_task_signals(tmp_path):
+    events = list()
+    task = ReadTask(write(tmp_path, 'A.IMG'))
+    task.done.connect(lambda _: events.append('done'))
+    task.failed.connect(lambda: events.append('failed'))
+    task.run()
+    task = ReadTask(tmp_path / 'missing.IMG')
+    task.failed.connect(lambda: events.append('failed'))
+    with pytest.raises(OSError):
+        task.run()
+    task = ReadTask(write(tmp_path, 'B.IMG'))
+    task.done.connect(lambda _: events.append('done'))
+    task.failed.connect(lambda: events.append('failed'))
+    task.cancel()
+    with pytest.raises(Cancelled):
+        task.run()
+    assert events == ['done', 'failed', 'failed']
+
+
+def test_cancelled_file_task(tmp_path, monkeypatch):
+    write(tmp_path, 'A.IMG')
+    events = list()
+    monkeypatch.setattr(Progress, 'start', lambda: events.append('start'))
+    monkeypatch.setattr(Progress, 'stop', lambda: events.append('stop'))
+    task = FileTask(str(tmp_path), lambda files: events.append(files))
+    task.aborted.connect(lambda: events.append('aborted'))
+    task.cancel()
+    task.run()
+    assert events == ['start', 'stop', 'aborted']
@@ -0,0 +1,115 @@
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import PolynomialFeatures
+from vicarui.support.misc import PolynomialBackground, find_invalid_lines
+from vicarui.support.misc.synthetic import wrap_array, invalid_lines_frame
+
+
+def reference(data: np.ndarray):
+    indices = list()
+    for i, line in enumerate(data):
+        if np.all(np.isclose(np.average(line), line)) or not np.isfinite(line).any():
+            indices.append(i)
+    return indices
+
+
+def test_invalid_lines():
+    data = invalid_lines_frame()
+    assert list(np.flatnonzero(find_invalid_lines(data))) == reference(data) == [0, 10, 11, 39]
+
+
+def test_sanitized_delete():
+    data = invalid_lines_frame()
+    image = wrap_array(data)
+    img = image.sanitized
+    assert img.shape == (36, 30)
+    assert list(image.invalid_indices) == [0, 10, 11, 39]
+    assert np.isfinite(img).all()
+    assert (img[0] == data[1]).all()
+
+
+def test_sanitized_keep_shape():
+    data = invalid_lines_frame()
+    image = wrap_array(data, keep_shape=True)
+    img = image.sanitized
+    assert img.shape == data.shape
+    assert image.invalid_indices is None
+    assert list(np.flatnonzero(image.invalid_mask)) == [0, 10, 11, 39]
+    assert np.isfinite(img).all()
+    assert (img[0] == data[1]).all()
+    assert (img[39] == data[38]).all()
+    assert np.allclose(img[10], data[9] * 2 / 3 + data[12] / 3)
+    assert (img[5] == data[5]).all()
+    assert data[0, 0] == 0
+
+
+def test_processed_cache():
+    image = wrap_array(invalid_lines_frame())
+    image.border = 3
+    processed = image.processed
+    assert processed is image.processed
+    assert processed.shape == image.shape == image.background.shape == (29, 23)
+    assert image.display is image.display
+    assert np.isclose(image.display.min(), 0) and np.isclose(image.display.max(), 1)
+
+    image.background = np.ones(image.shape)
+    assert image.processed is processed
+    image.active = True
+    assert np.allclose(image.processed, processed - 1)
+
+    background = image.processed
+    image.background = np.full(image.shape, 2.)
+    assert image.processed is not background
+    assert np.allclose(image.processed, processed - 2)
+
+    image.normalized = True
+    assert image.display is image.processed
+    image.active = False
+    image.border = 0
+    assert image.processed.shape == image.sanitized.shape
+
+
+def test_polynomial_background():
+    shape = (30, 20)
+    indexes = np.indices(shape).reshape(2, -1).T
+    y = np.random.default_rng(1).normal(size=len(indexes))
+    features = PolynomialFeatures(degree=3, include_bias=False)
+    model = LinearRegression().fit(features.fit_transform(indexes), y)
+    bg = PolynomialBackground.from_features(features.powers_, model.coef_, model.intercept_, shape)
+    assert bg.degree == 3
+    assert np.allclose(bg.evaluate(), model.predict(features.transform(indexes)).reshape(shape))
+
+
+def test_low_memory():
+    data = invalid_lines_frame()
+    image = wrap_array(data, low_memory=True)
+    full = wrap_array(data).nbytes
+    raw = image.raw
+    assert image.sanitized.dtype == np.float32
+    assert not image.raw.has_data()
+    # The image passed in is shared with other wrappers and keeps its data
+    assert raw.has_data() and raw.labels is image.raw.labels
+    assert image.original is image.sanitized
+    assert image.original_shape == data.shape
+    assert list(np.flatnonzero(image.invalid_mask)) == [0, 10, 11, 39]
+
+    image.active = True
+    image.background = PolynomialBackground(np.asarray([[1., 0.], [0., 0.]]), image.shape)
+    inliers = np.ones(image.shape, dtype=bool)
+    inliers[0, 0] = False
+    image.outliers = np.ma.masked_where(inliers, inliers)
+    assert image.background.dtype == np.float32
+    assert np.allclose(image.processed, image.sanitized - 1)
+    assert image.outliers.mask.sum() == inliers.size - 1
+    assert image.nbytes < full
+
+
+def test_exclusions_follow_border():
+    image = wrap_array(np.random.default_rng(0).normal(100, 10, size=(60, 60)))
+    image.border = 2
+    image.exclusions.extend([(0, 10, 5, 15), (50, 57, 0, 3)])
+    image.border = 5
+    assert image.exclusions == [(0, 7, 2, 12)]
+    image.border = 0
+    assert image.exclusions == [(6, 13, 8, 18)]
+    assert image.cropped[6, 8] == image.sanitized[6, 8]
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+import statsmodels.api as sm
+
+from vicarui.support.pipeline import IRLSAdapter, SMAdapter, partial_cls, irls
+
+NORMS = {
+    'huber': sm.robust.norms.HuberT(),
+    'tukey': sm.robust.norms.TukeyBiweight(),
+}
+
+
+def data(n: int = 120, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    x = np.sort(rng.uniform(1, 50, n))
+    y = 0.8 * x + 3 + rng.normal(0, 0.5, n)
+    y[rng.choice(n, n // 10, replace=False)] += rng.uniform(5, 15, n // 10)
+    return x[..., None], y
+
+
+@pytest.mark.parametrize('norm', list(NORMS))
+@pytest.mark.parametrize('fit_intercept', [True, False])
+def test_rlm_parity(norm, fit_intercept):
+    X, y = data()
+    reference = SMAdapter(fit_intercept=fit_intercept, model_cls=partial_cls(sm.RLM, M=NORMS[norm])).fit(X, y)
+    reg = IRLSAdapter(norm=norm, fit_intercept=fit_intercept).fit(X, y)
+    assert np.allclose(reg.coef_, reference.coef_)
+    assert np.allclose(reg.errors_, reference.errors_)
+    assert np.isclose(reg.std_, reference.result_.scale)
+    if fit_intercept:
+        assert np.isclose(reg.intercept_, reference.intercept_)
+    assert np.allclose(reg.predict(X), reference.predict(X))
+
+
+def test_batched():
+    series = [data(seed=i) for i in range(5)]
+    X = series[0][0]
+    Y = np.stack([data(seed=i)[1] for i in range(5)])
+    batch = irls(X, Y)
+    for i in range(5):
+        single = irls(X, Y[i])
+        assert np.allclose(batch.params[i], single.params)
+        assert np.allclose(batch.bse[i], single.bse)
+        assert batch.iterations[i] == single.iterations
+
+
+def test_batched_missing():
+    X, y = data()
+    Y = np.stack([y, y])
+    Y[1, 100:] = np.nan
+    batch = irls(X, Y)
+    single = irls(X[:100], y[:100])
+    assert np.allclose(batch.params[1], single.params)
+    assert np.allclose(batch.bse[1], single.bse)
+    assert np.isclose(batch.scale[1], single.scale)
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from sklearn.preprocessing import PolynomialFeatures
+
+from vicarui.support.pipeline import SMAdapter, NPAdapter, ransac
+
+
+def data(n: int = 200, degree: int = 2, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    x = np.sort(rng.uniform(1, 100, n))
+    y = 3e-3 * x ** 2 - 0.4 * x + 12 + rng.normal(0, 0.5, n)
+    return PolynomialFeatures(degree, include_bias=False).fit_transform(x[..., None]), y
+
+
+@pytest.mark.parametrize('fit_intercept', [True, False])
+def test_parity(fit_intercept):
+    X, y = data()
+    sm = SMAdapter(fit_intercept=fit_intercept).fit(X, y)
+    np_ = NPAdapter(fit_intercept=fit_intercept).fit(X, y)
+    assert np.allclose(np_.coef_, sm.coef_)
+    assert np.allclose(np_.errors_, sm.errors_)
+    assert np.isclose(np_.std_, sm.std_)
+    assert np.allclose(np_.predict(X), sm.predict(X))
+    if fit_intercept:
+        assert np.isclose(np_.intercept_, sm.intercept_)
+    else:
+        assert np_.intercept_ is None
+
+
+def test_weights():
+    from statsmodels.api import WLS, add_constant
+    X, y = data()
+    w = np.linspace(0.5, 2, len(y))
+    result = WLS(y, add_constant(X), weights=w).fit()
+    reg = NPAdapter().fit(X, y, sample_weight=w)
+    assert np.allclose(reg.params_, result.params)
+    assert np.allclose(reg.bse_, result.bse)
+
+
+def test_ransac_parity():
+    X, y = data(n=400)
+    y[::10] += 50
+    a = ransac(min_samples=20, max_iter=100, estimator=SMAdapter()).fit(X, y)
+    b = ransac(min_samples=20, max_iter=100).fit(X, y)
+    assert isinstance(b.estimator_, NPAdapter)
+    assert (a.inlier_mask_ == b.inlier_mask_).all()
+    assert np.allclose(a.estimator_.coef_, b.estimator_.coef_)
+    assert np.allclose(a.estimator_.errors_, b.estimator_.errors_)
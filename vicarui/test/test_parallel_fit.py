@@ -0,0 +1,79 @@
+import os
+import signal
+
+import numpy as np
+
+from vicarui.analysis.fitting import parallel, DataPacket, fit_path, sweep_path, fit_profiles, analyze_2nd_deg_batch
+from vicarui.support.misc.synthetic import shadow_frame
+
+
+def assert_same(a, b):
+    for name in ['roots', 'arg_max', 'contrast', 'integral', 'contrast_error', 'integral_error']:
+        assert np.allclose(getattr(a, name), getattr(b, name), equal_nan=True), name
+
+
+def test_fit_path(monkeypatch):
+    monkeypatch.setattr(parallel, 'IN_PROCESS_PROFILES', 0)
+    data, x, y, centers = shadow_frame()
+    local = fit_path(data, x, y, centers, False, (2, 60, 25.), workers=1)
+    assert local.contrast.shape == (len(x),)
+    assert np.isclose(np.nanmedian(local.contrast), 0.5, atol=0.1)
+
+    packet = DataPacket(data)
+    packet.configure(2, 60)
+    offsets, profiles = packet.profiles(x, y)
+    fits = fit_profiles(offsets, profiles, x, centers - 25, centers + 25)
+    assert_same(local, analyze_2nd_deg_batch(fits.background, fits.foreground, fits.background_std, fits.foreground_std))
+
+    assert_same(local, fit_path(data, x, y, centers, False, (2, 60, 25.), workers=2, chunk_size=32))
+
+
+def test_sweep_path(monkeypatch):
+    monkeypatch.setattr(parallel, 'IN_PROCESS_PROFILES', 0)
+    data, x, y, centers = shadow_frame()
+    parameters = [(1, 50, 22.), (3, 70, 25.), (1, 50, 22.)]
+    results = sweep_path(data, x, y, centers, False, parameters, workers=2, chunk_size=50)
+    assert list(results) == parameters[:2]
+    for p in parameters[:2]:
+        assert_same(results[p], fit_path(data, x, y, centers, False, p, workers=1))
+    assert len(sweep_path(data, x[:0], y[:0], centers[:0], False, [(1, 50, 22.)])[(1, 50, 22.)].contrast) == 0
+
+
+def test_fit_path_in_process(monkeypatch):
+    data, x, y, centers = shadow_frame()
+    parallel._shutdown()
+    expected = fit_path(data, x, y, centers, False, (2, 60, 25.), workers=1)
+    # Small jobs and single CPU machines never start the pool
+    assert_same(expected, fit_path(data, x, y, centers, False, (2, 60, 25.), workers=4, chunk_size=16))
+    monkeypatch.setattr(parallel, 'IN_PROCESS_PROFILES', 0)
+    monkeypatch.setattr(parallel.os, 'cpu_count', lambda: 1)
+    assert_same(expected, fit_path(data, x, y, centers, False, (2, 60, 25.), chunk_size=16))
+    assert parallel._pool is None
+
+
+def test_shared_tables():
+    data, x, y, centers = shadow_frame()
+    packet = DataPacket(data)
+    shm, layout = parallel._share(packet)
+    try:
+        shared = parallel._attach(shm.name, layout)
+        assert np.array_equal(shared.data, data)
+        for a, b in zip(shared.tables, packet.tables):
+            assert np.array_equal(a, b)
+        assert DataPacket(data, tables=packet.tables).tables[0] is packet.tables[0]
+    finally:
+        for s, _ in parallel._shared.values():
+            s.close()
+        parallel._shared.clear()
+        shm.close()
+        shm.unlink()
+
+
+def test_broken_pool(monkeypatch):
+    monkeypatch.setattr(parallel, 'IN_PROCESS_PROFILES', 0)
+    data, x, y, centers = shadow_frame()
+    expected = fit_path(data, x, y, centers, False, (2, 60, 25.), workers=2, chunk_size=32)
+    for process in list(parallel._pool._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+        process.join()
+    assert_same(expected, fit_path(data, x, y, centers, False, (2, 60, 25.), workers=2, chunk_size=32))
@@ -0,0 +1,89 @@
+import numpy as np
+from sklearn.preprocessing import PolynomialFeatures
+
+from vicarui.support.misc import BasisCache, PolynomialBasis, stratified_sample, graded_powers, terms
+from vicarui.support.pipeline import NPAdapter
+
+
+def make_basis(shape=(60, 50), degree=3):
+    return PolynomialBasis(shape, *stratified_sample(shape, 800), degree=degree)
+
+
+def surface(shape, seed=0):
+    rng = np.random.default_rng(seed)
+    i, j = np.indices(shape)
+    return 100 + 0.3 * i - 0.2 * j + 1e-3 * i * j + 2e-5 * i ** 3 + rng.normal(0, 0.5, shape)
+
+
+def test_graded_powers():
+    powers = graded_powers(3)
+    assert len(powers) == terms(3) == 10
+    assert (powers == PolynomialFeatures(3).fit(np.zeros((1, 2))).powers_).all()
+
+
+def test_nested_degrees():
+    basis = make_basis(degree=1)
+    low = basis.design(1).copy()
+    high = basis.design(3)
+    assert basis.degree == 3
+    assert np.array_equal(high[:, :terms(1)], low)
+    assert np.allclose(high.T @ high, np.eye(terms(3)))
+    assert basis.design(2).shape[1] == terms(2)
+    assert basis.degree == 3
+    assert np.allclose(basis.q @ basis.r, basis._monomials(0, 3))
+
+
+def test_extension_keeps_solvers():
+    shape = (60, 50)
+    basis = make_basis(shape, degree=2)
+    values = surface(shape)[basis.rows, basis.cols]
+    low = basis.fit(values, 2, min_samples=20)
+    solvers = basis._solvers[(2, 20)]
+    raw = basis.to_raw(2)
+    count = len(solvers)
+    basis.ensure(4)
+    assert basis._solvers[(2, 20)] is solvers and len(solvers) == count
+    assert basis.to_raw(2) is raw
+    assert np.allclose(basis.fit(values, 2, min_samples=20).coef, low.coef)
+    direct = make_basis(shape, degree=4)
+    expected = direct.to_raw(4) @ direct.project(values, 4)
+    assert np.allclose(basis.to_raw(4) @ basis.project(values, 4), expected, rtol=1e-6, atol=1e-10)
+
+
+def test_raw_parity():
+    shape = (60, 50)
+    basis = make_basis(shape)
+    values = surface(shape)[basis.rows, basis.cols]
+    coef = basis.to_raw(3) @ basis.project(values, 3)
+    features = PolynomialFeatures(3, include_bias=False).fit_transform(np.column_stack((basis.rows, basis.cols)))
+    reference = NPAdapter().fit(features, values)
+    assert np.allclose(coef, reference.params_, rtol=1e-6, atol=1e-10)
+
+
+def test_fit_and_solver_reuse():
+    shape = (60, 50)
+    basis = make_basis(shape)
+    first = basis.fit(surface(shape)[basis.rows, basis.cols], 3, min_samples=30)
+    solvers = basis._solvers[(3, 30)]
+    count = len(solvers)
+    assert count > 0
+    second = basis.fit(surface(shape, seed=1)[basis.rows, basis.cols], 3, min_samples=30)
+    assert len(solvers) >= count
+    assert first.background.evaluate().shape == shape
+    assert np.sqrt(np.mean((second.background.evaluate() - surface(shape)) ** 2)) < 1
+    assert len(first.errors_) == terms(3)
+    assert first.coef_.shape == (terms(3) - 1,)
+
+
+def test_cache():
+    cache = BasisCache(size=2)
+    a = cache.get((60, 50), 1, 2, 800)
+    assert cache.get((60, 50), 1, 3, 800) is a
+    assert a.degree == 3
+    b = cache.get((40, 40), 1, 3, 800)
+    cache.get((60, 50), 1, 3, 800)
+    cache.get((30, 30), 1, 3, 800)
+    assert len(cache) == 2
+    assert cache.get((40, 40), 1, 3, 800) is not b
+    cache.clear()
+    assert len(cache) == 0
@@ -0,0 +1,48 @@
+import numpy as np
+
+from vicarui.support.pipeline import Powerlaw, fit_powerlaws, log_linear_guess
+from vicarui.support.pipeline.powerlaw import _f, _jac
+
+
+def data(count: int = 8, n: int = 60, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    x = np.linspace(1, 500, n)
+    y = 4.1 * x ** -0.8 * (1 + rng.normal(0, 0.05, (count, n)))
+    return x, y, 0.05 * 4.1 * x ** -0.8
+
+
+def test_jacobian():
+    x = np.linspace(1, 10, 5)
+    k, a, h = -0.8, 4.1, 1e-7
+    numeric = np.column_stack((
+        (_f(x, k + h, a) - _f(x, k - h, a)) / (2 * h),
+        (_f(x, k, a + h) - _f(x, k, a - h)) / (2 * h),
+    ))
+    assert np.allclose(_jac(x, k, a), numeric)
+
+
+def test_log_linear_guess():
+    x = np.linspace(1, 100)
+    assert np.allclose(log_linear_guess(x, 3 * x ** 1.5), (1.5, 3))
+    assert np.allclose(log_linear_guess(x, -3 * x ** 1.5), (1.5, -3))
+    assert log_linear_guess(x, np.zeros_like(x)) == (1., 1.)
+
+
+def test_warm_start():
+    x, y, err = data()
+    pl = Powerlaw(warm_start=True).fit(x[..., None], y[0], sample_weight=err)
+    first = pl.coef_.copy()
+    assert pl._p0(x, y[1]) == tuple(first)
+    pl.fit(x[..., None], y[1], sample_weight=err)
+    assert np.allclose(pl.coef_, Powerlaw().fit(x[..., None], y[1], sample_weight=err).coef_)
+
+
+def test_batched_parity():
+    x, y, err = data()
+    y[3, 40:] = np.nan
+    coef, errors = fit_powerlaws(x, y, err)
+    for i in range(len(y)):
+        ok = np.isfinite(y[i])
+        pl = Powerlaw().fit(x[ok][..., None], y[i][ok], sample_weight=err[ok])
+        assert np.allclose(coef[i], pl.coef_, rtol=1e-5)
+        assert np.allclose(errors[i], pl.errors_, rtol=1e-4)
@@ -0,0 +1,73 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+
+import numpy as np
+from vicarutil.image.synthetic import write_image, synthetic_data
+
+from vicarui.analysis.reduction.engines import tiled
+from vicarui.reduce import reduce_images, read_manifest, MANIFEST, _init_worker
+from vicarui.prebuild import find_images
+
+
+def write_images(path, count: int = 3):
+    path.mkdir()
+    for i in range(0, count):
+        write_image(path / f'{i}.IMG', synthetic_data(1, 64, 64, seed=i))
+    return find_images([str(path)])
+
+
+def test_reduce_and_resume(tmp_path):
+    paths = write_images(tmp_path / 'images')
+    output = tmp_path / 'out'
+    result = reduce_images(paths, output, degree=2, workers=2)
+    assert (result.done, result.skipped, result.failed) == (3, 0, 0)
+
+    records = read_manifest(output)
+    assert len(records) == 3
+    for record in records.values():
+        with np.load(output / record['output']) as f:
+            assert f['reduced'].shape == tuple(f['shape'])
+            assert f['coefficients'].shape == (3, 3)
+            assert np.isclose(f['mse'], record['mse'])
+
+    # Drop one finished image as if the run was interrupted
+    manifest = output / MANIFEST
+    lines = manifest.read_text().splitlines()
+    manifest.write_text('\n'.join(lines[:2]) + '\n{"source": ["cut')
+    result = reduce_images(paths, output, degree=2, workers=2)
+    assert (result.done, result.skipped, result.failed) == (1, 2, 0)
+
+    result = reduce_images(paths, output, degree=3, workers=2)
+    assert result.done == 3
+
+
+def test_reduce_failure(tmp_path):
+    paths = write_images(tmp_path / 'images', count=1)
+    broken = tmp_path / 'images' / 'broken.IMG'
+    broken.write_bytes(b'LBLSIZE=')
+    result = reduce_images(paths + [broken], tmp_path / 'out', workers=1)
+    assert (result.done, result.failed) == (1, 1)
+    assert [json.loads(line)['output'] for line in (tmp_path / 'out' / MANIFEST).read_text().splitlines()]
+
+
+def test_reduce_engine_params(tmp_path):
+    paths = write_images(tmp_path / 'images', count=1)
+    output = tmp_path / 'out'
+    result = reduce_images(paths, output, engine='percentile', params=dict(percentile=10), workers=1)
+    assert result.done == 1
+    assert reduce_images(paths, output, engine='percentile', params=dict(percentile=10), workers=1).skipped == 1
+    assert reduce_images(paths, output, engine='percentile', params=dict(percentile=90), workers=1).done == 1
+
+
+def tile_count() -> int:
+    calls = list()
+    with mock.patch('os.cpu_count', return_value=8):
+        tiled(lambda t: calls.append(len(t)) or t, np.zeros((512, 8)), 2)
+    return len(calls)
+
+
+def test_worker_single_tile():
+    assert tile_count() == 8
+    with ProcessPoolExecutor(max_workers=1, initializer=_init_worker, initargs=(False,)) as pool:
+        assert pool.submit(tile_count).result() == 1
@@ -0,0 +1,158 @@
+import numpy as np
+import pytest
+
+from vicarui.analysis.reduction.reduction import br_reduction, fit_mask, MAX_SAMPLES
+from vicarui.support.concurrent import Cancelled
+from vicarui.support.misc import ImageWrapper, stratified_sample, basis_cache, disc_mask, region_mask
+from vicarui.support.misc.synthetic import wrap_array, gradient_frame, disc_frame
+from vicarui.support.tasks import BRTask
+
+
+def reduce(data: np.ndarray, **kwargs) -> ImageWrapper:
+    image = wrap_array(data, border=1)
+    br_reduction(image, degree=3, **kwargs)
+    image.active = True
+    return image
+
+
+def test_stratified_sample():
+    rows, cols = stratified_sample((100, 80), 500)
+    assert 250 <= len(rows) <= 500
+    assert rows.min() >= 0 and rows.max() < 100
+    assert cols.min() >= 0 and cols.max() < 80
+    assert len(set(zip(rows, cols))) == len(rows)
+    rows, cols = stratified_sample((10, 8), 500)
+    assert len(rows) == 80
+    assert (stratified_sample((100, 80), 500, seed=1)[0] == stratified_sample((100, 80), 500, seed=1)[0]).all()
+
+
+def test_subsampled_parity():
+    data, background = gradient_frame()
+    full = reduce(data, max_samples=data.size)
+    sampled = reduce(data, max_samples=4096)
+    truth = background[2:-1, 2:-1]
+    assert sampled.background.shape == full.background.shape == truth.shape
+    assert np.sqrt(np.mean((sampled.background - full.background) ** 2)) < 0.25
+    assert np.sqrt(np.mean((sampled.background - truth) ** 2)) < 0.3
+    assert np.isclose(sampled.mse, full.mse, rtol=0.05)
+    assert sampled.outliers.shape == truth.shape
+
+
+def test_low_memory_matches():
+    data, _ = gradient_frame(120)
+    image = reduce(data, max_samples=2048)
+    low = wrap_array(data, border=1, low_memory=True)
+    br_reduction(low, degree=3, max_samples=2048)
+    low.active = True
+    assert np.allclose(low.background, image.background, atol=1e-3)
+
+
+def test_masked_fit():
+    data, background, _ = disc_frame()
+    free = reduce(data)
+    image = wrap_array(data, border=1)
+    mask = disc_mask(image.shape, (0.55 * 256 - 2, 0.45 * 256 - 2), 0.36 * 256)
+    br_reduction(image, degree=3, mask=mask)
+    image.active = True
+    truth = background[2:-1, 2:-1]
+    assert image.background_mask_key is not None
+    assert np.sqrt(np.mean((image.background - truth) ** 2)) < 0.3
+    assert np.sqrt(np.mean((image.background - truth) ** 2)) <= np.sqrt(np.mean((free.background - truth) ** 2))
+    # The disc is left out of the mse
+    assert image.mse < 1.5 < free.mse
+    assert np.isclose(image.mse, np.mean((image.cropped - image.background)[mask] ** 2))
+
+    basis = basis_cache().get(image.shape, 1, 3, MAX_SAMPLES, mask=mask)
+    assert mask[basis.rows, basis.cols].all()
+    assert len(basis.rows) == np.count_nonzero(mask)
+    free_basis = basis_cache().get(image.shape, 1, 3, MAX_SAMPLES)
+    cropped = image.cropped
+    masked_fit = basis.fit(cropped[basis.rows, basis.cols], 3, int(np.sqrt(len(basis.rows))))
+    free_fit = free_basis.fit(cropped[free_basis.rows, free_basis.cols], 3, int(np.sqrt(len(free_basis.rows))))
+    assert masked_fit.n_trials < free_fit.n_trials
+
+
+def test_fit_mask_exclusions():
+    data, _, _ = disc_frame(64)
+    image = wrap_array(data, border=1)
+    assert fit_mask(image) is None
+    image.exclusions.append((0, 10, 5, 15))
+    mask = fit_mask(image)
+    assert mask.shape == image.shape
+    assert not mask[0:10, 5:15].any()
+    assert mask.sum() == mask.size - 100
+    assert np.array_equal(region_mask((4, 4), [(1, 3, 1, 2)]), ~np.pad(np.ones((2, 1), bool), ((1, 1), (1, 2))))
+
+
+def test_target_mask_cached(monkeypatch):
+    import vicarui.analysis as analysis
+    data, _, _ = disc_frame(64)
+    image = wrap_array(data, border=1)
+    calls = list()
+
+    def background_mask(wrapper):
+        calls.append(wrapper.border)
+        return np.ones(wrapper.shape, dtype=bool)
+
+    monkeypatch.setattr(analysis, 'background_mask', background_mask)
+    fit_mask(image, target=True)
+    fit_mask(image, target=True)
+    assert calls == [1]
+    image.border = 2
+    assert fit_mask(image, target=True).shape == image.shape
+    assert calls == [1, 2]
+
+
+def test_preview_then_refine():
+    data, background = gradient_frame(300)
+    image = wrap_array(data, border=1)
+    image.active = True
+    br_reduction(image, degree=3, preview=True)
+    assert image.background_preview
+    truth = background[2:-1, 2:-1]
+    assert np.sqrt(np.mean((image.background - truth) ** 2)) < 0.5
+    br_reduction(image, degree=3, preview=True)
+    assert image.background_preview
+    br_reduction(image, degree=3)
+    assert not image.background_preview
+    assert np.sqrt(np.mean((image.background - truth) ** 2)) < 0.3
+    br_reduction(image, degree=3, preview=True)
+    assert not image.background_preview
+
+
+def test_cancelled_fit():
+    data, _ = gradient_frame(120)
+    image = wrap_array(data, border=1)
+    image.active = True
+
+    def cancel():
+        raise Cancelled()
+
+    with pytest.raises(Cancelled):
+        br_reduction(image, degree=3, check=cancel)
+    assert image.active
+    assert not image.has_background
+
+
+def test_progressive_task():
+    data, _ = gradient_frame(200)
+    image = wrap_array(data, border=1)
+    task = BRTask(image, dict(border=1, reduce=True, degree=3, normalize=False), progressive=True)
+    events = list()
+    views = list()
+    task.preview.connect(lambda view: (views.append(view), events.append(('preview', view.preview))))
+    task.done.connect(lambda: events.append(('done', image.background_preview)))
+    task.run()
+    assert events == [('preview', True), ('done', False)]
+    # The snapshot keeps the preview after the wrapper is refined
+    view = views[0]
+    assert not view.background.flags.writeable and not view.display.flags.writeable
+    assert not np.array_equal(view.background, image.background)
+    assert not np.array_equal(view.display, image.display)
+
+    events.clear()
+    task = BRTask(image, dict(border=1, reduce=True, degree=3, normalize=False), progressive=True)
+    task.preview.connect(lambda view: events.append(('preview', view.preview)))
+    task.done.connect(lambda: events.append(('done', image.background_preview)))
+    task.run()
+    assert events == [('done', False)]
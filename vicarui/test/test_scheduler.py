@@ -0,0 +1,56 @@
+import threading
+
+from vicarui.support.concurrent import Scheduler, Task, Priority
+
+
+class Recorder(Task):
+
+    def __init__(self, name, out, gate: threading.Event = None):
+        super(Recorder, self).__init__()
+        self.name = name
+        self.out = out
+        self.gate = gate
+
+    def run(self):
+        if self.gate is not None:
+            assert self.gate.wait(5)
+        self.check()
+        self.out.append(self.name)
+
+
+def test_runs_tasks():
+    scheduler = Scheduler(max_threads=2)
+    out = list()
+    for i in range(0, 10):
+        scheduler.submit(Recorder(i, out), priority=Priority.LOW if i % 2 else Priority.HIGH)
+    assert scheduler.wait(5000)
+    assert sorted(out) == list(range(0, 10))
+    assert scheduler.stats()['Recorder']['count'] == 10
+
+
+def test_coalescing():
+    scheduler = Scheduler(max_threads=2)
+    out = list()
+    gate = threading.Event()
+    first = Recorder('first', out, gate)
+    scheduler.submit(first, key='image')
+    tokens = [scheduler.submit(Recorder(i, out), key='image') for i in range(0, 5)]
+    assert first.cancelled
+    assert all(t.cancelled for t in tokens[:-1])
+    assert not tokens[-1].cancelled
+    gate.set()
+    assert scheduler.wait(5000)
+    assert out == [4]
+    assert scheduler.stats()['Recorder']['superseded'] == 5
+
+
+def test_cancel():
+    scheduler = Scheduler(max_threads=1)
+    out = list()
+    gate = threading.Event()
+    scheduler.submit(Recorder('blocked', out, gate), key='a')
+    scheduler.submit(Recorder('other', out), key='b')
+    scheduler.cancel('a')
+    gate.set()
+    assert scheduler.wait(5000)
+    assert out == ['other']
@@ -0,0 +1,36 @@
+import json
+import threading
+
+from vicarui.support.trace import span, traced, enable_trace, write_trace, summary, reset
+
+
+@traced('work')
+def work(n: int):
+    return sum(range(0, n))
+
+
+def test_spans_and_trace(tmp_path):
+    reset()
+    enable_trace()
+    for _ in range(0, 5):
+        work(10000)
+    thread = threading.Thread(target=lambda: work(10), name='worker')
+    thread.start()
+    thread.join()
+    with span('outer', file='a.IMG'):
+        work(10)
+
+    values = summary()
+    assert values['work']['count'] == 7
+    assert values['outer']['count'] == 1
+    assert values['work']['p50'] <= values['work']['p95'] <= values['work']['max']
+
+    assert write_trace(tmp_path / 'trace.json') == 8
+    with open(tmp_path / 'trace.json') as f:
+        events = json.load(f)['traceEvents']
+    spans = [e for e in events if e['ph'] == 'X']
+    outer = next(e for e in spans if e['name'] == 'outer')
+    assert outer['args']['file'] == 'a.IMG'
+    assert 'cpu_ms' in outer['args']
+    assert len({e['tid'] for e in spans}) == 2
+    assert any(e['ph'] == 'M' and e['args']['name'] == 'worker' for e in events)
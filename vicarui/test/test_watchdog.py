@@ -0,0 +1,26 @@
+import time
+
+from PySide2.QtCore import QCoreApplication, QTimer
+from vicarui.support.concurrent import Watchdog
+
+
+def blocking_call():
+    time.sleep(0.3)
+
+
+def test_stall_detected():
+    app = QCoreApplication.instance() or QCoreApplication([])
+    watchdog = Watchdog(threshold=100, interval=10)
+    watchdog.start()
+    QTimer.singleShot(100, blocking_call)
+    QTimer.singleShot(600, app.quit)
+    app.exec_()
+    watchdog.stop()
+
+    assert len(watchdog.stalls) == 1
+    stall = watchdog.stalls[0]
+    assert stall.duration >= 250
+    assert 'blocking_call' in stall.stack
+    assert sum(watchdog.histogram().values()) > 10
+    assert watchdog.histogram()['200-500 ms'] == 1
+    assert watchdog.percentiles()[50] <= 16
@@ -0,0 +1,86 @@
+"""
+Reader benchmarks
+
+Run with ``python -m pytest bench/bench_reader.py``, results are saved into bench/.benchmarks.
+"""
+import io
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from vicarutil.image import read_image, read_beg_labels, NumberFormat, DataOrg
+from vicarutil.image.synthetic import write_image, synthetic_data
+from vicarutil.image.util import bsq_to_bil, bil_to_bsq, bsq_to_bip, bip_to_bsq
+
+SIZES = {
+    'small': (1, 256, 256),
+    'medium': (1, 1024, 1024),
+    'large': (1, 2048, 2048),
+}
+TASKS = {
+    f"TASK{i}": {'USER': 'bench', 'DAT_TIM': 'Thu Jan 01 00:00:00 1970', 'VALUES': (1, 2, 3)}
+    for i in range(0, 32)
+}
+
+
+@pytest.fixture(scope='module')
+def files(tmp_path_factory):
+    cache = dict()
+    root = tmp_path_factory.mktemp('bench')
+
+    def get(size: str = 'medium', fmt=NumberFormat.HALF, org=DataOrg.BSQ, bands: int = None, **kwargs):
+        shape = SIZES[size] if bands is None else (bands, *SIZES[size][1:])
+        key = (size, fmt, org, shape, repr(sorted(kwargs.items())))
+        if key not in cache:
+            path = root / f"{len(cache)}.IMG"
+            write_image(path, synthetic_data(*shape, fmt=fmt), fmt=fmt, org=org, **kwargs)
+            cache[key] = path
+        return cache[key]
+
+    return get
+
+
+def test_label_parsing(benchmark, files):
+    with open(files('small', label_size=64 * 1024, tasks=TASKS), 'rb') as f:
+        buffer = io.BytesIO(f.read())
+    labels = benchmark(read_beg_labels, buffer)
+    assert len(labels.tasks) == len(TASKS)
+
+
+@pytest.mark.parametrize('size', list(SIZES))
+@pytest.mark.parametrize('fmt', [NumberFormat.BYTE, NumberFormat.HALF, NumberFormat.REAL])
+def test_full_read(benchmark, files, size, fmt):
+    benchmark.group = f"full-{size}"
+    image = benchmark(read_image, files(size, fmt=fmt))
+    assert image.data.shape == SIZES[size]
+
+
+@pytest.mark.parametrize('lines', [16, 128, 512])
+def test_roi_read(benchmark, files, lines):
+    benchmark.group = 'roi'
+    path = files('large', bands=3)
+    image = benchmark(read_image, path, lines=slice(1024, 1024 + lines))
+    assert image.data.shape == (3, lines, SIZES['large'][2])
+
+
+@pytest.mark.parametrize('org', [DataOrg.BSQ, DataOrg.BIL, DataOrg.BIP])
+def test_org_read(benchmark, files, org):
+    benchmark.group = 'org'
+    image = benchmark(read_image, files('medium', org=org, bands=3))
+    assert image.data.shape == (3, *SIZES['medium'][1:])
+
+
+@pytest.mark.parametrize('forward,backward', [(bsq_to_bil, bil_to_bsq), (bsq_to_bip, bip_to_bsq)])
+def test_org_transform(benchmark, forward, backward):
+    benchmark.group = 'transform'
+    data = synthetic_data(3, *SIZES['medium'][1:])
+    stored = forward(data).copy()
+    result = benchmark(lambda: backward(stored).copy())
+    assert (result == data).all()
+
+
+def test_binary_prefix_read(benchmark, files):
+    benchmark.group = 'org'
+    image = benchmark(read_image, files('medium', nbb=200, nlb=1))
+    assert image.data.shape == SIZES['medium']
@@ -20,6 +20,9 @@ setuptools.setup(
     install_requires=[
         "numpy"
     ],
+    extras_require={
+        "bench": ["pytest", "pytest-benchmark"]
+    },
     package_dir={"": "src"},
     packages=setuptools.find_packages(where="src"),
     python_requires=">=3.7",
@@ -0,0 +1,24 @@
+"""
+pytest-benchmark settings shared by the benchmark suites of vicarutil and vicarui
+"""
+from pathlib import Path
+
+
+def autosave(config, storage: Path) -> None:
+    """
+    Saves every benchmark run into storage so runs can be compared with ``pytest-benchmark compare``
+
+    Call from pytest_configure of a benchmark conftest. Does nothing without pytest-benchmark,
+    an explicit --benchmark-save, --benchmark-autosave or --benchmark-storage is kept.
+    """
+    option = config.option
+    if not hasattr(option, 'benchmark_autosave'):
+        return
+    if not option.benchmark_autosave and not option.benchmark_save:
+        from pytest_benchmark.utils import get_tag
+        option.benchmark_autosave = get_tag()
+    if option.benchmark_storage == 'file://./.benchmarks':
+        option.benchmark_storage = storage.as_uri()
+
+
+__all__ = ['autosave']
@@ -1,4 +1,4 @@
 from .core import *
 from .definitions import *
-from .reader import read_image
+from .reader import read_image, read_remote_image
 from .util import *
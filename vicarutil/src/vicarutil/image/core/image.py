@@ -2,7 +2,7 @@
 Internal convenience functions for reading images
 """
 
-from typing import BinaryIO, cast
+from typing import BinaryIO, Optional, cast
 
 import numpy as np
 
@@ -11,20 +11,49 @@ from ..definitions import *
 from ..util import bip_to_bsq, bil_to_bsq
 
 
-def read_image_internal(f: BinaryIO, offset: int, c: VicarImageConstraints) -> np.ndarray:
+def _read_records(f: BinaryIO, offset: int, count: int, c: VicarImageConstraints) -> np.ndarray:
     """
-    Reads image data from a file into a ndarray.
+    Reads consecutive records into a (count, n1) array skipping the binary prefix.
     """
     f.seek(offset)
-    recsize: int = c.recsize
-    nbb: int = c.nbb
-    dtype: np.dtype = c.dtype
-    data = [
-        [
-            np.frombuffer(f.read(recsize), dtype=dtype, offset=nbb) for _ in range(0, c.n2)
-        ] for _ in range(0, c.n3)
-    ]
-    base_arr: np.ndarray = np.asarray(data)
+    width: int = c.n1 * c.dtype.itemsize
+    buffer = bytearray(f.read(count * c.recsize))
+    if len(buffer) != count * c.recsize:
+        raise EOFError(f"Expected {count * c.recsize} bytes of image data, got {len(buffer)}")
+    records: np.ndarray = np.frombuffer(buffer, dtype=np.uint8).reshape(count, c.recsize)
+    if c.nbb != 0 or width != c.recsize:
+        records = np.ascontiguousarray(records[:, c.nbb:c.nbb + width])
+    return records.view(c.dtype)
+
+
+def read_image_internal(
+        f: BinaryIO,
+        offset: int,
+        c: VicarImageConstraints,
+        lines: Optional[range] = None
+) -> np.ndarray:
+    """
+    Reads image data from a file into a ndarray.
+
+    If lines is given only the records holding those image lines are read.
+    Lines are N2 in BSQ and N3 in BIL and BIP.
+    """
+    if lines is None:
+        base_arr = _read_records(f, offset, c.n2 * c.n3, c).reshape(c.n3, c.n2, c.n1)
+    elif lines.step != 1:
+        raise ValueError("Only contiguous line ranges are supported")
+    elif c.org == DataOrg.BSQ:
+        base_arr = np.asarray([
+            _read_records(f, offset + (band * c.n2 + lines.start) * c.recsize, len(lines), c)
+            for band in range(0, c.n3)
+        ])
+    else:
+        base_arr = _read_records(
+            f,
+            offset + lines.start * c.n2 * c.recsize,
+            len(lines) * c.n2,
+            c
+        ).reshape(len(lines), c.n2, c.n1)
     if c.org == DataOrg.BIP:
         base_arr = bip_to_bsq(base_arr)
     elif c.org == DataOrg.BIL:
@@ -32,26 +61,28 @@ def read_image_internal(f: BinaryIO, offset: int, c: VicarImageConstraints) -> n
     return base_arr
 
 
-def read_binary_prefix(f: BinaryIO, offset: int, c: VicarImageConstraints) -> List[List[bytes]]:
+def read_binary_prefix(
+        f: BinaryIO,
+        offset: int,
+        c: VicarImageConstraints,
+        lines: Optional[range] = None
+) -> List[List[bytes]]:
     """
     Reads image binary prefix.
+
+    If lines is given only the prefixes of the records read by read_image_internal are read.
     """
-    f.seek(offset)
     nbb: int = c.nbb
-    skip: int = c.recsize - nbb
-
-    def read_seek() -> bytes:
-        b = f.read(nbb)
-        f.seek(skip, 1)
-        return b
 
-    data = [
-        [
-            read_seek() for _ in range(0, c.n2)
-        ] for _ in range(0, c.n3)
-    ]
+    def read_at(record: int) -> bytes:
+        f.seek(offset + record * c.recsize)
+        return f.read(nbb)
 
-    return data
+    if lines is None:
+        lines = range(0, c.n2 if c.org == DataOrg.BSQ else c.n3)
+    if c.org == DataOrg.BSQ:
+        return [[read_at(band * c.n2 + line) for line in lines] for band in range(0, c.n3)]
+    return [[read_at(line * c.n2 + j) for j in range(0, c.n2)] for line in lines]
 
 
 def dtype_from_labels(labels: SYSTEM_TYPE) -> np.dtype:
@@ -94,7 +94,7 @@ def read_labels(f: BinaryIO, offset: int) -> Labels:
     """
     f = StrIO(f)
 
-    f.seek(LBL_OFFSET, 1)
+    f.seek(offset + LBL_OFFSET)
     size: str = f.read()
     join: str = f.read()
     while join in NUMBERS:
@@ -102,7 +102,8 @@ def read_labels(f: BinaryIO, offset: int) -> Labels:
         join = f.read()
 
     f.seek(offset)
-    text: str = f.read(int(size))
+    # Label text ends at the null padding, scanning the padding with the regex is quadratic
+    text: str = f.read(int(size)).split('\0', 1)[0]
     matcher = LBL_REGEX.finditer(text)
 
     labels: SYSTEM_TYPE = dict()
@@ -113,16 +114,19 @@ def read_labels(f: BinaryIO, offset: int) -> Labels:
     sub_target: Optional[SpecialLabel] = None
     sub_key: Optional[str] = None
 
+    def flush():
+        if sub_target == SpecialLabel.PROPERTY:
+            add_indexed(sub_key, sub_dict, properties)
+        elif sub_target == SpecialLabel.TASK:
+            add_indexed(sub_key, sub_dict, tasks)
+
     # This method might be a bit inefficient
     for match in matcher:
         key: str = match.group(LBL_REGEX_KEY)
         value: str = match.group(LBL_REGEX_VALUE)
         if SpecialLabel.has_value(key):
             if sub_dict is not None:
-                if sub_target == SpecialLabel.PROPERTY:
-                    add_indexed(sub_key, sub_dict, properties)
-                elif sub_target == SpecialLabel.TASK:
-                    add_indexed(sub_key, sub_dict, tasks)
+                flush()
                 sub_dict, sub_target, sub_key = None, None, None
             if key == SpecialLabel.PROPERTY.value:
                 sub_target = SpecialLabel.PROPERTY
@@ -135,6 +139,8 @@ def read_labels(f: BinaryIO, offset: int) -> Labels:
                 labels[process_system_value(key)] = process_system_value(value)
             else:
                 add_indexed(key, process_value(value), sub_dict)
+    if sub_dict is not None:
+        flush()
 
     return Labels(system=labels, properties=properties, tasks=tasks)
 
@@ -150,8 +156,9 @@ def has_eol(labels: Labels) -> bool:
 
 
 def eol_offset(labels: Labels) -> int:
-    """Offset for EOL labels"""
-    return labels.vsl(SystemLabel.NLB) * labels.vsl(SystemLabel.RECSIZE)
+    """Offset for EOL labels, right after the binary header and image records"""
+    records = labels.vsl(SystemLabel.NLB) + labels.vsl(SystemLabel.N2) * labels.vsl(SystemLabel.N3)
+    return labels.vsl(SystemLabel.LBLSIZE) + records * labels.vsl(SystemLabel.RECSIZE)
 
 
 def read_eol_labels(f: BinaryIO, beg_labels: Labels) -> Labels:
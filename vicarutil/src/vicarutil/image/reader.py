@@ -2,42 +2,69 @@
 The one and only function to read a Vicar image file
 """
 from pathlib import Path
-from typing import Union, Optional
+from typing import Union, Optional, BinaryIO
 
 from .core import VicarImage, BinaryPrefix
 from .core import constraint_from_labels, read_image_internal, read_binary_prefix
 from .core import read_beg_labels, has_eol, read_eol_labels, read_binary_header
-from .definitions import SystemLabel
+from .definitions import SystemLabel, DataOrg
+from .remote import RangeFile, is_url, DEFAULT_BLOCK_SIZE
 
+LINES_TYPE = Union[range, slice, None]
 
-def read_image(path: Union[str, Path]) -> VicarImage:
+
+def _read_from(f: BinaryIO, name: str, lines: LINES_TYPE = None) -> VicarImage:
+    beg_lbl = read_beg_labels(f)
+    end_lbl = None
+    if has_eol(beg_lbl):
+        end_lbl = read_eol_labels(f, beg_lbl)
+    img_constraints = constraint_from_labels(beg_lbl.system)
+    img_offset = beg_lbl.vsl(SystemLabel.LBLSIZE) + img_constraints.nbh * img_constraints.recsize
+    if isinstance(lines, slice):
+        total = img_constraints.n2 if img_constraints.org == DataOrg.BSQ else img_constraints.n3
+        lines = range(*lines.indices(total))
+    img = read_image_internal(f, img_offset, img_constraints, lines=lines)
+    bpx: Optional[BinaryPrefix] = None
+    bph: Optional[bytes] = None
+    if img_constraints.nbb != 0:
+        bpx = BinaryPrefix(read_binary_prefix(f, img_offset, img_constraints, lines=lines))
+    if img_constraints.nbh != 0:
+        bph = read_binary_header(f, beg_lbl)
+    return VicarImage(
+        name=name,
+        labels=beg_lbl,
+        eol_labels=end_lbl,
+        data=img,
+        binary_prefix=bpx,
+        binary_header=bph
+    )
+
+
+def read_image(path: Union[str, Path], lines: LINES_TYPE = None) -> VicarImage:
     """
     Reads all image and label data from a Vicar file
-    :param path: File to read
+    :param path: File to read, http(s) urls are read with read_remote_image
+    :param lines: Optional range of image lines to read instead of the full image
     :return: VicarData object
     """
+    if is_url(path):
+        return read_remote_image(path, lines=lines)
     with open(path, "rb") as f:
-        beg_lbl = read_beg_labels(f)
-        end_lbl = None
-        if has_eol(beg_lbl):
-            end_lbl = read_eol_labels(f, beg_lbl)
-        img_constraints = constraint_from_labels(beg_lbl.system)
-        img_offset = beg_lbl.vsl(SystemLabel.LBLSIZE) + img_constraints.nbh * img_constraints.recsize
-        img = read_image_internal(f, img_offset, img_constraints)
-        bpx: Optional[BinaryPrefix] = None
-        bph: Optional[bytes] = None
-        if img_constraints.nbb != 0:
-            bpx = BinaryPrefix(read_binary_prefix(f, img_offset, img_constraints))
-        if img_constraints.nbh != 0:
-            bph = read_binary_header(f, beg_lbl)
-        return VicarImage(
-            name=str(path),
-            labels=beg_lbl,
-            eol_labels=end_lbl,
-            data=img,
-            binary_prefix=bpx,
-            binary_header=bph
-        )
-
-
-__all__ = ['read_image']
+        return _read_from(f, str(path), lines=lines)
+
+
+def read_remote_image(url: str, lines: LINES_TYPE = None, block_size: int = DEFAULT_BLOCK_SIZE) -> VicarImage:
+    """
+    Reads a Vicar file from a http(s) server using Range requests
+
+    Only the label bytes and the image records are fetched, blocks are cached and shared between reads.
+    :param url: Url of the file
+    :param lines: Optional range of image lines to read instead of the full image
+    :param block_size: Size of the fetched blocks
+    :return: VicarData object
+    """
+    with RangeFile(url, block_size=block_size) as f:
+        return _read_from(f, url, lines=lines)
+
+
+__all__ = ['read_image', 'read_remote_image']
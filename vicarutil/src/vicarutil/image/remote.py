@@ -0,0 +1,363 @@
+"""
+Reading Vicar files served over HTTP
+
+Files are read with HTTP Range requests so only the label bytes and the needed image records are transferred.
+Connections are kept alive and pooled per host and fetched bytes are kept in a shared block cache.
+
+Cached blocks are revalidated with a conditional request for the first block when a file is opened,
+using the ETag or Last-Modified of the server. Servers sending neither can not be validated and cached blocks
+of a file changed on the server may be stale until the cache is cleared.
+"""
+
+import io
+import re
+import threading
+from collections import OrderedDict
+from http.client import HTTPConnection, HTTPSConnection, HTTPException
+from typing import Dict, List, Optional, Tuple, Hashable
+from urllib.parse import urlsplit
+
+from .internal import log
+
+DEFAULT_BLOCK_SIZE = 64 * 1024
+"""
+Size of the blocks fetched and cached
+"""
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+"""
+Default byte budget for the shared block cache
+"""
+MAX_REQUEST_SIZE = 16 * 1024 * 1024
+"""
+Largest single Range request, longer runs are split
+"""
+
+_CONTENT_RANGE = re.compile(r"bytes\s+(?P<start>\d+)-(?P<end>\d+)/(?P<total>\d+|\*)")
+_UNSATISFIED_RANGE = re.compile(r"bytes\s+\*/(?P<total>\d+)")
+
+
+def is_url(path) -> bool:
+    """True if the path looks like a http(s) url"""
+    return isinstance(path, str) and path.lower().startswith(('http://', 'https://'))
+
+
+class ConnectionPool:
+    """
+    Pool of keep-alive connections per (scheme, host)
+
+    At most max_size idle connections are kept for each host.
+    """
+
+    def __init__(self, max_size: int = 4, timeout: float = 30.):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle: Dict[Tuple[str, str], List[HTTPConnection]] = dict()
+        self._lock = threading.Lock()
+
+    def _acquire(self, scheme: str, netloc: str) -> HTTPConnection:
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle:
+                return idle.pop()
+        if scheme == 'https':
+            return HTTPSConnection(netloc, timeout=self.timeout)
+        return HTTPConnection(netloc, timeout=self.timeout)
+
+    def _release(self, scheme: str, netloc: str, conn: HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault((scheme, netloc), list())
+            if len(idle) < self.max_size:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def request(self, url: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        GET request returning (status, headers, body)
+
+        A request on a stale keep-alive connection is retried once on a fresh one.
+        """
+        parts = urlsplit(url)
+        target = parts.path or '/'
+        if parts.query:
+            target = f"{target}?{parts.query}"
+        for attempt in range(0, 2):
+            conn = self._acquire(parts.scheme, parts.netloc)
+            try:
+                conn.request('GET', target, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+            except (HTTPException, ConnectionError) as e:
+                conn.close()
+                if attempt == 1:
+                    raise e
+                log.debug("Retrying request on a new connection: %s", url)
+                continue
+            response_headers = {k.lower(): v for k, v in response.getheaders()}
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(parts.scheme, parts.netloc, conn)
+            return response.status, response_headers, body
+
+    def close(self) -> None:
+        with self._lock:
+            idle = [c for cs in self._idle.values() for c in cs]
+            self._idle.clear()
+        for conn in idle:
+            conn.close()
+
+
+Validator = Tuple[str, str]
+"""
+Header name and value identifying a version of a remote file
+"""
+
+
+def _validator(headers: Dict[str, str]) -> Optional[Validator]:
+    for name in ('etag', 'last-modified'):
+        if name in headers:
+            return name, headers[name]
+    return None
+
+
+_CONDITIONAL = {'etag': 'If-None-Match', 'last-modified': 'If-Modified-Since'}
+
+
+class BlockCache:
+    """
+    Thread safe LRU cache for blocks of remote files with a byte budget
+
+    Keys are (url, block size, index) tuples, the validator of the cached version is kept per url.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_SIZE):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._blocks: OrderedDict = OrderedDict()
+        self._validators: Dict[str, Validator] = dict()
+        self._lock = threading.Lock()
+
+    def validator(self, url: str) -> Optional[Validator]:
+        with self._lock:
+            return self._validators.get(url)
+
+    def set_validator(self, url: str, validator: Validator) -> None:
+        """
+        Sets the validator of the cached version, blocks of other versions are dropped
+        """
+        with self._lock:
+            if self._validators.get(url) == validator:
+                return
+            self._validators[url] = validator
+            for key in [k for k in self._blocks if isinstance(k, tuple) and k[0] == url]:
+                self.size -= len(self._blocks.pop(key))
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            try:
+                self._blocks.move_to_end(key)
+                return self._blocks[key]
+            except KeyError:
+                return None
+
+    def put(self, key: Hashable, block: bytes) -> None:
+        with self._lock:
+            if key in self._blocks:
+                self.size -= len(self._blocks.pop(key))
+            self._blocks[key] = block
+            self.size += len(block)
+            while self.size > self.max_bytes and len(self._blocks) > 1:
+                _, evicted = self._blocks.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._blocks.clear()
+            self._validators.clear()
+            self.size = 0
+
+
+_pool = ConnectionPool()
+_cache = BlockCache()
+
+
+def default_pool() -> ConnectionPool:
+    return _pool
+
+
+def default_cache() -> BlockCache:
+    return _cache
+
+
+class RangeFile(io.RawIOBase):
+    """
+    Read-only file object for a http(s) url backed by Range requests
+
+    Reads are served from the block cache, missing blocks are fetched with one request per contiguous run.
+    The cached version is revalidated before the first read, a file changing between requests raises an IOError.
+    """
+
+    def __init__(
+            self,
+            url: str,
+            block_size: int = DEFAULT_BLOCK_SIZE,
+            pool: ConnectionPool = None,
+            cache: BlockCache = None
+    ):
+        super(RangeFile, self).__init__()
+        self.url = url
+        self.name = url
+        self.block_size = block_size
+        self.pool = pool or _pool
+        self.cache = cache or _cache
+        self.length: Optional[int] = None
+        self.requests = 0
+        self.validator: Optional[Validator] = None
+        self._validated = False
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size() + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if pos < 0:
+            raise ValueError(f"Negative seek position: {pos}")
+        self._pos = pos
+        return pos
+
+    def size(self) -> int:
+        """
+        Total size of the remote file, requests the first block if unknown
+        """
+        self._validate()
+        if self.length is None:
+            self._request(0, self.block_size - 1)
+        return self.length
+
+    def _key(self, index: int) -> Tuple[str, int, int]:
+        return self.url, self.block_size, index
+
+    def _block(self, index: int) -> bytes:
+        block = self.cache.get(self._key(index))
+        if block is None:
+            self.fetch(index, index)
+            block = self.cache.get(self._key(index)) or b''
+        return block
+
+    def _validate(self) -> None:
+        """
+        Conditional request for the first block if the cache holds blocks of this url
+        """
+        if self._validated:
+            return
+        self._validated = True
+        cached = self.cache.validator(self.url)
+        if cached is not None:
+            self._request(0, self.block_size - 1, {_CONDITIONAL[cached[0]]: cached[1]})
+            if self.validator is None:
+                self.validator = cached
+
+    def _request(self, start: int, end: int, conditional: Dict[str, str] = None) -> None:
+        self.requests += 1
+        status, headers, body = self.pool.request(self.url, {'Range': f"bytes={start}-{end}", **(conditional or {})})
+        if status == 304:
+            # The cached version is current
+            return
+        validator = _validator(headers)
+        if validator is not None:
+            if self.validator is not None and validator != self.validator:
+                self.cache.set_validator(self.url, validator)
+                raise IOError(f"Remote file changed while reading: {self.url}")
+            self.validator = validator
+            self.cache.set_validator(self.url, validator)
+        if status == 416:
+            # Past the end of file
+            match = _UNSATISFIED_RANGE.match(headers.get('content-range', ''))
+            self.length = int(match.group('total')) if match else start
+            return
+        if status == 200:
+            # No range support, the whole file was sent
+            start = 0
+            self.length = len(body)
+        elif status == 206:
+            match = _CONTENT_RANGE.match(headers.get('content-range', ''))
+            if match is None:
+                raise IOError(f"Invalid Content-Range from {self.url}")
+            start = int(match.group('start'))
+            if match.group('total') != '*':
+                self.length = int(match.group('total'))
+        else:
+            raise IOError(f"HTTP {status} for {self.url}")
+        bs = self.block_size
+        if start % bs != 0:
+            raise IOError(f"Unaligned range from {self.url}")
+        for i in range(0, len(body), bs):
+            self.cache.put(self._key((start + i) // bs), body[i:i + bs])
+
+    def fetch(self, first: int, last: int) -> None:
+        """
+        Fetches blocks first..last (inclusive) that are not cached yet
+        """
+        bs = self.block_size
+        if self.length is not None:
+            last = min(last, max(0, (self.length - 1) // bs))
+        max_blocks = max(1, MAX_REQUEST_SIZE // bs)
+        run_start: Optional[int] = None
+        for index in range(first, last + 2):
+            missing = index <= last and self.cache.get(self._key(index)) is None
+            if missing and run_start is None:
+                run_start = index
+            elif run_start is not None and (not missing or index - run_start == max_blocks):
+                self._request(run_start * bs, index * bs - 1)
+                run_start = index if missing else None
+
+    def read(self, n: int = -1) -> bytes:
+        if n is None or n < 0:
+            n = self.size() - self._pos
+        if n <= 0:
+            return b''
+        self._validate()
+        bs = self.block_size
+        first = self._pos // bs
+        last = (self._pos + n - 1) // bs
+        self.fetch(first, last)
+        out = bytearray()
+        for index in range(first, last + 1):
+            block = self._block(index)
+            lo = self._pos - index * bs if index == first else 0
+            out += block[lo:lo + n - len(out)]
+            if len(block) < bs:
+                break
+        self._pos += len(out)
+        return bytes(out)
+
+    def readinto(self, b) -> int:
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+__all__ = [
+    'RangeFile',
+    'ConnectionPool',
+    'BlockCache',
+    'default_pool',
+    'default_cache',
+    'is_url',
+    'DEFAULT_BLOCK_SIZE'
+]
@@ -0,0 +1,177 @@
+"""
+Writes synthetic Vicar files for tests and benchmarks
+
+Data is always given in the same (bands, lines, samples) order the reader returns and is written in the requested ORG.
+"""
+from pathlib import Path
+from typing import Union, Optional, Dict, Any
+
+import numpy as np
+
+from .definitions import NumberFormat, DataOrg, IntFormat, RealFormat, LABEL_ENCODING
+from .definitions import isIntFormat, isRealFormat
+from .util import bsq_to_bil, bsq_to_bip
+
+LABEL_TYPE = Dict[str, Dict[str, Any]]
+
+
+def format_value(value: Any) -> str:
+    """
+    Formats a value into Vicar label syntax
+    """
+    if isinstance(value, (list, tuple)):
+        return f"({','.join(format_value(v) for v in value)})"
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)):
+        return repr(float(value))
+    return f"'{value}'"
+
+
+def _section(kind: str, values: Optional[LABEL_TYPE]) -> str:
+    if not values:
+        return ''
+    return ''.join(
+        f"{kind}={format_value(name)}  " + ''.join(f"{k}={format_value(v)}  " for k, v in labels.items())
+        for name, labels in values.items()
+    )
+
+
+def _label_block(text: str, recsize: int, label_size: Optional[int] = None) -> bytes:
+    """
+    Prefixes text with LBLSIZE and pads it to a multiple of recsize
+    """
+    size = max(len(text) + len("LBLSIZE=") + 10, label_size or 0)
+    size = -(-size // recsize) * recsize
+    block = f"LBLSIZE={size:<10d}{text}"
+    if len(block) > size:
+        raise ValueError(f"Labels do not fit into LBLSIZE={size}")
+    return block.ljust(size, '\0').encode(LABEL_ENCODING)
+
+
+def file_dtype(
+        fmt: NumberFormat,
+        intfmt: IntFormat = IntFormat.LOW,
+        realfmt: RealFormat = RealFormat.RIEEE
+) -> np.dtype:
+    """
+    On disk dtype for a format, same as the reader produces
+    """
+    if isIntFormat(fmt):
+        return fmt.value[3].newbyteorder(intfmt.value[1])
+    elif isRealFormat(fmt):
+        if realfmt == RealFormat.VAX:
+            raise ValueError("VAX floats are not supported")
+        return fmt.value[3].newbyteorder(realfmt.value[1])
+    return fmt.value[3]
+
+
+def synthetic_data(
+        bands: int,
+        lines: int,
+        samples: int,
+        fmt: NumberFormat = NumberFormat.HALF,
+        seed: int = 0
+) -> np.ndarray:
+    """
+    Random (bands, lines, samples) image data for a format
+
+    Integer data covers at most the positive 12-bit range to look somewhat like a real detector.
+    """
+    rng = np.random.default_rng(seed)
+    dtype = fmt.value[3]
+    shape = (bands, lines, samples)
+    if isIntFormat(fmt):
+        high = min(np.iinfo(dtype).max, 4095)
+        return rng.integers(0, high, size=shape, endpoint=True).astype(dtype)
+    data = rng.normal(100., 10., size=shape)
+    if dtype.kind == 'c':
+        data = data + 1j * rng.normal(0., 1., size=shape)
+    return data.astype(dtype)
+
+
+def write_image(
+        path: Union[str, Path],
+        data: np.ndarray,
+        fmt: NumberFormat = NumberFormat.HALF,
+        org: DataOrg = DataOrg.BSQ,
+        intfmt: IntFormat = IntFormat.LOW,
+        realfmt: RealFormat = RealFormat.RIEEE,
+        nbb: int = 0,
+        nlb: int = 0,
+        eol: bool = False,
+        label_size: Optional[int] = None,
+        properties: Optional[LABEL_TYPE] = None,
+        tasks: Optional[LABEL_TYPE] = None
+) -> None:
+    """
+    Writes a Vicar file
+
+    :param path:        Target file
+    :param data:        Image data as (bands, lines, samples) or (lines, samples)
+    :param fmt:         Number format of the written data
+    :param org:         Data organization in the file
+    :param intfmt:      Integer byte order
+    :param realfmt:     Float byte order
+    :param nbb:         Binary prefix bytes per record, filled with the record index
+    :param nlb:         Binary header records, filled with the byte index
+    :param eol:         Write tasks as EOL labels after the image data
+    :param label_size:  Minimum LBLSIZE, rounded up to a multiple of RECSIZE
+    :param properties:  Property labels as {name: {key: value}}
+    :param tasks:       Task labels as {name: {key: value}}
+    """
+    if data.ndim == 2:
+        data = data[np.newaxis]
+    nb, nl, ns = data.shape
+    if org == DataOrg.BIL:
+        stored = bsq_to_bil(data)
+    elif org == DataOrg.BIP:
+        stored = bsq_to_bip(data)
+    else:
+        stored = data
+    n3, n2, n1 = stored.shape
+    dtype = file_dtype(fmt, intfmt, realfmt)
+    recsize = nbb + n1 * dtype.itemsize
+
+    system = {
+        'FORMAT': fmt.value[0],
+        'TYPE': 'IMAGE',
+        'BUFSIZ': recsize,
+        'DIM': 3,
+        'EOL': int(eol),
+        'RECSIZE': recsize,
+        'ORG': org.value,
+        'NL': nl,
+        'NS': ns,
+        'NB': nb,
+        'N1': n1,
+        'N2': n2,
+        'N3': n3,
+        'N4': 0,
+        'NBB': nbb,
+        'NLB': nlb,
+        'HOST': 'PC_X86_64',
+        'INTFMT': intfmt.value[0],
+        'REALFMT': realfmt.value[0],
+    }
+    text = ''.join(f"{k}={format_value(v)}  " for k, v in system.items()) + _section('PROPERTY', properties)
+    if not eol:
+        text += _section('TASK', tasks)
+
+    records = np.frombuffer(
+        np.ascontiguousarray(stored, dtype=dtype).tobytes(),
+        dtype=np.uint8
+    ).reshape(n3 * n2, n1 * dtype.itemsize)
+    if nbb != 0:
+        prefix = np.repeat((np.arange(n3 * n2) % 256).astype(np.uint8)[:, np.newaxis], nbb, axis=1)
+        records = np.concatenate((prefix, records), axis=1)
+
+    with open(path, 'wb') as f:
+        f.write(_label_block(text, recsize, label_size))
+        f.write((np.arange(nlb * recsize) % 256).astype(np.uint8).tobytes())
+        f.write(records.tobytes())
+        if eol:
+            f.write(_label_block(_section('TASK', tasks), recsize))
+
+
+__all__ = ['write_image', 'synthetic_data', 'file_dtype', 'format_value']
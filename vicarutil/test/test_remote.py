@@ -0,0 +1,136 @@
+import os
+import re
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+from vicarutil.image import read_image, read_remote_image
+from vicarutil.image.remote import RangeFile, BlockCache
+from vicarutil.image.synthetic import write_image, synthetic_data
+
+NL, NS = 64, 48
+
+
+class RangeHandler(SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    requested = list()
+
+    def log_message(self, *_):
+        pass
+
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        with open(path, 'rb') as f:
+            content = f.read()
+        etag = f'"{os.stat(path).st_mtime_ns}-{len(content)}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        match = re.match(r"bytes=(\d+)-(\d+)", self.headers.get('Range', ''))
+        if match:
+            start, end = int(match.group(1)), min(int(match.group(2)), len(content) - 1)
+            if start >= len(content):
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{len(content)}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.requested.append((start, end))
+            body = content[start:end + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{end}/{len(content)}")
+        else:
+            body = content
+            self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture()
+def served(tmp_path):
+    data = np.arange(NL * NS, dtype='int16').reshape(NL, NS)
+    write_image(tmp_path / 'image.IMG', data, properties={'IDENTIFICATION': {'IMAGE_NUMBER': '1234'}})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(RangeHandler, directory=str(tmp_path)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    RangeHandler.requested.clear()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/image.IMG", tmp_path / 'image.IMG', data
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_remote_matches_local(served):
+    url, path, data = served
+    remote = read_remote_image(url, block_size=512)
+    local = read_image(path)
+    assert remote.labels.property('IDENTIFICATION')['IMAGE_NUMBER'] == '1234'
+    assert (remote.data == local.data).all()
+    assert (remote.data[0] == data).all()
+
+
+def test_remote_lines_only_fetch_needed(served):
+    url, path, data = served
+    image = read_remote_image(url, lines=slice(10, 20), block_size=256)
+    assert (image.data[0] == data[10:20]).all()
+    assert (image.data[0] == read_image(path, lines=range(10, 20)).data[0]).all()
+    fetched = sum(end - start + 1 for start, end in RangeHandler.requested)
+    assert fetched < path.stat().st_size // 2
+
+
+def test_block_cache_reuse(served):
+    url, _, _ = served
+    cache = BlockCache()
+    with RangeFile(url, block_size=128, cache=cache) as f:
+        first = f.read(300)
+        count = f.requests
+        f.seek(0)
+        assert f.read(300) == first
+        assert f.requests == count
+    with RangeFile(url, block_size=128, cache=BlockCache(max_bytes=256)) as f:
+        f.read(1024)
+        assert f.cache.size <= 256
+
+
+def test_read_image_dispatches_urls(served):
+    url, _, data = served
+    assert (read_image(url).data[0] == data).all()
+
+
+def test_remote_lines_prefix(served):
+    url, path, _ = served
+    data = synthetic_data(1, 256, 256, seed=0)
+    write_image(path.parent / 'prefix.IMG', data, nbb=24)
+    url = url.replace('image.IMG', 'prefix.IMG')
+    image = read_remote_image(url, lines=slice(10, 20), block_size=1024)
+    assert (image.data == read_image(path.parent / 'prefix.IMG').data[:, 10:20]).all()
+    assert len(image.binary_prefix.data) == 1 and len(image.binary_prefix.data[0]) == 10
+    assert image.binary_prefix.data[0][0] == bytes([10] * 24)
+    fetched = sum(end - start + 1 for start, end in RangeHandler.requested)
+    assert fetched < (path.parent / 'prefix.IMG').stat().st_size // 4
+
+
+def test_block_cache_revalidation(served):
+    url, path, data = served
+    cache = BlockCache()
+    with RangeFile(url, block_size=256, cache=cache) as f:
+        first = f.read(4096)
+    with RangeFile(url, block_size=256, cache=cache) as f:
+        assert f.read(4096) == first
+        # Only the conditional request answered with 304
+        assert f.requests == 1
+
+    write_image(path, data[::-1].copy())
+    os.utime(path, ns=(0, 0))
+    with RangeFile(url, block_size=256, cache=cache) as f:
+        changed = f.read(4096)
+    assert changed == path.read_bytes()[:4096]
+    assert changed != first
@@ -0,0 +1,63 @@
+import pytest
+
+from vicarutil.image import read_image, NumberFormat, DataOrg, IntFormat, RealFormat, SystemLabel
+from vicarutil.image.synthetic import write_image, synthetic_data
+
+PROPERTIES = {'IDENTIFICATION': {'IMAGE_NUMBER': '1234', 'EXPOSURE': 1.5, 'SIZE': (1, 2, 3)}}
+TASKS = {'TEST': {'USER': 'test', 'DAT_TIM': 'Thu Jan 01 00:00:00 1970'}}
+
+
+@pytest.mark.parametrize('fmt', [
+    NumberFormat.BYTE,
+    NumberFormat.HALF,
+    NumberFormat.FULL,
+    NumberFormat.REAL,
+    NumberFormat.DOUB,
+    NumberFormat.COMP,
+])
+@pytest.mark.parametrize('org', [DataOrg.BSQ, DataOrg.BIL, DataOrg.BIP])
+def test_round_trip(tmp_path, fmt, org):
+    data = synthetic_data(3, 17, 11, fmt=fmt)
+    write_image(tmp_path / 'image.IMG', data, fmt=fmt, org=org)
+    image = read_image(tmp_path / 'image.IMG')
+    assert image.labels.vsl(SystemLabel.ORG) == org
+    assert image.data.shape == data.shape
+    assert (image.data == data).all()
+
+
+@pytest.mark.parametrize('intfmt,realfmt', [(IntFormat.HIGH, RealFormat.IEEE), (IntFormat.LOW, RealFormat.RIEEE)])
+def test_byte_order(tmp_path, intfmt, realfmt):
+    for fmt in (NumberFormat.HALF, NumberFormat.REAL):
+        data = synthetic_data(1, 8, 8, fmt=fmt)
+        write_image(tmp_path / 'image.IMG', data, fmt=fmt, intfmt=intfmt, realfmt=realfmt)
+        assert (read_image(tmp_path / 'image.IMG').data == data).all()
+
+
+def test_labels_prefix_and_header(tmp_path):
+    data = synthetic_data(1, 20, 16)
+    write_image(
+        tmp_path / 'image.IMG',
+        data,
+        nbb=4,
+        nlb=2,
+        label_size=4096,
+        properties=PROPERTIES,
+        tasks=TASKS
+    )
+    image = read_image(tmp_path / 'image.IMG')
+    assert (image.data == data).all()
+    assert image.labels.vsl(SystemLabel.LBLSIZE) >= 4096
+    assert image.labels.vsl(SystemLabel.LBLSIZE) % image.labels.vsl(SystemLabel.RECSIZE) == 0
+    assert image.labels.property('IDENTIFICATION') == {'IMAGE_NUMBER': '1234', 'EXPOSURE': 1.5, 'SIZE': [1, 2, 3]}
+    assert image.labels.task('TEST')['DAT_TIM'] == 'Thu Jan 01 00:00:00 1970'
+    assert image.binary_prefix.data[0][5] == bytes([5] * 4)
+    assert len(image.binary_header) == 2 * image.labels.vsl(SystemLabel.RECSIZE)
+
+
+def test_eol_labels(tmp_path):
+    data = synthetic_data(2, 9, 7)
+    write_image(tmp_path / 'image.IMG', data, nlb=1, eol=True, properties=PROPERTIES, tasks=TASKS)
+    image = read_image(tmp_path / 'image.IMG')
+    assert (image.data == data).all()
+    assert image.labels.tasks == {}
+    assert image.eol_labels.task('TEST')['USER'] == 'test'